@@ -0,0 +1,552 @@
+import asyncio
+import aiohttp
+
+from _init import *
+from http import HTTPStatus
+from django_modles_shadow import *
+from WebsiteHandler import WebsiteHandler
+
+class AsyncWebsiteHandler:
+    """
+        The asynchronous twin of WebsiteHandler, for use from inside the discord event loop. Every API call WebsiteHandler
+        makes has an awaitable equivalent here, so a slow website can never stall gateway heartbeats or command handling.
+
+        URLs, pool sizes, timeouts and the (de)serialization helpers are all borrowed from WebsiteHandler, so the two
+        can't drift apart. WebsiteHandler remains the documentation for how the API is meant to be interacted with.
+    """
+
+    KEEPALIVE_TIMEOUT: float = 60.0  # Seconds an idle connection is kept open, comfortably longer than the heartbeat interval.
+
+    _session: aiohttp.ClientSession | None = None
+    _session_loop: asyncio.AbstractEventLoop | None = None
+
+
+    @staticmethod
+    async def configure_session(pool_maxsize: int | None = None) -> aiohttp.ClientSession:
+        """
+            (Re)builds the shared client session. Must be called from within the event loop it will be used on.
+        """
+
+        if pool_maxsize is not None:
+
+            WebsiteHandler.POOL_MAXSIZE = pool_maxsize
+
+        await AsyncWebsiteHandler.close()
+
+        connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+            limit=WebsiteHandler.POOL_MAXSIZE,
+            keepalive_timeout=AsyncWebsiteHandler.KEEPALIVE_TIMEOUT,
+        )
+
+        AsyncWebsiteHandler._session = aiohttp.ClientSession(connector=connector, headers={'Accept': WebsiteHandler.ACCEPT})  # aiohttp sets Accept-Encoding itself.
+        AsyncWebsiteHandler._session_loop = asyncio.get_running_loop()
+
+        return AsyncWebsiteHandler._session
+
+
+    @staticmethod
+    async def close() -> None:
+        """
+            Closes the shared session, and all the connections it holds.
+        """
+
+        if AsyncWebsiteHandler._session is not None and not AsyncWebsiteHandler._session.closed:
+
+            await AsyncWebsiteHandler._session.close()
+
+        AsyncWebsiteHandler._session = None
+        AsyncWebsiteHandler._session_loop = None
+
+
+    @staticmethod
+    async def _get_session() -> aiohttp.ClientSession:
+        """
+            Returns the shared session, building it on first use. A session is bound to the loop it was created on, so
+            we rebuild it if the bot has been started on a new loop.
+        """
+
+        session: aiohttp.ClientSession | None = AsyncWebsiteHandler._session
+
+        if session is None or session.closed or AsyncWebsiteHandler._session_loop is not asyncio.get_running_loop():
+
+            return await AsyncWebsiteHandler.configure_session()
+
+        return session
+
+
+    @staticmethod
+    def _timeout_for(url: str) -> aiohttp.ClientTimeout:
+
+        connect, read = WebsiteHandler._timeout_for(url)
+
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+
+    @staticmethod
+    async def _request(method: str, url: str, payload: dict[str, typing.Any] = dict()) -> tuple[int, typing.Any]:
+
+        status, body, _ = await AsyncWebsiteHandler._request_with_etag(method, url, payload)
+
+        return status, body
+
+
+    @staticmethod
+    async def _request_with_etag(method: str, url: str, payload: dict[str, typing.Any] = dict(), headers: dict[str, str] = dict()) -> tuple[int, typing.Any, str | None]:
+        """
+            All requests go through here. Returns the status code, the decoded body if the response was OK, and its ETag.
+            The response has to be read before the connection is handed back to the pool, hence returning the body here.
+        """
+
+        session: aiohttp.ClientSession = await AsyncWebsiteHandler._get_session()
+
+        async with session.request(method, url, json=payload | WebsiteHandler.auth, headers=headers, timeout=AsyncWebsiteHandler._timeout_for(url)) as response:
+
+            if response.status != HTTPStatus.OK:
+
+                return response.status, None, None
+
+            return response.status, WebsiteHandler._decode(response.content_type, await response.read()), response.headers.get('ETag')
+
+
+    @staticmethod
+    async def _get(url: str, payload: dict[str, typing.Any] = dict()) -> tuple[int, typing.Any]:
+
+        return await AsyncWebsiteHandler._request('GET', url, payload)
+
+
+    @staticmethod
+    async def _post(url: str, payload: dict[str, typing.Any] = dict()) -> tuple[int, typing.Any]:
+
+        return await AsyncWebsiteHandler._request('POST', url, payload)
+
+
+    @staticmethod
+    async def _generic_get_single(url: str, model_object: type[V], filter_dict: dict[str, typing.Any] = dict()) -> V | None:
+        """
+            A generic function to handle all get requests for a single item from the database.
+        """
+
+        status, body, etag = await AsyncWebsiteHandler._request_with_etag('GET', url, filter_dict, WebsiteHandler._if_none_match(url))
+
+        if status == HTTPStatus.NOT_MODIFIED:
+
+            return WebsiteHandler._not_modified(url, model_object)[0]
+
+        if status != HTTPStatus.OK:
+            print(f"Get single resource failure {url}", status)
+            return None
+
+        return WebsiteHandler._modified(url, etag, [body], model_object)[0]
+
+
+    @staticmethod
+    async def _generic_get_multiple(url: str, model_object: type[V]) -> list[V]:
+        """
+            A generic function to handle all get requests for multiple items from the database
+        """
+
+        status, body, etag = await AsyncWebsiteHandler._request_with_etag('GET', url, headers=WebsiteHandler._if_none_match(url))
+
+        if status == HTTPStatus.NOT_MODIFIED:
+
+            return WebsiteHandler._not_modified(url, model_object)
+
+        if status != HTTPStatus.OK:
+
+            if status != HTTPStatus.NO_CONTENT:
+
+                print(f"Get multiple resource failure, {url}", status)
+
+            return []
+
+        return WebsiteHandler._modified(url, etag, body['data'], model_object)
+
+
+    @staticmethod
+    async def _generic_post_request(url: str, model: V) -> bool:
+        """
+            A generic function to handle all post requests to the database.
+        """
+
+        fields: dict[str, typing.Any] = shadow_dict(model)
+        sent_hashes: dict[str, str] = Fingerprints.hashes(fields)  # Before the await, the object may change during it.
+
+        status, _ = await AsyncWebsiteHandler._post(url, WebsiteHandler._model_payload(fields))
+
+        if status == HTTPStatus.NO_CONTENT:
+
+            Fingerprints.mark_fields_clean(model, sent_hashes)
+
+        return status == HTTPStatus.NO_CONTENT
+
+
+    @staticmethod
+    async def _generic_update_request(url: str, model: V) -> bool:
+        """
+            See WebsiteHandler._generic_update_request.
+        """
+
+        payload: dict[str, typing.Any] | None = Fingerprints.update_payload(model)
+
+        if payload is None:
+
+            return True
+
+        sent_hashes: dict[str, str] = Fingerprints.hashes(payload)  # Before the await, the object may change during it.
+
+        status, _ = await AsyncWebsiteHandler._post(url, WebsiteHandler._model_payload(payload))
+
+        if status == HTTPStatus.NO_CONTENT:
+
+            Fingerprints.mark_fields_clean(model, sent_hashes)
+
+        return status == HTTPStatus.NO_CONTENT
+
+
+    @staticmethod
+    async def get_unposted_provisions() -> typing.Iterable[ProvisionHistory]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_UNPOSTED_PROVISIONS_URL, ProvisionHistory)
+
+
+    @staticmethod
+    async def get_resolvable_provisions() -> typing.Iterable[ProvisionHistory]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_RESOLVABLE_PROVISIONS_URL, ProvisionHistory)
+
+
+    @staticmethod
+    async def get_voting_rules() -> VotingRules | None:
+
+        return await AsyncWebsiteHandler._generic_get_single(WebsiteHandler.GET_VOTING_RULES_URL, VotingRules)
+
+
+    @staticmethod
+    async def get_roles() -> typing.Iterable[Roles]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_ROLES_URL, Roles)
+
+
+    @staticmethod
+    async def get_users() -> typing.Iterable[Users]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_USERS_URL, Users)
+
+
+    @staticmethod
+    async def get_changes(cursor: str | None) -> tuple[list[Users], list[Roles], str | None] | None:
+
+        status, body = await AsyncWebsiteHandler._get(WebsiteHandler.GET_CHANGES_URL, {'since': cursor})
+
+        if status != HTTPStatus.OK:
+
+            print("Get changes failure", status)
+            return None
+
+        return (
+            WebsiteHandler._many_jsons_to_objects(body['data']['users'], Users),
+            WebsiteHandler._many_jsons_to_objects(body['data']['roles'], Roles),
+            body['cursor'],
+        )
+
+
+    @staticmethod
+    async def get_full_constitution() -> typing.Iterable[Constitution]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_FULL_CONSTITUTION_URL, Constitution)
+
+
+    @staticmethod
+    async def get_constitution(amendment_number: int) -> Constitution | None:
+
+        filter_dict: dict[str, int] = {'amendment_number': amendment_number}
+
+        return await AsyncWebsiteHandler._generic_get_single(WebsiteHandler.GET_CONSTITUTION_URL, Constitution, filter_dict=filter_dict)
+
+
+    @staticmethod
+    async def get_provision(proposal_id: int) -> ProvisionHistory | None:
+
+        filter_dict: dict[str, int] = {'proposal_id': proposal_id}
+
+        return await AsyncWebsiteHandler._generic_get_single(WebsiteHandler.GET_PROVISION_URL, ProvisionHistory, filter_dict=filter_dict)
+
+
+    @staticmethod
+    async def get_open_provisions() -> typing.Iterable[ProvisionHistory]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_OPEN_PROVISIONS_URL, ProvisionHistory)
+
+
+    @staticmethod
+    async def get_party_role_by_name(role_name: str) -> Roles | None:
+
+        filter_dict: dict[str, str] = {'role_name': role_name}
+
+        return await AsyncWebsiteHandler._generic_get_single(WebsiteHandler.GET_PARTY_ROLE_BY_NAME_URL, Roles, filter_dict=filter_dict)
+
+
+    @staticmethod
+    async def get_recognized_regions() -> typing.Iterable[RecognizedRegions]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_RECOGNIZED_REGIONS_URL, RecognizedRegions)
+
+
+    @staticmethod
+    async def get_unposted_constitutions() -> typing.Iterable[Constitution]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_UNPOSTED_CONSTITUTIONS_URL, Constitution)
+
+
+    @staticmethod
+    async def get_open_judicial_challenges() -> typing.Iterable[JudicialChallenges]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_OPEN_JUDICIAL_CHALLENGES_URL, JudicialChallenges)
+
+
+    @staticmethod
+    async def add_constitution(constitution: Constitution) -> bool:
+
+        return await AsyncWebsiteHandler._generic_post_request(WebsiteHandler.ADD_CONSTITUTION_URL, constitution)
+
+
+    @staticmethod
+    async def add_role(role: Roles) -> bool:
+
+        return await AsyncWebsiteHandler._generic_post_request(WebsiteHandler.ADD_ROLE_URL, role)
+
+
+    @staticmethod
+    async def add_user(user: Users) -> bool:
+
+        return await AsyncWebsiteHandler._generic_post_request(WebsiteHandler.ADD_USER_URL, user)
+
+
+    @staticmethod
+    async def add_many_users(users: typing.Iterable[Users]) -> bool:
+
+        user_dicts: list[dict[str, typing.Any]] = [WebsiteHandler._model_payload(user) for user in users]
+        all_succeeded: bool = True
+
+        for start in range(0, len(user_dicts), WebsiteHandler.UPDATE_MANY_BATCH_SIZE):
+
+            payload: dict[str, typing.Any] = {'data': user_dicts[start:start + WebsiteHandler.UPDATE_MANY_BATCH_SIZE]}
+
+            status, _ = await AsyncWebsiteHandler._post(WebsiteHandler.ADD_MANY_USERS_URL, payload)
+
+            all_succeeded &= status == HTTPStatus.NO_CONTENT
+
+        return all_succeeded
+
+
+    @staticmethod
+    async def add_judicial_challenge(challenge: JudicialChallenges) -> bool:
+
+        return await AsyncWebsiteHandler._generic_post_request(WebsiteHandler.ADD_JUDICIAL_CHALLENGE_URL, challenge)
+
+
+    @staticmethod
+    async def update_provision(provision: ProvisionHistory) -> bool:
+
+        return await AsyncWebsiteHandler._generic_update_request(WebsiteHandler.UPDATE_PROVISION_URL, provision)
+
+
+    @staticmethod
+    async def update_constitution(constitution: Constitution) -> bool:
+
+        return await AsyncWebsiteHandler._generic_update_request(WebsiteHandler.UPDATE_CONSTITUTION_URL, constitution)
+
+
+    @staticmethod
+    async def update_user(user: Users) -> bool:
+
+        return await AsyncWebsiteHandler._generic_update_request(WebsiteHandler.UPDATE_USER_URL, user)
+
+
+    @staticmethod
+    async def update_many_users(users: typing.Iterable[Users]) -> bool:
+
+        user_payloads: list[tuple[Users, dict[str, typing.Any], dict[str, str]]] = WebsiteHandler._update_payloads(users)
+        all_succeeded: bool = True
+
+        for start in range(0, len(user_payloads), WebsiteHandler.UPDATE_MANY_BATCH_SIZE):
+
+            batch: list[tuple[Users, dict[str, typing.Any], dict[str, str]]] = user_payloads[start:start + WebsiteHandler.UPDATE_MANY_BATCH_SIZE]
+
+            status, _ = await AsyncWebsiteHandler._post(WebsiteHandler.UPDATE_MANY_USERS_URL, {'data': [user_dict for _, user_dict, _ in batch]})
+
+            if status != HTTPStatus.NO_CONTENT:
+
+                all_succeeded = False
+                continue
+
+            for user, _, sent_hashes in batch:
+
+                Fingerprints.mark_fields_clean(user, sent_hashes)
+
+        return all_succeeded
+
+
+    @staticmethod
+    async def transfer_money(from_user_id: int, to_user_id: int, amount: int) -> tuple[int, list[Users]]:
+
+        payload: dict[str, typing.Any] = {'from_user_id': str(from_user_id), 'to_user_id': str(to_user_id), 'amount': amount}
+        status, body = await AsyncWebsiteHandler._post(WebsiteHandler.TRANSFER_MONEY_URL, payload)
+
+        if status != HTTPStatus.OK:
+
+            return status, []
+
+        return status, WebsiteHandler._many_jsons_to_objects(body['data'], Users)
+
+
+    @staticmethod
+    async def run_payday(member_roles: dict[int, typing.Iterable[int]], transactor_id: int) -> tuple[int, dict[int, list[int]]]:
+
+        payload: dict[str, typing.Any] = {
+            'members': {str(member_id): [str(role_id) for role_id in role_ids] for member_id, role_ids in member_roles.items()},
+            'transactor_id': str(transactor_id),
+        }
+        status, body = await AsyncWebsiteHandler._post(WebsiteHandler.RUN_PAYDAY_URL, payload)
+
+        if status != HTTPStatus.OK:
+
+            return status, dict()
+
+        return status, WebsiteHandler._paid_by_amount(body['data'])
+
+
+    @staticmethod
+    async def update_judicial_challenge(challenge: JudicialChallenges) -> bool:
+
+        return await AsyncWebsiteHandler._generic_update_request(WebsiteHandler.UPDATE_JUDICIAL_CHALLENGES_URL, challenge)
+
+
+    @staticmethod
+    async def register_voter(voter_id: int, region: str) -> bool:
+
+        payload: Users = Users()
+
+        payload.user_id = str(voter_id)
+        payload.registered_at = region
+
+        return await AsyncWebsiteHandler._generic_post_request(WebsiteHandler.UPDATE_USER_URL, payload)
+
+
+    @staticmethod
+    async def get_next_amendment_number() -> int:
+
+        status, body = await AsyncWebsiteHandler._get(WebsiteHandler.GET_NEXT_AMENDMENT_NUMBER_URL)
+
+        if status != HTTPStatus.OK:
+            print("Get next amendment number failure", status)
+            return 0
+
+        return int(body['data'])
+
+
+    @staticmethod
+    async def add_temporary_position(temporary_position: TemporaryPosition) -> bool:
+
+        return await AsyncWebsiteHandler._generic_post_request(WebsiteHandler.ADD_TEMPORARY_POSITION_URL, temporary_position)
+
+
+    @staticmethod
+    async def get_temporary_position(user_id: str, role_id: str) -> TemporaryPosition | None:
+
+        filter_dict: dict[str, str] = {'user_id': user_id, 'role_id': role_id}
+
+        return await AsyncWebsiteHandler._generic_get_single(WebsiteHandler.GET_TEMPORARY_POSITION_URL, TemporaryPosition, filter_dict=filter_dict)
+
+
+    @staticmethod
+    async def get_updatable_temporary_positions() -> typing.Iterable[TemporaryPosition]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_UPDATABLE_TEMPORARY_POSITIONS_URL, TemporaryPosition)
+
+
+    @staticmethod
+    async def update_temporary_position(temporary_position: TemporaryPosition) -> bool:
+
+        return await AsyncWebsiteHandler._generic_post_request(WebsiteHandler.UPDATE_TEMPORARY_POSITION_URL, temporary_position)
+
+
+    @staticmethod
+    async def delete_temporary_position(temporary_position: TemporaryPosition) -> bool:
+
+        status, _ = await AsyncWebsiteHandler._get(WebsiteHandler.DELETE_TEMPORARY_POSITION_URL, {'user_id': temporary_position.user_id, 'role_id': temporary_position.role_id})
+
+        return status == HTTPStatus.NO_CONTENT
+
+
+    @staticmethod
+    async def add_purchase_log(purchase: TransactionLog) -> bool:
+
+        return await AsyncWebsiteHandler._generic_post_request(WebsiteHandler.ADD_PURCHASE_LOG_URL, purchase)
+
+
+    @staticmethod
+    async def get_last_payment_quarter() -> moonPhaseQuarters | None:
+
+        status, body = await AsyncWebsiteHandler._get(WebsiteHandler.GET_LAST_PAYMENT_QUARTER_URL)
+
+        if status != HTTPStatus.OK:
+
+            print("Get last payment quarter failure.")
+            return None
+
+        return body['data']
+
+
+    @staticmethod
+    async def get_price_of_crack() -> int | None:
+
+        status, body = await AsyncWebsiteHandler._get(WebsiteHandler.GET_PRICE_OF_CRACK_URL)
+
+        if status != HTTPStatus.OK:
+
+            print("get crack price failure...what a disaster")
+            return None
+
+        return body['data']
+
+
+    @staticmethod
+    async def get_debug_inflation(base_price: int=100) -> dict[str, int]:
+
+        _, body = await AsyncWebsiteHandler._get(WebsiteHandler.GET_DEBUG_INFLATION_URL, {'data': base_price})
+
+        return body
+
+
+    @staticmethod
+    async def get_change_events(cursor: int | None) -> tuple[list[ChangeEvent], int | None]:
+
+        status, body = await AsyncWebsiteHandler._get(WebsiteHandler.GET_CHANGE_EVENTS_URL, {'since': cursor})
+
+        if status != HTTPStatus.OK:
+
+            print("Get change events failure", status)
+            return [], None
+
+        return WebsiteHandler._many_jsons_to_objects(body['data'], ChangeEvent), body['cursor']
+
+
+    @staticmethod
+    async def get_open_poll_ballots() -> typing.Iterable[PollBallot]:
+
+        return await AsyncWebsiteHandler._generic_get_multiple(WebsiteHandler.GET_OPEN_POLL_BALLOTS_URL, PollBallot)
+
+
+    @staticmethod
+    async def add_poll_ballot(ballot: PollBallot) -> bool:
+
+        return await AsyncWebsiteHandler._generic_post_request(WebsiteHandler.ADD_POLL_BALLOT_URL, ballot)
+
+
+    @staticmethod
+    async def delete_poll_ballot(ballot: PollBallot) -> bool:
+
+        status, _ = await AsyncWebsiteHandler._post(WebsiteHandler.DELETE_POLL_BALLOT_URL, {'message_id': ballot.message_id, 'user_id': ballot.user_id, 'answer_id': ballot.answer_id})
+
+        return status == HTTPStatus.NO_CONTENT
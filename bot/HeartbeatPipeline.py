@@ -0,0 +1,134 @@
+import asyncio
+import collections
+import contextlib
+import time
+import typing
+
+class HeartbeatPipeline:
+	"""
+		Runs the items of a heartbeat stage (E.G. every unposted provision) through that stage's steps concurrently, instead
+		of one item at a time.
+
+		A step is an async function taking the previous step's result (the item itself, for the first step), and returning
+		the next step's argument. Returning None drops the item from the rest of the pipeline, like a "continue" would.
+
+		Ordered steps take one item at a time, in the order the items were given, for work whose order is visible or
+		matters (E.G. the order polls appear in the voting booth). Unordered steps run concurrently, up to MAX_WORKERS at
+		once. Each item moves on as soon as its own step is done, so one slow item never holds back the others.
+	"""
+
+	MAX_WORKERS: int = 5
+
+	# Discord rate limits each route separately per major parameter, which for every route we use is the channel. Sends and
+	# replies are the same route (creating a message), as are pinning and unpinning. discord.py waits out any limit discord
+	# reports, this just keeps concurrent steps from bursting into those limits in the first place.
+	# A call holds its place in the bucket from when it's sent, then from when its response arrives. Discord counted it
+	# somewhere in between, so timing the window from the response can never let the next call in early.
+	ROUTE_LIMITS: dict[str, tuple[int, float]] = {  # route: (requests, per seconds)
+		'create_message': (5, 5.0),
+		'pins': (5, 5.0),
+	}
+
+	_route_history: dict[tuple[str, int], collections.deque[list[float]]] = dict()  # [time] per call, mutable so exits can move it.
+	_route_locks: dict[tuple[str, int], asyncio.Lock] = dict()
+
+	Step = tuple[typing.Callable[[typing.Any], typing.Awaitable[typing.Any]], bool]  # (step, is_ordered)
+
+
+	@staticmethod
+	@contextlib.asynccontextmanager
+	async def route(route: str, channel_id: int) -> typing.AsyncIterator[None]:
+		"""
+			Wrap any discord call on a rate limited route in this, so it waits for room in that route's bucket.
+		"""
+
+		limit: tuple[int, float] | None = HeartbeatPipeline.ROUTE_LIMITS.get(route)
+
+		if limit is None:
+
+			yield
+			return
+
+		requests, per_seconds = limit
+		bucket: tuple[str, int] = (route, channel_id)
+		history: collections.deque[list[float]] = HeartbeatPipeline._route_history.setdefault(bucket, collections.deque())
+		call: list[float] = [0.0]
+
+		async with HeartbeatPipeline._route_locks.setdefault(bucket, asyncio.Lock()):  # Keeps waiting calls in order.
+
+			while True:
+
+				while len(history) > 0 and time.monotonic() - history[0][0] >= per_seconds:
+
+					history.popleft()
+
+				if len(history) < requests:
+
+					break
+
+				await asyncio.sleep(history[0][0] + per_seconds - time.monotonic())
+
+			call[0] = time.monotonic()
+			history.append(call)
+
+		try:
+
+			yield
+
+		finally:
+
+			call[0] = time.monotonic()
+
+
+	@staticmethod
+	async def run(items: typing.Iterable[typing.Any], steps: list[Step], max_workers: int | None = None) -> None:
+		"""
+			Passes every item through every step. If any step raises, the rest of the items still finish, then the first
+			exception is raised.
+		"""
+
+		items = list(items)
+		workers: asyncio.Semaphore = asyncio.Semaphore(HeartbeatPipeline.MAX_WORKERS if max_workers is None else max_workers)
+
+		# step_done[step][item] is set once that item is through (or will never reach) that step, for ordered steps to wait on.
+		step_done: list[list[asyncio.Event]] = [[asyncio.Event() for _ in items] for _ in steps]
+
+		async def process(index: int, item: typing.Any) -> None:
+
+			try:
+
+				for step_index, (step, is_ordered) in enumerate(steps):
+
+					if is_ordered:
+
+						if index > 0:
+
+							await step_done[step_index][index - 1].wait()
+
+						item = await step(item)
+
+					else:
+
+						async with workers:
+
+							item = await step(item)
+
+					step_done[step_index][index].set()
+
+					if item is None:
+
+						return
+
+			finally:
+
+				for events in step_done:
+
+					events[index].set()
+
+		results: list[BaseException | None] = await asyncio.gather(*(process(index, item) for index, item in enumerate(items)), return_exceptions=True)
+
+		for result in results:
+
+			if isinstance(result, BaseException):
+
+				raise result
@@ -0,0 +1,333 @@
+import heapq
+import typing
+
+"""
+	Finds users by name: exactly, by prefix, or by the closest spelling for a "did you mean".
+
+	A user can go by several names at once (their account name on the website, their discord username, global display
+	name and server nickname), each kept under the source it came from, so one source changing only replaces its own
+	names. Names are matched case insensitively, and a legacy "name#1234" is also found as "name".
+"""
+
+
+def normalize(name: str) -> str:
+
+	return name.strip().lower()
+
+
+def _without_discriminator(name: str) -> str:
+
+	base, separator, discriminator = name.rpartition('#')
+
+	return base.strip() if separator and discriminator.isdigit() else name
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+
+	length: int = 0
+
+	for char_a, char_b in zip(a, b):
+
+		if char_a != char_b:
+
+			break
+
+		length += 1
+
+	return length
+
+
+class _RadixNode:
+	"""
+		A run of characters no other name branches off from. Nodes that end no branch (most of them) have no children
+		dict at all.
+	"""
+
+	__slots__ = ('label', 'children', 'name')
+
+	def __init__(self, label: str, name: str | None = None) -> None:
+
+		self.label: str = label
+		self.children: dict[str, _RadixNode] | None = None  # Keyed by the first character of the child's label.
+		self.name: str | None = name  # Set on the node a name ends at.
+
+
+class NameIndex:
+	"""
+		Exact lookups are a dict. Every name is also kept in a radix trie (a trie whose unbranching runs of characters are
+		merged into one node), which answers prefix lookups by walking down to the prefix, and spelling suggestions by
+		walking the trie while computing edit distance one row per character. Names sharing a prefix share those rows,
+		and a branch is abandoned as soon as every entry in its row is too far off.
+
+		Suggestions run on the event loop, so each is given SUGGEST_CELL_BUDGET edit distance cells to compute (a row is
+		one cell per character of the name). Distance 1 fits easily, a distance 2 search of a large guild may not, in
+		which case the closest names found so far are returned.
+	"""
+
+	SUGGEST_CELL_BUDGET: int = 100000  # About 50ms of computing.
+
+	def __init__(self) -> None:
+
+		self._names_by_user: dict[int, dict[str, tuple[str, ...]]] = dict()  # user id: {source: their names from that source}
+		self._ids_by_name: dict[str, tuple[int, ...]] = dict()  # Nearly every name is one person's, a tuple is the smallest holder.
+		self._trie: _RadixNode = _RadixNode('')
+
+	def set_names(self, user_id: int, source: str, names: typing.Iterable[str | None]) -> None:
+		"""
+			Replaces the names a user has from one source, E.G. set_names(id, 'member', [username, global_name, nick]).
+		"""
+
+		new_names: set[str] = set()
+
+		for name in names:
+
+			if name is None or normalize(name) == '':
+
+				continue
+
+			new_names.add(normalize(name))
+			new_names.add(_without_discriminator(normalize(name)))
+
+		names_by_source: dict[str, tuple[str, ...]] = self._names_by_user.setdefault(user_id, dict())
+		old_names: tuple[str, ...] = names_by_source.get(source, ())
+		names_by_source[source] = tuple(new_names)
+
+		for name in old_names:
+
+			if name not in new_names and not any(name in source_names for source_names in names_by_source.values()):  # Another source may still give it.
+
+				self._remove_name(user_id, name)
+
+		for name in new_names:
+
+			if name not in old_names:
+
+				self._add_name(user_id, name)
+
+	def remove(self, user_id: int, source: str) -> None:
+
+		self.set_names(user_id, source, ())
+		del self._names_by_user[user_id][source]
+
+		if len(self._names_by_user[user_id]) == 0:
+
+			del self._names_by_user[user_id]
+
+	def exact(self, name: str) -> set[int]:
+
+		name = normalize(name)
+
+		return set(self._ids_by_name.get(name, ()) or self._ids_by_name.get(_without_discriminator(name), ()))
+
+	def prefix(self, prefix: str, limit: int = 10) -> list[str]:
+		"""
+			Up to limit names starting with prefix, shortest first.
+		"""
+
+		node: _RadixNode = self._trie
+		rest: str = normalize(prefix)
+		depth: int = 0
+
+		while rest != '':
+
+			child: _RadixNode | None = node.children.get(rest[0]) if node.children is not None else None
+
+			if child is None or not (child.label.startswith(rest) or rest.startswith(child.label)):
+
+				return []
+
+			depth += len(child.label)
+			rest = rest[len(child.label):] if rest.startswith(child.label) else ''
+			node = child
+
+		matches: list[str] = []
+		to_visit: list[tuple[int, int, _RadixNode]] = [(depth, 0, node)]  # (length of the node's name, tiebreak, node)
+		pushed: int = 1
+
+		while len(to_visit) > 0 and len(matches) < limit:
+
+			depth, _, node = heapq.heappop(to_visit)
+
+			if node.name is not None:
+
+				matches.append(node.name)
+
+			for child in (node.children or dict()).values():
+
+				heapq.heappush(to_visit, (depth + len(child.label), pushed, child))
+				pushed += 1
+
+		return matches
+
+	def suggest(self, name: str, max_distance: int = 2, limit: int = 3) -> list[str]:
+		"""
+			The names closest to one that wasn't found: names within max_distance edits of it, closest first, then names it
+			is the start of. Searching wider costs a lot more, so each distance is only searched if the closer ones found
+			nothing, and all of them share SUGGEST_CELL_BUDGET.
+		"""
+
+		name = normalize(name)
+		close_names: list[tuple[int, str]] = []
+		budget: list[int] = [NameIndex.SUGGEST_CELL_BUDGET]
+
+		for distance in range(1, max_distance + 1):
+
+			close_names = self._close_names(name, distance, budget)
+
+			if len(close_names) > 0 or budget[0] <= 0:
+
+				break
+
+		suggestions: list[str] = [close_name for _, close_name in sorted(close_names)[:limit]]
+
+		for longer_name in self.prefix(name, limit + 1):
+
+			if len(suggestions) < limit and longer_name != name and longer_name not in suggestions:
+
+				suggestions.append(longer_name)
+
+		return suggestions
+
+	def _close_names(self, name: str, max_distance: int, budget: list[int]) -> list[tuple[int, str]]:
+		"""
+			budget is the cells left to compute, shared between calls and spent here.
+		"""
+
+		close_names: list[tuple[int, str]] = []
+
+		# Each entry is a trie node, and the edit distances between the name and everything up to the end of the node's
+		# label, for every prefix of the name.
+		to_visit: list[tuple[_RadixNode, list[int]]] = [(self._trie, list(range(len(name) + 1)))]
+
+		while len(to_visit) > 0 and budget[0] > 0:
+
+			node, row = to_visit.pop()
+
+			for child in (node.children or dict()).values():
+
+				child_row: list[int] = row
+
+				for char in child.label:
+
+					child_row = self._next_row(child_row, char, name)
+					budget[0] -= len(name)
+
+					if min(child_row) > max_distance:
+
+						break
+
+				else:
+
+					if child.name is not None and child_row[-1] <= max_distance and child.name != name:
+
+						close_names.append((child_row[-1], child.name))
+
+					to_visit.append((child, child_row))
+
+		return close_names
+
+	@staticmethod
+	def _next_row(previous: list[int], char: str, name: str) -> list[int]:
+
+		row: list[int] = [previous[0] + 1]
+
+		for i, name_char in enumerate(name, start=1):
+
+			row.append(min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + (name_char != char)))
+
+		return row
+
+	def _add_name(self, user_id: int, name: str) -> None:
+
+		ids: tuple[int, ...] | None = self._ids_by_name.get(name)
+
+		if ids is not None:
+
+			if user_id not in ids:
+
+				self._ids_by_name[name] = ids + (user_id,)
+
+			return
+
+		self._ids_by_name[name] = (user_id,)
+		node: _RadixNode = self._trie
+		rest: str = name
+
+		while rest != '':
+
+			if node.children is None:
+
+				node.children = dict()
+
+			child: _RadixNode | None = node.children.get(rest[0])
+
+			if child is None:
+
+				node.children[rest[0]] = _RadixNode(rest, name)
+
+				return
+
+			common: int = _common_prefix_length(child.label, rest)
+
+			if common < len(child.label):  # The name branches off partway through the child, split it there.
+
+				split: _RadixNode = _RadixNode(child.label[:common])
+				child.label = child.label[common:]
+				split.children = {child.label[0]: child}
+				node.children[rest[0]] = split
+				child = split
+
+			node = child
+			rest = rest[common:]
+
+		node.name = name
+
+	def _remove_name(self, user_id: int, name: str) -> None:
+
+		ids: tuple[int, ...] | None = self._ids_by_name.get(name)
+
+		if ids is None or user_id not in ids:
+
+			return
+
+		if len(ids) > 1:
+
+			self._ids_by_name[name] = tuple(other_id for other_id in ids if other_id != user_id)
+
+			return
+
+		del self._ids_by_name[name]
+
+		path: list[_RadixNode] = [self._trie]
+		rest: str = name
+
+		while rest != '':
+
+			child: _RadixNode = path[-1].children[rest[0]]  # type: ignore ; The name is indexed, so its path exists.
+			path.append(child)
+			rest = rest[len(child.label):]
+
+		node: _RadixNode = path[-1]
+		node.name = None
+
+		if len(path) == 1:
+
+			return
+
+		if node.children is None:  # Nothing ends below it any more, so it goes, and its parent may now be a plain run.
+
+			parent: _RadixNode = path[-2]
+			del parent.children[node.label[0]]  # type: ignore
+			parent.children = parent.children or None
+			node = parent
+
+			if node is self._trie:
+
+				return
+
+		if node.name is None and node.children is not None and len(node.children) == 1:  # Merge it with its only child.
+
+			(only_child,) = node.children.values()
+			node.label += only_child.label
+			node.children = only_child.children
+			node.name = only_child.name
@@ -0,0 +1,260 @@
+import asyncio
+import collections
+import dataclasses
+import discord
+import time
+import traceback
+import typing
+
+from discord.ext import commands, tasks
+
+@dataclasses.dataclass
+class Recovery:
+
+	component: str  # 'gateway', or the name of a task loop.
+	reason: str
+	failed_at: float  # time.monotonic()
+	downtime: float | None = None  # Seconds until the component was running again, None while it's still down.
+
+
+class Supervisor:
+	"""
+		Keeps the bot running, restarting only the part that failed instead of the whole process.
+
+		A task loop that dies with an unhandled exception is restarted by itself, after a backoff. If the same loop keeps
+		failing (MAX_LOOP_FAILURES within FAILURE_WINDOW_SECONDS), we suspect the discord library has gotten itself into a
+		bad state (see Democracybot.post_provisions), and restart the gateway session as well. A gateway session that ends
+		for any reason other than us stopping is restarted too.
+
+		Restarting the gateway session reuses the same bot, so registered commands, VotingSys' caches and
+		AsyncWebsiteHandler's connection pool all survive it. The session is closed, the bot's discord cache cleared, and
+		the bot logs back in, after which on_ready runs again.
+
+		Every restart is counted per component, and every recovery keeps how long the component was down for.
+	"""
+
+	BACKOFF_BASE_SECONDS: float = 1.0
+	BACKOFF_MAX_SECONDS: float = 60.0
+	MAX_LOOP_FAILURES: int = 3
+	FAILURE_WINDOW_SECONDS: float = 600.0
+	RECOVERY_HISTORY: int = 50  # How many recoveries are kept for reporting.
+
+	bot: commands.Bot
+	restart_counts: collections.Counter[str] = collections.Counter()
+	event_errors: collections.Counter[str] = collections.Counter()  # Event handlers that raised, these need no restart.
+	recoveries: collections.deque[Recovery] = collections.deque(maxlen=RECOVERY_HISTORY)
+	started_at: float = time.monotonic()
+
+	_loops: dict[str, tasks.Loop[typing.Any]] = dict()
+	_recent_failures: dict[str, collections.deque[float]] = dict()
+	_gateway_recovery: Recovery | None = None
+	_is_stopping: bool = False
+
+
+	@staticmethod
+	async def run(bot: commands.Bot, token: str) -> None:
+		"""
+			Runs the bot until it is stopped, restarting its gateway session whenever it ends. Only failures no restart can
+			fix (E.G. a bad token) are raised.
+		"""
+
+		Supervisor.bot = bot
+		Supervisor.started_at = time.monotonic()
+		discord.utils.setup_logging()  # bot.run would have done this for us.
+
+		try:
+
+			while not Supervisor._is_stopping:
+
+				try:
+
+					await bot.start(token)
+
+				except (discord.LoginFailure, discord.PrivilegedIntentsRequired):
+
+					raise
+
+				except Exception as e:
+
+					print("Gateway session failed", type(e), e)
+
+					if Supervisor._gateway_recovery is None:
+
+						Supervisor._gateway_recovery = Supervisor._record_failure('gateway', f"{type(e).__name__}: {e}")
+
+				if Supervisor._is_stopping:
+
+					break
+
+				if Supervisor._gateway_recovery is None:
+
+					Supervisor._gateway_recovery = Supervisor._record_failure('gateway', "Session ended")
+
+				if not bot.is_closed():
+
+					await bot.close()
+
+				bot.clear()
+
+				await asyncio.sleep(Supervisor._backoff('gateway'))
+
+				Supervisor.restart_counts['gateway'] += 1
+				print(f"Restarting the gateway session ({Supervisor._gateway_recovery.reason})")
+
+		finally:
+
+			Supervisor._is_stopping = True
+
+			if not bot.is_closed():
+
+				await bot.close()
+
+
+	@staticmethod
+	def gateway_ready() -> None:
+		"""
+			Called from on_ready, which is the gateway session being fully back.
+		"""
+
+		recovery: Recovery | None = Supervisor._gateway_recovery
+
+		if recovery is None:
+
+			return
+
+		Supervisor._gateway_recovery = None
+		recovery.downtime = time.monotonic() - recovery.failed_at
+		print(f"Gateway session recovered after {recovery.downtime:.2f}s")
+
+
+	@staticmethod
+	def restart_gateway(reason: str) -> None:
+		"""
+			Ends the current gateway session, run() then starts a new one.
+		"""
+
+		if Supervisor._gateway_recovery is not None or Supervisor._is_stopping:
+
+			return  # Already restarting.
+
+		Supervisor._gateway_recovery = Supervisor._record_failure('gateway', reason)
+		asyncio.create_task(Supervisor.bot.close())
+
+
+	@staticmethod
+	def start_loop(name: str, loop: tasks.Loop[typing.Any]) -> None:
+		"""
+			Starts a task loop under supervision, if it isn't running already. Safe to call from every on_ready.
+		"""
+
+		if name not in Supervisor._loops:
+
+			Supervisor._loops[name] = loop
+
+			async def on_loop_error(exception: Exception) -> None:
+
+				Supervisor._loop_failed(name, exception)
+
+			loop.error(on_loop_error)
+
+		if not loop.is_running():
+
+			loop.start()
+
+
+	@staticmethod
+	def event_failed(event: str) -> None:
+		"""
+			Called from on_error, inside the except block discord.py runs it from. A failed event handler leaves nothing
+			running that needs restarting, so it's only reported.
+		"""
+
+		print(f"Event handler {event} failed")
+		traceback.print_exc()
+		Supervisor.event_errors[event] += 1
+
+
+	@staticmethod
+	def _loop_failed(name: str, exception: Exception) -> None:
+
+		print(f"Task loop {name} failed")
+		traceback.print_exception(exception)
+
+		recovery: Recovery = Supervisor._record_failure(name, f"{type(exception).__name__}: {exception}")
+		failures: collections.deque[float] = Supervisor._recent_failures.setdefault(name, collections.deque())
+
+		while len(failures) > 0 and recovery.failed_at - failures[0] > Supervisor.FAILURE_WINDOW_SECONDS:
+
+			failures.popleft()
+
+		failures.append(recovery.failed_at)
+
+		if len(failures) >= Supervisor.MAX_LOOP_FAILURES:
+
+			failures.clear()
+			Supervisor.restart_gateway(f"Task loop {name} failed {Supervisor.MAX_LOOP_FAILURES} times")
+
+		asyncio.create_task(Supervisor._restart_loop(name, recovery))
+
+
+	@staticmethod
+	async def _restart_loop(name: str, recovery: Recovery) -> None:
+
+		loop: tasks.Loop[typing.Any] = Supervisor._loops[name]
+		task: asyncio.Task[None] | None = loop.get_task()
+
+		if task is not None:
+
+			await asyncio.wait([task])  # The error handler runs inside the dying task, let it finish.
+
+			if not task.cancelled():
+
+				task.exception()  # Already reported, this marks it as such so asyncio doesn't report it again.
+
+		await asyncio.sleep(Supervisor._backoff(name))
+		await Supervisor.bot.wait_until_ready()  # Pointless to run while the gateway is being restarted.
+
+		if Supervisor._is_stopping:
+
+			return
+
+		if not loop.is_running():
+
+			loop.start()
+
+		Supervisor.restart_counts[name] += 1
+		recovery.downtime = time.monotonic() - recovery.failed_at
+		print(f"Task loop {name} restarted after {recovery.downtime:.2f}s")
+
+
+	@staticmethod
+	def _record_failure(component: str, reason: str) -> Recovery:
+
+		recovery: Recovery = Recovery(component=component, reason=reason, failed_at=time.monotonic())
+		Supervisor.recoveries.append(recovery)
+
+		return recovery
+
+
+	@staticmethod
+	def _backoff(component: str) -> float:
+		"""
+			Doubles with every recent failure of the component, so something failing on every start isn't hammered.
+		"""
+
+		recent: float = time.monotonic() - Supervisor.FAILURE_WINDOW_SECONDS
+		recent_failures: int = sum(1 for recovery in Supervisor.recoveries if recovery.component == component and recovery.failed_at > recent)
+
+		return min(Supervisor.BACKOFF_BASE_SECONDS * 2 ** max(recent_failures - 1, 0), Supervisor.BACKOFF_MAX_SECONDS)
+
+
+	@staticmethod
+	def stats() -> dict[str, typing.Any]:
+
+		return {
+			'uptime_seconds': time.monotonic() - Supervisor.started_at,
+			'restart_counts': dict(Supervisor.restart_counts),
+			'event_errors': dict(Supervisor.event_errors),
+			'total_downtime_seconds': sum(recovery.downtime for recovery in Supervisor.recoveries if recovery.downtime is not None),
+			'recoveries': [dataclasses.asdict(recovery) for recovery in Supervisor.recoveries],
+		}
@@ -1,3 +1,4 @@
+import hashlib
 import random
 import string
 import typing
@@ -94,6 +95,14 @@ class TextFormatting:
 
         return ret_text if not constitution.deprecated else f"~~{ret_text}~~"
 
+    @staticmethod
+    def content_hash(message_text: str) -> str:
+        """
+            Identifies what a message says, so we can tell whether it needs editing without fetching it.
+        """
+
+        return hashlib.sha256(message_text.encode('utf-8')).hexdigest()
+
     @staticmethod
     def judicial_challenge_ping(judicial_role_id: int) -> str:
         """
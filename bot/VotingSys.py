@@ -1,8 +1,14 @@
+import asyncio
+import collections
 import discord
+import json
+import os
 import random
 
-from WebsiteHandler import WebsiteHandler
+from AsyncWebsiteHandler import AsyncWebsiteHandler
+from NameIndex import NameIndex, normalize
 from TextFormatting import TextFormatting
+from WebsiteHandler import WebsiteHandler
 from django_modles_shadow import *
 from _init import *
 
@@ -10,32 +16,141 @@ class VotingSys:
 
 	rules: VotingRules
 	users: dict[int, Users] = dict()
-	users_by_name: dict[str, Users] = dict()
+	user_names: NameIndex = NameIndex()  # Every name a user goes by, their account name and their discord names, for finding them.
 	roles: dict[int, Roles] = dict()
 	recognized_regions: dict[str, bool] = dict()
+	changes_cursor: str | None = None  # Where the last delta sync of users and roles left off, None means we have nothing yet.
+	ballots: dict[int, dict[int, int]] = dict()  # poll message id: {voter id: answer id}, kept up to date from gateway vote events.
+	member_roles: dict[int, frozenset[int]] = dict()  # member id: ids of the roles they hold, kept up to date from gateway member events.
+	role_members: dict[int, set[int]] = dict()  # role id: ids of the members holding it, the same index the other way around.
 	raw_number_of_judges: int
 	number_of_judges: int
 
+	# Users, roles, regions and rules as of the last sync, so a restart can serve commands before the website answers.
+	SNAPSHOT_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'voting_snapshot.json')
+	SNAPSHOT_VERSION: int = 1  # Bump when the layout changes, older snapshots are then ignored.
+
 	@staticmethod
-	def initialize() -> None:
+	async def initialize() -> None:
 		"""
-			Set all internal vairables, most pulled directly from the website.
+			Set all internal vairables, most pulled directly from the website. The calls are independent, so they're made
+			concurrently. The result is saved as the snapshot for the next start.
 		"""
 
-		VotingSys.get_voting_rules()
-		VotingSys.get_users()
-		VotingSys.get_roles()
-		VotingSys.get_recognized_regions()
+		await asyncio.gather(
+			VotingSys.get_voting_rules(),
+			VotingSys.get_changes(),
+			VotingSys.get_recognized_regions(),
+			VotingSys.get_ballots(),
+		)
+		await VotingSys.save_snapshot()
 		print("VotingSys initialized")
 
 
 	@staticmethod
-	def get_voting_rules() -> None:
+	def load_snapshot() -> bool:
+		"""
+			Load users, roles, regions and rules from the snapshot, returning whether there was a usable one.
+
+			The delta sync cursor is restored with them, so the next get_changes only pulls what changed since the snapshot
+			was saved. Ballots are not kept, until they're pulled tallies fall back to asking discord.
+		"""
+
+		try:
+
+			with open(VotingSys.SNAPSHOT_PATH, encoding='utf-8') as snapshot_file:
+
+				snapshot: dict[str, typing.Any] = json.load(snapshot_file)
+
+		except FileNotFoundError:
+
+			return False
+
+		except (OSError, ValueError) as e:
+
+			print("Could not read the voting snapshot, starting cold.", e)
+			return False
+
+		if snapshot.get('version') != VotingSys.SNAPSHOT_VERSION:
+
+			return False
+
+		try:  # Not fingerprinted, the website may have moved on since. The refresh replaces them with objects that are.
+
+			rules: VotingRules = WebsiteHandler._json_to_object(snapshot['rules'], VotingRules, is_from_website=False)
+			users: list[Users] = WebsiteHandler._many_jsons_to_objects(snapshot['users'], Users, is_from_website=False)
+			roles: list[Roles] = WebsiteHandler._many_jsons_to_objects(snapshot['roles'], Roles, is_from_website=False)
+
+		except ValueError as e:  # Saved with shadows that have since changed.
+
+			print("Could not read the voting snapshot, starting cold.", e)
+			return False
+
+		VotingSys.rules = rules
+		VotingSys.apply_users(users)
+
+		for role in roles:
+
+			VotingSys.roles[int(role.role_id)] = role
+
+		VotingSys.recognized_regions.update(snapshot['regions'])
+		VotingSys.changes_cursor = snapshot['changes_cursor']
+
+		return True
+
+
+	@staticmethod
+	async def save_snapshot() -> None:
+		"""
+			Converting every user and writing them out takes long enough to stall the bot in a large guild, so it's done
+			in a thread. Only the lists of objects are copied here, on the event loop, so the thread never iterates a dict
+			that's being changed. A user changed while the thread converts it may be saved newer than the cursor, which is
+			harmless, as the next get_changes just applies that change again.
+		"""
+
+		await asyncio.to_thread(
+			VotingSys._write_snapshot, VotingSys.rules, list(VotingSys.users.values()), list(VotingSys.roles.values()),
+			dict(VotingSys.recognized_regions), VotingSys.changes_cursor,
+		)
+
+
+	@staticmethod
+	def _write_snapshot(rules: VotingRules, users: list[Users], roles: list[Roles], regions: dict[str, bool], changes_cursor: str | None) -> None:
+		"""
+			Written to a temporary file and moved into place, so a crash mid-write can't leave a torn snapshot behind.
+		"""
+
+		snapshot: dict[str, typing.Any] = {
+			'version': VotingSys.SNAPSHOT_VERSION,
+			'rules': shadow_dict(rules),
+			'users': [shadow_dict(user) for user in users],
+			'roles': [shadow_dict(role) for role in roles],
+			'regions': regions,
+			'changes_cursor': changes_cursor,
+		}
+
+		temporary_path: str = f'{VotingSys.SNAPSHOT_PATH}.tmp'
+
+		try:
+
+			with open(temporary_path, 'w', encoding='utf-8') as snapshot_file:
+
+				json.dump(snapshot, snapshot_file, default=str)  # default=str covers any datetimes.
+
+			os.replace(temporary_path, VotingSys.SNAPSHOT_PATH)
+
+		except OSError as e:
+
+			print("Could not save the voting snapshot.", e)
+
+
+	@staticmethod
+	async def get_voting_rules() -> None:
 		"""
 			Pull Voting Rules from an API call.
 		"""
 
-		hold = WebsiteHandler.get_voting_rules()
+		hold = await AsyncWebsiteHandler.get_voting_rules()
 
 		if type(hold) == VotingRules:
 
@@ -47,47 +162,99 @@ class VotingSys:
 
 
 	@staticmethod
-	def get_users() -> None:
+	async def get_changes() -> None:
 		"""
-			Pull all Users objects from the website
+			Pull every User and Role that changed since our last sync, and apply them over what we already have.
+			The first sync (or any sync after a failure to get a cursor) pulls everything.
 		"""
 
-		users_hold: typing.Iterable[Users] | None = WebsiteHandler.get_users()
+		changes: tuple[list[Users], list[Roles], str | None] | None = await AsyncWebsiteHandler.get_changes(VotingSys.changes_cursor)
 
-		# if users_hold == []:
-		#
-		# 	raise TypeError("get_users from website returned None.")  #TODO consider what we want done here, we may have nothing int the database
+		if changes is None:
+
+			return
+
+		users_hold, roles_hold, cursor = changes
 
 		for user in users_hold:
 
-			VotingSys.users[int(user.user_id)] = user
-			VotingSys.users_by_name[user.name.lower()] = user
+			VotingSys._apply_user(user)
+
+		for role in roles_hold:
+
+			VotingSys.roles[int(role.role_id)] = role
+
+		VotingSys.changes_cursor = cursor
 
 
 	@staticmethod
-	def get_roles() -> None:
+	def _apply_user(user: Users) -> None:
+
+		VotingSys.users[int(user.user_id)] = user
+		VotingSys.user_names.set_names(int(user.user_id), 'account', [user.name])
+
+
+	@staticmethod
+	def apply_users(users: typing.Iterable[Users]) -> None:
 		"""
-			Pull all roles from the website.
+			Replaces our copies of users with ones the website just sent back, E.G. after a transfer_money.
 		"""
 
-		roles_hold:typing.Iterable[Roles] | None = WebsiteHandler.get_roles()
+		for user in users:
 
-		# if roles_hold == []:
-		#
-		# 	raise TypeError("get_roles from website returned None.")
+			VotingSys._apply_user(user)
 
-		for role in roles_hold:
 
-			VotingSys.roles[int(role.role_id)] = role
+	@staticmethod
+	def set_member_names(member: discord.Member) -> None:
+		"""
+			str(member) is "name#1234" for accounts that still have a discriminator.
+		"""
+
+		VotingSys.user_names.set_names(member.id, 'member', [member.name, str(member), member.global_name, member.nick])
 
 
 	@staticmethod
-	def get_recognized_regions():
+	def find_users(name: str) -> list[Users]:
+		"""
+			Every user going by this name. An account name is unique, so it wins outright, display names may be shared.
+		"""
+
+		user: Users | None = VotingSys.user_by_account_name(name)
+
+		if user is not None:
+
+			return [user]
+
+		return [VotingSys.users[user_id] for user_id in VotingSys.user_names.exact(name) if user_id in VotingSys.users]
+
+
+	@staticmethod
+	def user_by_account_name(name: str) -> Users | None:
+		"""
+			The user whose website account has this name. Found through the name index, which already holds every account
+			name, rather than a second dict of every user by name.
+		"""
+
+		user_id: int
+		for user_id in VotingSys.user_names.exact(name):
+
+			user: Users | None = VotingSys.users.get(user_id)
+
+			if user is not None and normalize(user.name) == normalize(name):
+
+				return user
+
+		return None
+
+
+	@staticmethod
+	async def get_recognized_regions():
 		"""
 			Pull all recognized regions from the website
 		"""
 
-		regions_hold = WebsiteHandler.get_recognized_regions()
+		regions_hold = await AsyncWebsiteHandler.get_recognized_regions()
 
 		# if regions_hold == []:
 		#
@@ -98,6 +265,101 @@ class VotingSys:
 			VotingSys.recognized_regions[region.region_name] = region.is_recognized
 
 
+	@staticmethod
+	async def get_ballots() -> None:
+		"""
+			Pull every ballot cast on an open provision, so votes recorded before a restart still count.
+		"""
+
+		VotingSys.ballots.clear()
+
+		for ballot in await AsyncWebsiteHandler.get_open_poll_ballots():
+
+			VotingSys.record_ballot(int(ballot.message_id), int(ballot.user_id), ballot.answer_id)
+
+
+	@staticmethod
+	def record_ballot(message_id: int, user_id: int, answer_id: int) -> None:
+
+		VotingSys.ballots.setdefault(message_id, dict())[user_id] = answer_id
+
+
+	@staticmethod
+	def remove_ballot(message_id: int, user_id: int, answer_id: int) -> None:
+
+		poll_ballots: dict[int, int] | None = VotingSys.ballots.get(message_id)
+
+		if poll_ballots is not None and poll_ballots.get(user_id) == answer_id:
+
+			del poll_ballots[user_id]
+
+
+	@staticmethod
+	def index_member_roles(members: typing.Iterable[discord.Member]) -> None:
+		"""
+			(Re)builds the role membership index, and members' discord names, from the guild's member cache.
+		"""
+
+		VotingSys.member_roles.clear()
+		VotingSys.role_members.clear()
+
+		for member in members:
+
+			VotingSys.set_member_roles(member.id, (role.id for role in member.roles))
+			VotingSys.set_member_names(member)
+
+
+	@staticmethod
+	def set_member_roles(member_id: int, role_ids: typing.Iterable[int]) -> None:
+
+		new_roles: frozenset[int] = frozenset(role_ids)
+		old_roles: frozenset[int] = VotingSys.member_roles.get(member_id, frozenset())
+
+		for role_id in old_roles - new_roles:
+
+			VotingSys.role_members[role_id].discard(member_id)
+
+		for role_id in new_roles - old_roles:
+
+			VotingSys.role_members.setdefault(role_id, set()).add(member_id)
+
+		VotingSys.member_roles[member_id] = new_roles
+
+
+	@staticmethod
+	def add_member_role(member_id: int, role_id: int) -> None:
+
+		VotingSys.set_member_roles(member_id, VotingSys.member_roles.get(member_id, frozenset()) | {role_id})
+
+
+	@staticmethod
+	def remove_member_role(member_id: int, role_id: int) -> None:
+
+		VotingSys.set_member_roles(member_id, VotingSys.member_roles.get(member_id, frozenset()) - {role_id})
+
+
+	@staticmethod
+	def remove_member(member_id: int) -> None:
+
+		VotingSys.set_member_roles(member_id, ())
+		del VotingSys.member_roles[member_id]
+		VotingSys.user_names.set_names(member_id, 'member', ())  # Their account name stays findable, they may come back.
+
+
+	@staticmethod
+	def remove_role(role_id: int) -> None:
+
+		for member_id in VotingSys.role_members.pop(role_id, set()):
+
+			VotingSys.member_roles[member_id] -= {role_id}
+
+
+	@staticmethod
+	def has_role(member_id: int, role_id: int) -> bool:
+
+		return role_id in VotingSys.member_roles.get(member_id, frozenset())
+
+
 	@staticmethod
 	def may_vote(member_id: int) -> bool:
 
@@ -118,7 +380,40 @@ class VotingSys:
 
 
 	@staticmethod
-	async def _tally_regional_votes(poll_answers: list[discord.PollAnswer]) -> dict[str, list[int]]:
+	def _count_vote(regional_votes: dict[str, list[int]], answer_text: str, voter_id: int) -> None:
+
+		region: str = VotingSys.users[voter_id].registered_at
+
+		if region not in regional_votes:
+
+			regional_votes[region] = [0, 0, 0]
+
+		regional_vote_tuple = regional_votes[region]
+
+		match answer_text.lower():
+
+			case 'yae':
+
+				regional_vote_tuple[voteEnum.YAE_ENUM] += 1 if VotingSys.may_vote(voter_id) else 0  # TODO roll may vote into single if statement.
+
+			case 'nay':
+
+				regional_vote_tuple[voteEnum.NAY_ENUM] += 1 if VotingSys.may_vote(voter_id) else 0
+
+			case 'abstain':
+
+				regional_vote_tuple[voteEnum.ABSTAIN_ENUM] += 1 if VotingSys.may_vote(voter_id) else 0
+			
+			case _:
+
+				pass
+
+
+	@staticmethod
+	async def _tally_regional_votes(poll_answers: list[discord.PollAnswer], poll_ballots: dict[int, int]) -> dict[str, list[int]]:
+		"""
+			The slow path, paging through every voter with the Discord API. The ballots we find are recorded as we go.
+		"""
 		
 		regional_votes: dict[str, list[int]] = dict()
 		
@@ -127,41 +422,61 @@ class VotingSys:
 
 			async for voter in answer.voters():
 
-				region: str = VotingSys.users[voter.id].registered_at
+				poll_ballots[voter.id] = answer.id
 
-				if region not in regional_votes:
+				VotingSys._count_vote(regional_votes, answer.text, voter.id)
+		
+		return regional_votes
 
-					regional_votes[region] = [0, 0, 0]
 
-				regional_vote_tuple = regional_votes[region]
+	@staticmethod
+	def _tally_ballots(poll_answers: list[discord.PollAnswer], poll_ballots: dict[int, int]) -> dict[str, list[int]]:
+		"""
+			The fast path, counting the ballots recorded from gateway events. No API calls are made.
+		"""
+
+		answer_texts: dict[int, str] = {answer.id: answer.text for answer in poll_answers}
+		regional_votes: dict[str, list[int]] = dict()
 
-				match answer.text.lower():
+		for voter_id, answer_id in poll_ballots.items():
 
-					case 'yae':
+			VotingSys._count_vote(regional_votes, answer_texts[answer_id], voter_id)
+
+		return regional_votes
 
-						regional_vote_tuple[voteEnum.YAE_ENUM] += 1 if VotingSys.may_vote(voter.id) else 0  # TODO roll may vote into single if statement.
 
-					case 'nay':
+	@staticmethod
+	def _ballots_match_poll(poll_answers: list[discord.PollAnswer], poll_ballots: dict[int, int]) -> bool:
+		"""
+			Our ballots can only be trusted if they agree with discord's own count for every answer. Votes cast while the
+			bot was offline are the usual reason they wouldn't.
+		"""
 
-						regional_vote_tuple[voteEnum.NAY_ENUM] += 1 if VotingSys.may_vote(voter.id) else 0
+		ballot_counts: collections.Counter[int] = collections.Counter(poll_ballots.values())
 
-					case 'abstain':
+		if sum(ballot_counts.values()) != sum(answer.vote_count for answer in poll_answers):
 
-						regional_vote_tuple[voteEnum.ABSTAIN_ENUM] += 1 if VotingSys.may_vote(voter.id) else 0
-					
-					case _:
+			return False
 
-						pass
-		
-		return regional_votes
+		return all(ballot_counts[answer.id] == answer.vote_count for answer in poll_answers)
 	
 
 	@staticmethod
-	async def tally_votes(poll: discord.Poll) -> dict[str, list[int]]:
+	async def tally_votes(poll: discord.Poll, message_id: int) -> dict[str, list[int]]:
 		
 		# ec_votes: dict[str, [int, int]] = dict()
 
-		regional_votes: dict[str, list[int]] = await VotingSys._tally_regional_votes(poll.answers)
+		poll_ballots: dict[int, int] = VotingSys.ballots.setdefault(message_id, dict())
+		regional_votes: dict[str, list[int]]
+
+		if VotingSys._ballots_match_poll(poll.answers, poll_ballots):
+
+			regional_votes = VotingSys._tally_ballots(poll.answers, poll_ballots)
+
+		else:
+
+			poll_ballots.clear()
+			regional_votes = await VotingSys._tally_regional_votes(poll.answers, poll_ballots)
 
 		# for region, votes in regional_votes.items():
 		#
@@ -204,9 +519,12 @@ class VotingSys:
 	@staticmethod
 	async def resolve(provision: ProvisionHistory, poll: discord.Poll) -> tuple[str, bool]:
 
-		ec_votes: dict[str, list[int]] = await VotingSys.tally_votes(poll)
+		message_id: int = int(provision.message_id)
+		ec_votes: dict[str, list[int]] = await VotingSys.tally_votes(poll, message_id)
 		did_pass: bool
 
+		VotingSys.ballots.pop(message_id, None)  # The poll is closed, no more votes will come in.
+
 		yae_total: int = sum(vote[voteEnum.YAE_ENUM] for vote in ec_votes.values())
 		nay_total: int = sum(vote[voteEnum.NAY_ENUM] for vote in ec_votes.values())
 		abstention_total: int = sum(vote[voteEnum.ABSTAIN_ENUM] for vote in ec_votes.values())
@@ -258,7 +576,8 @@ class VotingSys:
 
 		constitutional_votes: int = 0
 		unconstitutional_votes: int = 0
-		has_recusal: bool = VotingSys.users_by_name[challenge.original_proposer_name.lower()].is_judiciary
+		original_proposer: Users | None = VotingSys.user_by_account_name(challenge.original_proposer_name)
+		has_recusal: bool = original_proposer is not None and original_proposer.is_judiciary
 
 		answer: discord.PollAnswer
 		for answer in judicial_poll.answers:
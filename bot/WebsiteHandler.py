@@ -1,9 +1,21 @@
+import collections
+import json
 import requests
+import requests.adapters
+import urllib3.util.request
 
 from _init import *
 from http import HTTPStatus
 from django_modles_shadow import *
 
+try:
+
+    import msgpack
+
+except ImportError:
+
+    msgpack = None
+
 class WebsiteHandler:
     """
         This class is dedicated to implementing all API calls from the website. This class
@@ -18,6 +30,7 @@ class WebsiteHandler:
     GET_PROVISION_URL: str = f'{BASE_URL}get_provision'
     GET_USERS_URL: str = f'{BASE_URL}get_users'
     GET_ROLES_URL: str = f'{BASE_URL}get_roles'
+    GET_CHANGES_URL: str = f'{BASE_URL}get_changes'
     GET_RECOGNIZED_REGIONS_URL: str = f'{BASE_URL}get_recognized_regions'
     GET_TEMPORARY_POSITION_URL: str = f'{BASE_URL}get_temporary_position'
     GET_UPDATABLE_TEMPORARY_POSITIONS_URL: str = f'{BASE_URL}get_updatable_temporary_positions'
@@ -32,6 +45,10 @@ class WebsiteHandler:
     GET_PRICE_OF_CRACK_URL: str = f'{BASE_URL}get_price_of_crack'
     GET_LAST_PAYMENT_QUARTER_URL: str = f'{BASE_URL}get_last_payment_quarter'
     GET_DEBUG_INFLATION_URL: str = f'{BASE_URL}debug_inflation'
+    GET_CHANGE_EVENTS_URL: str = f'{BASE_URL}get_change_events'
+    GET_OPEN_POLL_BALLOTS_URL: str = f'{BASE_URL}get_open_poll_ballots'
+    ADD_POLL_BALLOT_URL: str = f'{BASE_URL}add_poll_ballot'
+    DELETE_POLL_BALLOT_URL: str = f'{BASE_URL}delete_poll_ballot'
     UPDATE_PROVISION_URL: str = f'{BASE_URL}update_provision'
     UPDATE_CONSTITUTION_URL: str = f'{BASE_URL}update_constitution'
     UPDATE_USER_URL: str = f'{BASE_URL}update_user'
@@ -41,13 +58,188 @@ class WebsiteHandler:
     ADD_CONSTITUTION_URL: str = f'{BASE_URL}add_constitution'
     ADD_ROLE_URL: str = f'{BASE_URL}add_role'
     ADD_USER_URL: str = f'{BASE_URL}add_user'
+    ADD_MANY_USERS_URL: str = f'{BASE_URL}add_many_users'
     ADD_JUDICIAL_CHALLENGE_URL: str = f'{BASE_URL}add_judicial_challenge'
     ADD_TEMPORARY_POSITION_URL: str = f'{BASE_URL}add_temporary_position'
     ADD_PURCHASE_LOG_URL: str = f'{BASE_URL}add_purchase_log'
+    TRANSFER_MONEY_URL: str = f'{BASE_URL}transfer_money'
+    RUN_PAYDAY_URL: str = f'{BASE_URL}run_payday'
     DELETE_TEMPORARY_POSITION_URL: str = f'{BASE_URL}delete_temporary_position'
 
+    UPDATE_MANY_BATCH_SIZE: int = 5000  # Users per update_many_users call, keeps each body well under django's 2.5MB upload limit.
+
     auth: dict[str, str] = {'auth_key': DB_KEY}  # TODO figure out how to make environment variables work on the website.
 
+    # Content negotiation, see votingapp/wire.py. MessagePack is asked for when it's installed, and the website falls back
+    # to JSON otherwise. Compression is whatever the HTTP client can decompress (gzip, and zstd when it's installed).
+    MSGPACK_CONTENT_TYPE: str = 'application/msgpack'
+    ACCEPT: str = f'{MSGPACK_CONTENT_TYPE}, application/json;q=0.9' if msgpack is not None else 'application/json'
+
+    # Conditional GETs, for what almost never changes but is pulled on every init and reconcile. The ETag of the last
+    # answer is sent back as If-None-Match, and a 304 builds fresh objects from the entries of that answer, without
+    # parsing anything. Never the objects handed out before, callers change those. Both handlers share the cache.
+    # Counters are per endpoint name.
+    CONDITIONAL_URLS: frozenset[str] = frozenset({GET_VOTING_RULES_URL, GET_ROLES_URL, GET_RECOGNIZED_REGIONS_URL, GET_FULL_CONSTITUTION_URL})
+    conditional_hits: collections.Counter[str] = collections.Counter()
+    conditional_misses: collections.Counter[str] = collections.Counter()
+    _conditional_cache: dict[str, tuple[str, list[dict[str, typing.Any]]]] = dict()  # url: (ETag, the entries of that answer)
+
+    # Connection pooling. Every call shares one keep-alive session, instead of opening a new TCP (and TLS) connection per call.
+    POOL_CONNECTIONS: int = 2  # Number of distinct hosts to keep pools for, we only ever talk to the website.
+    POOL_MAXSIZE: int = 10  # Number of connections kept alive per host.
+
+    # Timeouts are (connect, read) in seconds. Endpoints that move entire tables or do heavy work server side get more time.
+    DEFAULT_TIMEOUT: tuple[float, float] = (3.05, 10.0)
+    ENDPOINT_TIMEOUTS: dict[str, tuple[float, float]] = {
+        GET_USERS_URL: (3.05, 30.0),
+        GET_CHANGES_URL: (3.05, 30.0),  # A sync without a cursor is as large as get_users.
+        GET_FULL_CONSTITUTION_URL: (3.05, 30.0),
+        UPDATE_MANY_USERS_URL: (3.05, 60.0),
+        ADD_MANY_USERS_URL: (3.05, 60.0),
+        RUN_PAYDAY_URL: (3.05, 60.0),
+        GET_PRICE_OF_CRACK_URL: (3.05, 20.0),
+        GET_DEBUG_INFLATION_URL: (3.05, 20.0),
+        GET_CHANGE_EVENTS_URL: (3.05, 40.0),  # The website holds this open for up to 25 seconds waiting for an event.
+    }
+
+    _session: requests.Session | None = None
+
+
+    @staticmethod
+    def configure_session(pool_connections: int | None = None, pool_maxsize: int | None = None) -> requests.Session:
+        """
+            (Re)builds the shared session. Any existing session is closed, so this should only be called on startup, or
+            when the pool size needs to change.
+        """
+
+        if pool_connections is not None:
+
+            WebsiteHandler.POOL_CONNECTIONS = pool_connections
+
+        if pool_maxsize is not None:
+
+            WebsiteHandler.POOL_MAXSIZE = pool_maxsize
+
+        if WebsiteHandler._session is not None:
+
+            WebsiteHandler._session.close()
+
+        adapter: requests.adapters.HTTPAdapter = requests.adapters.HTTPAdapter(
+            pool_connections=WebsiteHandler.POOL_CONNECTIONS,
+            pool_maxsize=WebsiteHandler.POOL_MAXSIZE,
+            max_retries=0,  # POSTs are not idempotent, so we never silently retry them.
+        )
+
+        session: requests.Session = requests.Session()
+
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Connection': 'keep-alive', 'Accept': WebsiteHandler.ACCEPT, 'Accept-Encoding': urllib3.util.request.ACCEPT_ENCODING})
+
+        WebsiteHandler._session = session
+
+        return session
+
+
+    @staticmethod
+    def _get_session() -> requests.Session:
+        """
+            Returns the shared session, building it on first use.
+        """
+
+        if WebsiteHandler._session is None:
+
+            return WebsiteHandler.configure_session()
+
+        return WebsiteHandler._session
+
+
+    @staticmethod
+    def _timeout_for(url: str) -> tuple[float, float]:
+
+        return WebsiteHandler.ENDPOINT_TIMEOUTS.get(url, WebsiteHandler.DEFAULT_TIMEOUT)
+
+
+    @staticmethod
+    def _get(url: str, payload: dict[str, typing.Any] = dict(), headers: dict[str, str] = dict()) -> requests.Response:
+        """
+            All GET requests to the website go through here, so they share the pooled session. The auth key is added automatically.
+        """
+
+        return WebsiteHandler._get_session().get(url, json=payload | WebsiteHandler.auth, headers=headers, timeout=WebsiteHandler._timeout_for(url))
+
+
+    @staticmethod
+    def _post(url: str, payload: dict[str, typing.Any] = dict()) -> requests.Response:
+        """
+            All POST requests to the website go through here, so they share the pooled session. The auth key is added automatically.
+        """
+
+        return WebsiteHandler._get_session().post(url, json=payload | WebsiteHandler.auth, timeout=WebsiteHandler._timeout_for(url))
+
+
+    @staticmethod
+    def _body(response: requests.Response) -> typing.Any:
+        """
+            The decoded body of a response, in whichever format the website answered with. requests has already undone
+            the compression.
+        """
+
+        return WebsiteHandler._decode(response.headers.get('Content-Type', ''), response.content)
+
+
+    @staticmethod
+    def _decode(content_type: str, body: bytes) -> typing.Any:
+
+        if msgpack is not None and content_type.startswith(WebsiteHandler.MSGPACK_CONTENT_TYPE):
+
+            return msgpack.unpackb(body, strict_map_key=False)  # run_payday's 'paid' is keyed by amount.
+
+        return json.loads(body)
+
+
+    @staticmethod
+    def _if_none_match(url: str) -> dict[str, str]:
+
+        cached: tuple[str, list[dict[str, typing.Any]]] | None = WebsiteHandler._conditional_cache.get(url)
+
+        return {'If-None-Match': cached[0]} if cached is not None else dict()
+
+
+    @staticmethod
+    def _not_modified(url: str, model_object: type[V]) -> list[V]:
+
+        WebsiteHandler.conditional_hits[url.removeprefix(WebsiteHandler.BASE_URL)] += 1
+
+        return WebsiteHandler._many_jsons_to_objects(WebsiteHandler._conditional_cache[url][1], model_object)
+
+
+    @staticmethod
+    def _modified(url: str, etag: str | None, entries: list[dict[str, typing.Any]], model_object: type[V]) -> list[V]:
+        """
+            Decodes a full answer, and remembers its entries if it came from a conditional url.
+        """
+
+        if url in WebsiteHandler.CONDITIONAL_URLS:
+
+            WebsiteHandler.conditional_misses[url.removeprefix(WebsiteHandler.BASE_URL)] += 1
+
+            if etag is None:
+
+                WebsiteHandler._conditional_cache.pop(url, None)
+
+            else:
+
+                WebsiteHandler._conditional_cache[url] = (etag, entries)
+
+        return WebsiteHandler._many_jsons_to_objects(entries, model_object)
+
+
+    @staticmethod
+    def conditional_stats() -> dict[str, dict[str, int]]:
+
+        return {'hits': dict(WebsiteHandler.conditional_hits), 'misses': dict(WebsiteHandler.conditional_misses)}
+
 
     @staticmethod
     def _generic_get_single(url: str, model_object: type[V], filter_dict: dict[str, typing.Any] = dict()) -> V | None:
@@ -55,13 +247,17 @@ class WebsiteHandler:
             A generic function to handle all get requests for a single item from the database.
         """
 
-        response: requests.Response = requests.get(url, json=filter_dict | WebsiteHandler.auth)
+        response: requests.Response = WebsiteHandler._get(url, filter_dict, WebsiteHandler._if_none_match(url))
+
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+
+            return WebsiteHandler._not_modified(url, model_object)[0]
 
         if response.status_code != HTTPStatus.OK:
             print(f"Get single resource failure {url}", response.status_code)
             return None
 
-        return WebsiteHandler._json_to_object(response.json(), model_object())
+        return WebsiteHandler._modified(url, response.headers.get('ETag'), [WebsiteHandler._body(response)], model_object)[0]
 
 
     @staticmethod
@@ -70,7 +266,11 @@ class WebsiteHandler:
             A generic function to handle all get requests for multiple items from the database
         """
 
-        response: requests.Response = requests.get(url, json=WebsiteHandler.auth)
+        response: requests.Response = WebsiteHandler._get(url, headers=WebsiteHandler._if_none_match(url))
+
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+
+            return WebsiteHandler._not_modified(url, model_object)
 
         if response.status_code != HTTPStatus.OK:
 
@@ -80,9 +280,9 @@ class WebsiteHandler:
 
             return []
 
-        entries: list[dict[str, typing.Any]] = response.json()['data']  # TODO make 'data' a constant in model_shadows.
+        entries: list[dict[str, typing.Any]] = WebsiteHandler._body(response)['data']  # TODO make 'data' a constant in model_shadows.
 
-        return WebsiteHandler._many_jsons_to_objects(entries, model_object)
+        return WebsiteHandler._modified(url, response.headers.get('ETag'), entries, model_object)
 
 
     @staticmethod
@@ -91,7 +291,69 @@ class WebsiteHandler:
             A generic function to handle all post requests to the database.
         """
 
-        payload_dict: dict[str, typing.Any] = model.__dict__
+        fields: dict[str, typing.Any] = shadow_dict(model)
+        sent_hashes: dict[str, str] = Fingerprints.hashes(fields)
+
+        is_success: bool = WebsiteHandler._post(url, WebsiteHandler._model_payload(fields)).status_code == HTTPStatus.NO_CONTENT
+
+        if is_success:
+
+            Fingerprints.mark_fields_clean(model, sent_hashes)
+
+        return is_success
+
+
+    @staticmethod
+    def _generic_update_request(url: str, model: V) -> bool:
+        """
+            Like _generic_post_request, but only sends the fields changed since the object last matched the website, and
+            doesn't send anything if none have. See Fingerprints.
+        """
+
+        payload: dict[str, typing.Any] | None = Fingerprints.update_payload(model)
+
+        if payload is None:
+
+            return True
+
+        sent_hashes: dict[str, str] = Fingerprints.hashes(payload)
+        is_success: bool = WebsiteHandler._post(url, WebsiteHandler._model_payload(payload)).status_code == HTTPStatus.NO_CONTENT
+
+        if is_success:
+
+            Fingerprints.mark_fields_clean(model, sent_hashes)
+
+        return is_success
+
+
+    @staticmethod
+    def _update_payloads(models: typing.Iterable[V]) -> list[tuple[V, dict[str, typing.Any], dict[str, str]]]:
+        """
+            The update payload of every object that has changed, paired with the object, and the hashes of the fields sent
+            for Fingerprints.mark_fields_clean. Shared with AsyncWebsiteHandler.
+        """
+
+        payloads: list[tuple[V, dict[str, typing.Any], dict[str, str]]] = []
+
+        for model in models:
+
+            payload: dict[str, typing.Any] | None = Fingerprints.update_payload(model)
+
+            if payload is not None:
+
+                payloads.append((model, WebsiteHandler._model_payload(payload), Fingerprints.hashes(payload)))
+
+        return payloads
+
+
+    @staticmethod
+    def _model_payload(model: V | dict[str, typing.Any]) -> dict[str, typing.Any]:
+        """
+            Converts a shadow object (or some of its fields) into the JSON dictionary the website expects, without touching
+            the object. Shared with AsyncWebsiteHandler.
+        """
+
+        payload_dict: dict[str, typing.Any] = dict(model) if isinstance(model, dict) else shadow_dict(model)
 
         for key, value in payload_dict.items():
             #I often forgot to change the value to isoformat when uploading models, so it's better to do that automatically here.
@@ -100,29 +362,35 @@ class WebsiteHandler:
         
                 payload_dict[key] = value.isoformat()
 
-        return requests.post(url, json=(payload_dict | WebsiteHandler.auth)).status_code == HTTPStatus.NO_CONTENT
+        return payload_dict
 
 
     @staticmethod
-    def _json_to_object(json_dict: dict[str, typing.Any], model_object: V) -> V:
+    def _json_to_object(json_dict: dict[str, typing.Any], model_object: type[V], is_from_website: bool = True) -> V:
         """
-            A helper function to easily convert JSON dictionaries to our database shadow objects.
+            A helper function to easily convert JSON dictionaries to our database shadow objects. Raises ValueError for a
+            field the shadow doesn't have. Objects straight from the website are fingerprinted, as they're known to match it.
         """
 
-        for attribute, value in json_dict.items():
-
-            setattr(model_object, attribute, value)
-
-        return model_object
+        return WebsiteHandler._many_jsons_to_objects([json_dict], model_object, is_from_website)[0]
 
 
     @staticmethod
-    def _many_jsons_to_objects(entries: list[dict[str, typing.Any]], model_object: type[V]) -> list[V]:
+    def _many_jsons_to_objects(entries: list[dict[str, typing.Any]], model_object: type[V], is_from_website: bool = True) -> list[V]:
         """
-            A helper function to handle JSONS that contain multiple objects.
+            A helper function to handle JSONS that contain multiple objects, see decoder_for.
         """
 
-        return [WebsiteHandler._json_to_object(entry, model_object()) for entry in entries]
+        decode: typing.Callable[[dict[str, typing.Any]], V] = decoder_for(model_object)
+        objects: list[V] = [decode(entry) for entry in entries]
+
+        if is_from_website:
+
+            for model in objects:
+
+                Fingerprints.mark_clean(model)
+
+        return objects
 
 
     @staticmethod
@@ -170,6 +438,29 @@ class WebsiteHandler:
         return WebsiteHandler._generic_get_multiple(WebsiteHandler.GET_USERS_URL, Users)
 
 
+    @staticmethod
+    def get_changes(cursor: str | None) -> tuple[list[Users], list[Roles], str | None] | None:
+        """
+            Runs the website's API call to get every User and Role modified since the cursor (every one, if the cursor is None).
+            Returns the users, the roles, and the cursor to send next time, or None on failure.
+        """
+
+        response: requests.Response = WebsiteHandler._get(WebsiteHandler.GET_CHANGES_URL, {'since': cursor})
+
+        if response.status_code != HTTPStatus.OK:
+
+            print("Get changes failure", response.status_code)
+            return None
+
+        body: dict[str, typing.Any] = WebsiteHandler._body(response)
+
+        return (
+            WebsiteHandler._many_jsons_to_objects(body['data']['users'], Users),
+            WebsiteHandler._many_jsons_to_objects(body['data']['roles'], Roles),
+            body['cursor'],
+        )
+
+
     @staticmethod
     def get_full_constitution() -> typing.Iterable[Constitution]:
         """
@@ -275,6 +566,25 @@ class WebsiteHandler:
         return WebsiteHandler._generic_post_request(WebsiteHandler.ADD_USER_URL, user)
 
 
+    @staticmethod
+    def add_many_users(users: typing.Iterable[Users]) -> bool:
+        """
+            Runs the website's API call to add multiple users to the database, given a list of object shadows. Users that
+            already exist are skipped. Sent in batches of UPDATE_MANY_BATCH_SIZE, like update_many_users.
+        """
+
+        user_dicts: list[dict[str, typing.Any]] = [WebsiteHandler._model_payload(user) for user in users]
+        all_succeeded: bool = True
+
+        for start in range(0, len(user_dicts), WebsiteHandler.UPDATE_MANY_BATCH_SIZE):
+
+            payload: dict[str, typing.Any] = {'data': user_dicts[start:start + WebsiteHandler.UPDATE_MANY_BATCH_SIZE]}
+
+            all_succeeded &= WebsiteHandler._post(WebsiteHandler.ADD_MANY_USERS_URL, payload).status_code == HTTPStatus.NO_CONTENT
+
+        return all_succeeded
+
+
     @staticmethod
     def add_judicial_challenge(challenge: JudicialChallenges) -> bool:
         """
@@ -290,7 +600,7 @@ class WebsiteHandler:
             Runs the website's API call to update a ProvisionHistory object in the database, given the object shadow.
         """
 
-        return WebsiteHandler._generic_post_request(WebsiteHandler.UPDATE_PROVISION_URL, provision)
+        return WebsiteHandler._generic_update_request(WebsiteHandler.UPDATE_PROVISION_URL, provision)
 
 
     @staticmethod
@@ -299,7 +609,7 @@ class WebsiteHandler:
             Runs the website's API call to update a Constitution object in the database, given the object shadow.
         """
 
-        return WebsiteHandler._generic_post_request(WebsiteHandler.UPDATE_CONSTITUTION_URL, constitution)
+        return WebsiteHandler._generic_update_request(WebsiteHandler.UPDATE_CONSTITUTION_URL, constitution)
 
 
     @staticmethod
@@ -308,20 +618,80 @@ class WebsiteHandler:
             Runs the website's API call to update a User object in the database, given the object shadow.
         """
 
-        return WebsiteHandler._generic_post_request(WebsiteHandler.UPDATE_USER_URL, user)
+        return WebsiteHandler._generic_update_request(WebsiteHandler.UPDATE_USER_URL, user)
     
 
     @staticmethod
     def update_many_users(users: typing.Iterable[Users]) -> bool:
         """
             Runs the website's API call to update multiple user objects in the database, given a list of object shadows.
+            Large guilds are sent in batches of UPDATE_MANY_BATCH_SIZE, each of which the website applies atomically.
+            Users that haven't changed are left out, and the rest only send what changed, see Fingerprints.
+        """
+
+        user_payloads: list[tuple[Users, dict[str, typing.Any], dict[str, str]]] = WebsiteHandler._update_payloads(users)
+        all_succeeded: bool = True
+
+        for start in range(0, len(user_payloads), WebsiteHandler.UPDATE_MANY_BATCH_SIZE):
+
+            batch: list[tuple[Users, dict[str, typing.Any], dict[str, str]]] = user_payloads[start:start + WebsiteHandler.UPDATE_MANY_BATCH_SIZE]
+            payload: dict[str, typing.Any] = {'data': [user_dict for _, user_dict, _ in batch]}
+
+            if WebsiteHandler._post(WebsiteHandler.UPDATE_MANY_USERS_URL, payload).status_code != HTTPStatus.NO_CONTENT:
+
+                all_succeeded = False
+                continue
+
+            for user, _, sent_hashes in batch:
+
+                Fingerprints.mark_fields_clean(user, sent_hashes)
+
+        return all_succeeded
+
+
+    @staticmethod
+    def transfer_money(from_user_id: int, to_user_id: int, amount: int) -> tuple[int, list[Users]]:
         """
+            Runs the website's API call to move money from one user to another. The website checks the sender can afford
+            it, and changes both balances in one transaction. Returns the status code, and both users as they are
+            afterwards if it succeeded. 409 (conflict) means the sender lacks the funds.
+        """
+
+        payload: dict[str, typing.Any] = {'from_user_id': str(from_user_id), 'to_user_id': str(to_user_id), 'amount': amount}
+        response: requests.Response = WebsiteHandler._post(WebsiteHandler.TRANSFER_MONEY_URL, payload)
 
-        payload: dict[str, typing.Any] = dict()
+        if response.status_code != HTTPStatus.OK:
 
-        payload['data'] = [user.__dict__ for user in users]
+            return response.status_code, []
 
-        return requests.post(WebsiteHandler.UPDATE_MANY_USERS_URL, json=(payload | WebsiteHandler.auth)).status_code == HTTPStatus.OK
+        return response.status_code, WebsiteHandler._many_jsons_to_objects(WebsiteHandler._body(response)['data'], Users)
+
+
+    @staticmethod
+    def run_payday(member_roles: dict[int, typing.Iterable[int]], transactor_id: int) -> tuple[int, dict[int, list[int]]]:
+        """
+            Runs the website's API call to pay everybody, given every member's role ids. The website works out each
+            member's pay, and pays them all in one transaction. Returns the status code, and the ids of the users paid each
+            amount if it succeeded. 409 (conflict) means this quarter was already paid.
+        """
+
+        payload: dict[str, typing.Any] = {
+            'members': {str(member_id): [str(role_id) for role_id in role_ids] for member_id, role_ids in member_roles.items()},
+            'transactor_id': str(transactor_id),
+        }
+        response: requests.Response = WebsiteHandler._post(WebsiteHandler.RUN_PAYDAY_URL, payload)
+
+        if response.status_code != HTTPStatus.OK:
+
+            return response.status_code, dict()
+
+        return response.status_code, WebsiteHandler._paid_by_amount(WebsiteHandler._body(response)['data'])
+
+
+    @staticmethod
+    def _paid_by_amount(payday: dict[str, typing.Any]) -> dict[int, list[int]]:
+
+        return {int(pay): [int(user_id) for user_id in user_ids] for pay, user_ids in payday['paid'].items()}
 
 
     @staticmethod
@@ -330,7 +700,7 @@ class WebsiteHandler:
             Runs the website's API call to update a judicialchallenge object in the database, given the object shadow.
         """
 
-        return WebsiteHandler._generic_post_request(WebsiteHandler.UPDATE_JUDICIAL_CHALLENGES_URL, challenge)
+        return WebsiteHandler._generic_update_request(WebsiteHandler.UPDATE_JUDICIAL_CHALLENGES_URL, challenge)
 
 
     @staticmethod
@@ -353,13 +723,13 @@ class WebsiteHandler:
             Runs the website's API call to get the number of the next amendemnt.
         """
 
-        response: requests.Response = requests.get(WebsiteHandler.GET_NEXT_AMENDMENT_NUMBER_URL, json=WebsiteHandler.auth)
+        response: requests.Response = WebsiteHandler._get(WebsiteHandler.GET_NEXT_AMENDMENT_NUMBER_URL)
 
         if response.status_code != HTTPStatus.OK:
             print("Get Voting Rules failure", response.status_code)
             return 0
 
-        return int(response.json()['data'])
+        return int(WebsiteHandler._body(response)['data'])
     
 
     @staticmethod
@@ -406,7 +776,7 @@ class WebsiteHandler:
             Runs the website's API call to remove a temporary position from the database, given the objec shadow.
         """
 
-        response: requests.Response = requests.get(WebsiteHandler.DELETE_TEMPORARY_POSITION_URL, json={'user_id': temporary_position.user_id, 'role_id': temporary_position.role_id} | WebsiteHandler.auth)
+        response: requests.Response = WebsiteHandler._get(WebsiteHandler.DELETE_TEMPORARY_POSITION_URL, {'user_id': temporary_position.user_id, 'role_id': temporary_position.role_id})
 
         return response.status_code == HTTPStatus.NO_CONTENT
 
@@ -426,14 +796,14 @@ class WebsiteHandler:
             Runs the website's API call to get the last quarter in which an income payment was made.
         """
 
-        response: requests.Response = requests.get(WebsiteHandler.GET_LAST_PAYMENT_QUARTER_URL, json=WebsiteHandler.auth)
+        response: requests.Response = WebsiteHandler._get(WebsiteHandler.GET_LAST_PAYMENT_QUARTER_URL)
 
         if response.status_code != HTTPStatus.OK:
 
             print("Get last payment quarter failure.")
             return None
         
-        return response.json()['data']
+        return WebsiteHandler._body(response)['data']
 
 
     @staticmethod
@@ -442,14 +812,14 @@ class WebsiteHandler:
             Runs the website's API call to get the current price of crack.
         """
 
-        response: requests.Response = requests.get(WebsiteHandler.GET_PRICE_OF_CRACK_URL, json=WebsiteHandler.auth)
+        response: requests.Response = WebsiteHandler._get(WebsiteHandler.GET_PRICE_OF_CRACK_URL)
 
         if response.status_code != HTTPStatus.OK:
 
             print("get crack price failure...what a disaster")
             return None
     
-        return response.json()['data']
+        return WebsiteHandler._body(response)['data']
 
 
     @staticmethod
@@ -458,6 +828,52 @@ class WebsiteHandler:
             Runs the website's API call to get internal markers regarding the inflation operation.
         """
 
-        response: requests.Response = requests.get(WebsiteHandler.GET_DEBUG_INFLATION_URL, json={'data': base_price} | WebsiteHandler.auth)
+        response: requests.Response = WebsiteHandler._get(WebsiteHandler.GET_DEBUG_INFLATION_URL, {'data': base_price})
+
+        return WebsiteHandler._body(response)
+
+
+    @staticmethod
+    def get_change_events(cursor: int | None) -> tuple[list[ChangeEvent], int | None]:
+        """
+            Runs the website's API call to long-poll the change feed. Returns every event published after the cursor, and
+            the cursor to send next time. A cursor of None subscribes from now. On failure the returned cursor is None.
+        """
+
+        response: requests.Response = WebsiteHandler._get(WebsiteHandler.GET_CHANGE_EVENTS_URL, {'since': cursor})
+
+        if response.status_code != HTTPStatus.OK:
+
+            print("Get change events failure", response.status_code)
+            return [], None
+
+        body: dict[str, typing.Any] = WebsiteHandler._body(response)
+
+        return WebsiteHandler._many_jsons_to_objects(body['data'], ChangeEvent), body['cursor']
+
+
+    @staticmethod
+    def get_open_poll_ballots() -> typing.Iterable[PollBallot]:
+        """
+            Runs the website's API call to get every ballot cast on a provision poll that has not been resolved.
+        """
+
+        return WebsiteHandler._generic_get_multiple(WebsiteHandler.GET_OPEN_POLL_BALLOTS_URL, PollBallot)
+
+
+    @staticmethod
+    def add_poll_ballot(ballot: PollBallot) -> bool:
+        """
+            Runs the website's API call to record a vote on a provision poll, replacing the user's previous vote if there was one.
+        """
+
+        return WebsiteHandler._generic_post_request(WebsiteHandler.ADD_POLL_BALLOT_URL, ballot)
+
+
+    @staticmethod
+    def delete_poll_ballot(ballot: PollBallot) -> bool:
+        """
+            Runs the website's API call to remove a vote from a provision poll.
+        """
 
-        return response.json()
+        return WebsiteHandler._post(WebsiteHandler.DELETE_POLL_BALLOT_URL, {'message_id': ballot.message_id, 'user_id': ballot.user_id, 'answer_id': ballot.answer_id}).status_code == HTTPStatus.NO_CONTENT
@@ -0,0 +1,356 @@
+import asyncio
+import collections
+import datetime
+import itertools
+import sys
+import time
+
+from AsyncWebsiteHandler import AsyncWebsiteHandler
+from HeartbeatPipeline import HeartbeatPipeline
+from TextFormatting import TextFormatting
+from VotingSys import VotingSys
+from democracy import Democracybot
+from django_modles_shadow import *
+
+"""
+	Times how long each heartbeat stage takes to drain a backlog, the old way (one item at a time) against HeartbeatPipeline.
+
+	Discord and the website are replaced with fakes. Every fake discord call takes DISCORD_LATENCY and every website call
+	takes WEBSITE_LATENCY. Discord's route buckets are enforced the same way discord does: a call over its bucket's limit is
+	a 429, which costs a round trip, then waits for the bucket to reset, like discord.py does.
+
+	The polls have VOTERS_PER_ANSWER voters on each answer and no recorded ballots. Tallying them therefore pages through
+	voters with the API, which is the slow path a backlog after downtime takes.
+
+	Usage: "python bench_heartbeat_pipeline.py [backlog] [time scale]". Every latency and bucket window is multiplied by the
+	time scale, so the benchmark runs faster. Reported times are divided by it again, so they read as real seconds.
+"""
+
+DISCORD_LATENCY: float = 0.15
+WEBSITE_LATENCY: float = 0.05
+VOTERS_PER_ANSWER: int = 150
+VOTERS_PER_PAGE: int = 100  # The most discord returns per request.
+DISCORD_ROUTE_LIMITS: dict[str, tuple[int, float]] = dict(HeartbeatPipeline.ROUTE_LIMITS)  # Enforced by the fake, whatever the bot does.
+
+
+class FakeDiscord:
+
+	scale: float = 1.0
+	rate_limited: int = 0
+	_buckets: dict[tuple[str, int], collections.deque[float]] = dict()
+	_ids: typing.Iterator[int] = itertools.count(1)
+
+	@staticmethod
+	async def request(route: str, channel_id: int) -> None:
+
+		await asyncio.sleep(DISCORD_LATENCY * FakeDiscord.scale)
+
+		limit: tuple[int, float] | None = DISCORD_ROUTE_LIMITS.get(route)
+
+		if limit is None:
+
+			return
+
+		requests, per_seconds = limit
+		window: float = per_seconds * FakeDiscord.scale
+		history: collections.deque[float] = FakeDiscord._buckets.setdefault((route, channel_id), collections.deque())
+
+		while True:
+
+			while len(history) > 0 and time.monotonic() - history[0] >= window:
+
+				history.popleft()
+
+			if len(history) < requests:
+
+				history.append(time.monotonic())
+				return
+
+			FakeDiscord.rate_limited += 1
+			await asyncio.sleep(history[0] + window - time.monotonic())  # discord.py sleeps for retry_after, then retries.
+			await asyncio.sleep(DISCORD_LATENCY * FakeDiscord.scale)
+
+
+class FakeUser:
+
+	def __init__(self, user_id: int) -> None:
+
+		self.id = user_id
+		self.name = f'voter {user_id}'
+
+
+class FakeAnswer:
+
+	def __init__(self, answer_id: int, text: str, channel_id: int, voters: list[int]) -> None:
+
+		self.id = answer_id
+		self.text = text
+		self.vote_count = len(voters)
+		self._channel_id = channel_id
+		self._voters = voters
+
+	async def voters(self) -> typing.AsyncIterator[FakeUser]:
+
+		for start in range(0, len(self._voters), VOTERS_PER_PAGE):
+
+			await FakeDiscord.request('poll_voters', self._channel_id)
+
+			for voter_id in self._voters[start:start + VOTERS_PER_PAGE]:
+
+				yield FakeUser(voter_id)
+
+
+class FakePoll:
+
+	def __init__(self, answers: list[FakeAnswer]) -> None:
+
+		self.answers = answers
+		self.expires_at = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(days=3)
+
+	def is_finalized(self) -> bool:
+
+		return False
+
+	async def end(self) -> None:
+
+		await FakeDiscord.request('end_poll', 0)
+
+
+class FakeMessage:
+
+	def __init__(self, channel: 'FakeChannel', poll: FakePoll | None = None) -> None:
+
+		self.id = next(FakeDiscord._ids)
+		self.channel = channel
+		self.poll = poll
+		self.pinned = False
+
+	async def pin(self, reason: str = '') -> None:
+
+		await FakeDiscord.request('pins', self.channel.id)
+		self.pinned = True
+
+	async def unpin(self, reason: str = '') -> None:
+
+		await FakeDiscord.request('pins', self.channel.id)
+		self.pinned = False
+
+	async def reply(self, content: str) -> 'FakeMessage':
+
+		return await self.channel.send(content)
+
+	async def end_poll(self) -> None:
+
+		await FakeDiscord.request('end_poll', self.channel.id)
+
+
+class FakeChannel:
+
+	def __init__(self, channel_id: int) -> None:
+
+		self.id = channel_id
+		self.messages: dict[int, FakeMessage] = dict()
+		self.sent: list[str] = []
+
+	async def send(self, content: str = '', poll: typing.Any = None) -> FakeMessage:
+
+		await FakeDiscord.request('create_message', self.id)
+		message: FakeMessage = FakeMessage(self)
+		self.messages[message.id] = message
+		self.sent.append(content)
+
+		return message
+
+	async def fetch_message(self, message_id: int) -> FakeMessage:
+
+		await FakeDiscord.request('fetch_message', self.id)
+
+		return self.messages[message_id]
+
+
+class FakeWebsite:
+
+	unposted: list[ProvisionHistory] = []
+	resolvable: list[ProvisionHistory] = []
+	challenges: list[JudicialChallenges] = []
+	provisions: dict[int, ProvisionHistory] = dict()
+
+	@staticmethod
+	async def _call() -> None:
+
+		await asyncio.sleep(WEBSITE_LATENCY * FakeDiscord.scale)
+
+	@staticmethod
+	async def get_unposted_provisions() -> list[ProvisionHistory]:
+
+		await FakeWebsite._call()
+		return FakeWebsite.unposted
+
+	@staticmethod
+	async def get_resolvable_provisions() -> list[ProvisionHistory]:
+
+		await FakeWebsite._call()
+		return FakeWebsite.resolvable
+
+	@staticmethod
+	async def get_open_judicial_challenges() -> list[JudicialChallenges]:
+
+		await FakeWebsite._call()
+		return FakeWebsite.challenges
+
+	@staticmethod
+	async def get_provision(proposal_id: int) -> ProvisionHistory:
+
+		await FakeWebsite._call()
+		return FakeWebsite.provisions[proposal_id]
+
+	@staticmethod
+	async def update(*_: typing.Any) -> bool:
+
+		await FakeWebsite._call()
+		return True
+
+
+async def _sequential_run(items: typing.Iterable[typing.Any], steps: list[HeartbeatPipeline.Step], max_workers: int | None = None) -> None:
+	"""
+		How every stage used to run, one item and one await at a time.
+	"""
+
+	for item in items:
+
+		for step, _ in steps:
+
+			item = await step(item)
+
+			if item is None:
+
+				break
+
+
+def _setup(backlog: int) -> None:
+
+	FakeDiscord._buckets.clear()
+	FakeDiscord.rate_limited = 0
+	HeartbeatPipeline._route_history.clear()
+	HeartbeatPipeline._route_locks.clear()
+
+	Democracybot.voting_booth_channel = FakeChannel(1)  # type: ignore
+	Democracybot.judicial_review_channel = FakeChannel(2)  # type: ignore
+	Democracybot.warning_channel = FakeChannel(3)  # type: ignore
+
+	voter_ids: list[int] = list(range(1, 3 * VOTERS_PER_ANSWER + 1))
+	VotingSys.users.clear()
+	VotingSys.apply_users(Users(user_id=str(voter_id), name=f'voter {voter_id}', can_vote=True, registered_at='schmuckserver') for voter_id in voter_ids)
+	VotingSys.ballots.clear()
+	VotingSys.raw_number_of_judges = 3
+	VotingSys.number_of_judges = 3
+
+	FakeWebsite.unposted = [
+		ProvisionHistory(proposal_id=i, function_key='add_resolution', value1=f'resolution {i}', value2='') for i in range(backlog)
+	]
+	FakeWebsite.resolvable = []
+	FakeWebsite.challenges = []
+	FakeWebsite.provisions = dict()
+
+	for i in range(backlog):
+
+		voting_booth: FakeChannel = Democracybot.voting_booth_channel  # type: ignore
+		poll: FakePoll = FakePoll([
+			FakeAnswer(answer_id, text, voting_booth.id, voter_ids[(answer_id - 1) * VOTERS_PER_ANSWER:answer_id * VOTERS_PER_ANSWER])
+			for answer_id, text in [(1, 'Yae'), (2, 'Nay'), (3, 'Abstain')]
+		])
+		message: FakeMessage = FakeMessage(voting_booth, poll)
+		message.pinned = True
+		voting_booth.messages[message.id] = message
+
+		provision: ProvisionHistory = ProvisionHistory(
+			proposal_id=backlog + i, function_key='add_resolution', value1=f'resolution {i}', value2='', message_id=str(message.id), is_rigged=0,
+		)
+		FakeWebsite.resolvable.append(provision)
+		FakeWebsite.provisions[provision.proposal_id] = provision
+
+		judicial_review: FakeChannel = Democracybot.judicial_review_channel  # type: ignore
+		judicial_poll: FakePoll = FakePoll([FakeAnswer(1, 'constitutional', judicial_review.id, [1, 2]), FakeAnswer(2, 'unconstitutional', judicial_review.id, [3])])
+		judicial_message: FakeMessage = FakeMessage(judicial_review, judicial_poll)
+		judicial_message.pinned = True
+		judicial_review.messages[judicial_message.id] = judicial_message
+
+		FakeWebsite.challenges.append(JudicialChallenges(
+			is_active=True, challenged_proposal_number=provision.proposal_id, original_proposer_name=f'voter {len(voter_ids)}',  # Not a judge, so nobody recuses.
+			judicial_poll_id=str(judicial_message.id), is_for_existing_amendment=False, pinged_for_last_day=False,
+		))
+
+
+async def _time_stage(stage: typing.Callable[[], typing.Awaitable[None]]) -> tuple[float, int]:
+
+	FakeDiscord.rate_limited = 0
+	start: float = time.perf_counter()
+	await stage()
+
+	return (time.perf_counter() - start) / FakeDiscord.scale, FakeDiscord.rate_limited
+
+
+async def _run_stages(backlog: int) -> dict[str, tuple[float, int]]:
+
+	_setup(backlog)
+
+	# Each stage normally chains into the next, here they're timed separately, with the chaining done by hand.
+	stages: dict[str, typing.Callable[[], typing.Awaitable[None]]] = {
+		'post_provisions': lambda: HeartbeatPipeline.run(FakeWebsite.unposted, [
+			(Democracybot._send_provision_poll, True),
+			(Democracybot._finish_posting_provision, False),
+		]),
+		'resolve_constitutional_challenges': lambda: HeartbeatPipeline.run(FakeWebsite.challenges, [(Democracybot._resolve_challenge, False)]),
+		'resolve_polls': Democracybot.resolve_polls,
+	}
+
+	return {name: await _time_stage(stage) for name, stage in stages.items()}
+
+
+def run(backlog: int = 50, scale: float = 0.1) -> None:
+
+	FakeDiscord.scale = scale
+
+	Democracybot.functions = {
+		'add_resolution': ("enact the following resolution:", TextFormatting.named_value1, Democracybot.post_resolution),
+	}
+	Democracybot.agenda_channel = FakeChannel(4)  # type: ignore
+	TextFormatting.VOTER_ROLE_ID = '1'
+	VotingSys.rules = VotingRules(poll_availability_hours=24, tiebreaking_method=0)
+
+	AsyncWebsiteHandler.get_unposted_provisions = FakeWebsite.get_unposted_provisions  # type: ignore
+	AsyncWebsiteHandler.get_resolvable_provisions = FakeWebsite.get_resolvable_provisions  # type: ignore
+	AsyncWebsiteHandler.get_open_judicial_challenges = FakeWebsite.get_open_judicial_challenges  # type: ignore
+	AsyncWebsiteHandler.get_provision = FakeWebsite.get_provision  # type: ignore
+	AsyncWebsiteHandler.update_provision = FakeWebsite.update  # type: ignore
+	AsyncWebsiteHandler.update_judicial_challenge = FakeWebsite.update  # type: ignore
+
+	pipeline_run = HeartbeatPipeline.run
+	pipeline_route_limits: dict[str, tuple[int, float]] = HeartbeatPipeline.ROUTE_LIMITS
+
+	HeartbeatPipeline.run = _sequential_run  # type: ignore
+	HeartbeatPipeline.ROUTE_LIMITS = dict()  # The old code had no limiter of its own, only discord.py's reaction to 429s.
+	sequential: dict[str, tuple[float, int]] = asyncio.run(_run_stages(backlog))
+
+	HeartbeatPipeline.run = pipeline_run  # type: ignore
+	HeartbeatPipeline.ROUTE_LIMITS = {route: (requests, per_seconds * scale) for route, (requests, per_seconds) in pipeline_route_limits.items()}
+	pipelined: dict[str, tuple[float, int]] = asyncio.run(_run_stages(backlog))
+	HeartbeatPipeline.ROUTE_LIMITS = pipeline_route_limits
+
+	print(f"Draining a backlog of {backlog}, discord latency {DISCORD_LATENCY * 1000:.0f}ms, website latency {WEBSITE_LATENCY * 1000:.0f}ms, {HeartbeatPipeline.MAX_WORKERS} workers")
+
+	for name in sequential:
+
+		(old_seconds, old_429s), (new_seconds, new_429s) = sequential[name], pipelined[name]
+
+		print(f"{name:<36} sequential {old_seconds:7.2f}s ({old_429s:>3} 429s)   pipeline {new_seconds:7.2f}s ({new_429s:>3} 429s)   speedup {old_seconds / new_seconds:5.1f}x")
+
+	total_old: float = sum(seconds for seconds, _ in sequential.values())
+	total_new: float = sum(seconds for seconds, _ in pipelined.values())
+
+	print(f"{'whole update_sequence':<36} sequential {total_old:7.2f}s             pipeline {total_new:7.2f}s             speedup {total_old / total_new:5.1f}x")
+
+
+if __name__ == '__main__':
+
+	run(int(sys.argv[1]) if len(sys.argv) > 1 else 50, float(sys.argv[2]) if len(sys.argv) > 2 else 0.1)
@@ -0,0 +1,147 @@
+import dataclasses
+import datetime
+import gc
+import json
+import sys
+import time
+import tracemalloc
+import typing
+
+from django_modles_shadow import *
+from NameIndex import NameIndex
+
+"""
+	Compares decoding the website's users into shadows, and holding them, the old way (a plain dataclass filled with a
+	setattr per key, kept in VotingSys.users and again in a users_by_name dict), against the slotted shadows built by their
+	generated decoder, kept in VotingSys.users and the name index that replaced users_by_name. The slotted shadows are
+	also measured alone, as the name index does more than users_by_name did (prefixes, suggestions, discord names) and
+	is the larger part.
+
+	The JSON is what get_changes returns for a full sync. Usage: "python bench_shadow_decode.py [users]"
+"""
+
+REPEATS: int = 5
+
+
+@dataclasses.dataclass
+class LegacyUsers:
+	"""
+		Users as it was before the shadows were slotted.
+	"""
+
+	user_id: str = None
+	name: str = None
+	can_vote: bool = None
+	vote_fraction: float = None
+	registered_at: str = None
+	is_god_king: bool = None
+	is_judiciary: bool = None
+	vetoes: int = None
+	money: int = None
+	updated_at: datetime.datetime | str = None
+
+
+def _legacy_decode(entries: list[dict[str, typing.Any]]) -> dict[str, typing.Any]:
+
+	users: dict[int, LegacyUsers] = dict()
+	users_by_name: dict[str, LegacyUsers] = dict()
+
+	for entry in entries:
+
+		user: LegacyUsers = LegacyUsers()
+
+		for attribute, value in entry.items():
+
+			setattr(user, attribute, value)
+
+		users[int(user.user_id)] = user
+		users_by_name[user.name.lower()] = user
+
+	return {'users': users, 'users_by_name': users_by_name}
+
+
+def _slotted_decode(entries: list[dict[str, typing.Any]]) -> dict[str, typing.Any]:
+
+	decode: typing.Callable[[dict[str, typing.Any]], Users] = decoder_for(Users)
+	users: dict[int, Users] = dict()
+
+	for entry in entries:
+
+		user: Users = decode(entry)
+		users[int(user.user_id)] = user
+
+	return {'users': users}
+
+
+def _slotted_decode_and_index(entries: list[dict[str, typing.Any]]) -> dict[str, typing.Any]:
+
+	held: dict[str, typing.Any] = _slotted_decode(entries)
+	user_names: NameIndex = NameIndex()
+
+	for user_id, user in held['users'].items():
+
+		user_names.set_names(user_id, 'account', [user.name])  # As VotingSys._apply_user does.
+
+	return held | {'user_names': user_names}
+
+
+def _measure(entries: list[dict[str, typing.Any]], decode: typing.Callable[[list[dict[str, typing.Any]]], dict[str, typing.Any]]) -> tuple[float, int]:
+	"""
+		Best of REPEATS seconds to decode, and the bytes held by what was decoded. Memory is traced in a separate run, as
+		tracing slows every allocation down and would skew the timing.
+	"""
+
+	seconds: float = float('inf')
+
+	for _ in range(REPEATS):
+
+		gc.collect()
+		start: float = time.perf_counter()
+		held: dict[str, typing.Any] = decode(entries)
+		seconds = min(seconds, time.perf_counter() - start)
+
+		del held
+
+	gc.collect()
+	tracemalloc.start()
+
+	held = decode(entries)
+	retained: int = tracemalloc.get_traced_memory()[0]
+
+	tracemalloc.stop()
+
+	return seconds, retained
+
+
+def _payload(size: int) -> list[dict[str, typing.Any]]:
+
+	body: str = json.dumps({'data': {'users': [
+		{
+			'user_id': str(10 ** 17 + i), 'name': f'member{i}', 'can_vote': True, 'vote_fraction': 1.0, 'registered_at': 'Schmuckserver',
+			'is_god_king': False, 'is_judiciary': i % 50 == 0, 'vetoes': 0, 'money': i % 5000, 'updated_at': '2026-10-18T12:00:00.123456+00:00',
+		}
+		for i in range(size)
+	]}})
+
+	return json.loads(body)['data']['users']
+
+
+def run(size: int) -> None:
+
+	entries: list[dict[str, typing.Any]] = _payload(size)
+
+	legacy_seconds, legacy_bytes = _measure(entries, _legacy_decode)
+	slotted_seconds, slotted_bytes = _measure(entries, _slotted_decode)
+	indexed_seconds, indexed_bytes = _measure(entries, _slotted_decode_and_index)
+
+	print(f"{size} users, per object: LegacyUsers {sys.getsizeof(LegacyUsers()) + sys.getsizeof(LegacyUsers().__dict__)} bytes, Users {sys.getsizeof(Users())} bytes")
+	print(f"setattr decode, dict shadows and users_by_name   {legacy_seconds:7.3f}s   {legacy_bytes / 2 ** 20:7.1f} MiB held")
+	print(f"generated decode, slotted shadows alone          {slotted_seconds:7.3f}s   {slotted_bytes / 2 ** 20:7.1f} MiB held")
+	print(f"generated decode, slotted shadows and NameIndex  {indexed_seconds:7.3f}s   {indexed_bytes / 2 ** 20:7.1f} MiB held")
+	print(f"shadows alone: {legacy_seconds / slotted_seconds:.1f}x as fast, memory {slotted_bytes / legacy_bytes:.0%} of before")
+	print(f"with the name index: {legacy_seconds / indexed_seconds:.1f}x as fast, memory {indexed_bytes / legacy_bytes:.0%} of before")
+
+
+if __name__ == '__main__':
+
+	run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
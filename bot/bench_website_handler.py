@@ -0,0 +1,134 @@
+import http.server
+import json
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import requests
+
+from http import HTTPStatus
+from WebsiteHandler import WebsiteHandler
+from django_modles_shadow import *
+
+"""
+	Compares the per-call latency of the old behaviour (a fresh connection for every module level requests.get/post),
+	against the pooled keep-alive session WebsiteHandler now uses.
+
+	The website is replaced by a small local stand-in that answers the same way the django views do, so this can be run
+	without a database. Usage: "python bench_website_handler.py [calls]"
+"""
+
+VOTING_RULES_JSON: bytes = json.dumps({
+	'id': 1,
+	'registration_cooldown_hours': 24,
+	'accepting_new_registrations': True,
+	'voting_style': 0,
+	'poll_availability_hours': 24,
+	'tiebreaking_method': 0,
+	'is_sending_notifications': True,
+	'is_electoral_college_active': False,
+	'name_of_government': 'schmuckserver',
+	'name_of_judiciary': 'supreme court',
+	'allowed_open_proposals': 10,
+	'ubi_amount': 500,
+}).encode()
+
+
+class DjangoStandIn(http.server.BaseHTTPRequestHandler):
+	"""
+		Mimics the website's API closely enough for timing purposes. GETs answer with a VotingRules object, POSTs with
+		NO_CONTENT, just like the generic views do. HTTP/1.1 is required for keep-alive to work at all.
+	"""
+
+	protocol_version = 'HTTP/1.1'
+
+	def setup(self) -> None:
+
+		super().setup()
+		self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Like gunicorn, otherwise Nagle's algorithm dominates the timings.
+
+	def _read_body(self) -> None:
+
+		self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+	def do_GET(self) -> None:
+
+		self._read_body()
+		self.send_response(HTTPStatus.OK)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(VOTING_RULES_JSON)))
+		self.end_headers()
+		self.wfile.write(VOTING_RULES_JSON)
+
+	def do_POST(self) -> None:
+
+		self._read_body()
+		self.send_response(HTTPStatus.NO_CONTENT)
+		self.end_headers()
+
+	def log_message(self, format: str, *args: typing.Any) -> None:
+
+		pass
+
+
+def _time_calls(calls: int, func: typing.Callable[[], typing.Any]) -> list[float]:
+
+	timings: list[float] = []
+
+	for _ in range(calls):
+
+		start: float = time.perf_counter()
+		func()
+		timings.append((time.perf_counter() - start) * 1000)
+
+	return timings
+
+
+def _report(name: str, timings: list[float]) -> None:
+
+	print(f"{name:<28} mean {statistics.mean(timings):7.3f}ms   median {statistics.median(timings):7.3f}ms   p95 {sorted(timings)[int(len(timings) * 0.95)]:7.3f}ms")
+
+
+def run(calls: int = 500) -> None:
+
+	server: http.server.ThreadingHTTPServer = http.server.ThreadingHTTPServer(('127.0.0.1', 0), DjangoStandIn)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+
+	base_url: str = f'http://127.0.0.1:{server.server_address[1]}/voting/'
+	get_url: str = f'{base_url}get_voting_rules'
+	post_url: str = f'{base_url}update_user'
+
+	user: Users = Users(user_id='1', name='gug', money=100)
+
+	def old_get() -> None:
+
+		response: requests.Response = requests.get(get_url, json=WebsiteHandler.auth)
+		WebsiteHandler._json_to_object(response.json(), VotingRules)
+
+	def old_post() -> None:
+
+		requests.post(post_url, json=(shadow_dict(user) | WebsiteHandler.auth))
+
+	def pooled_get() -> None:
+
+		WebsiteHandler._generic_get_single(get_url, VotingRules)
+
+	def pooled_post() -> None:
+
+		WebsiteHandler._generic_post_request(post_url, user)
+
+	print(f"{calls} calls each against {base_url}")
+
+	_report("GET  per-call connection", _time_calls(calls, old_get))
+	_report("GET  pooled session", _time_calls(calls, pooled_get))
+	_report("POST per-call connection", _time_calls(calls, old_post))
+	_report("POST pooled session", _time_calls(calls, pooled_post))
+
+	server.shutdown()
+
+
+if __name__ == '__main__':
+
+	run(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
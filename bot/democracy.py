@@ -1,12 +1,18 @@
+import aiohttp
 import asyncio
 import datetime
 import discord
+import time
 import typing
 import zoneinfo
 
 from discord.ext import tasks, commands
+from http import HTTPStatus
 from TextFormatting import TextFormatting
+from AsyncWebsiteHandler import AsyncWebsiteHandler
 from WebsiteHandler import WebsiteHandler
+from HeartbeatPipeline import HeartbeatPipeline
+from Supervisor import Supervisor
 from VotingSys import VotingSys
 from django_modles_shadow import *
 
@@ -46,6 +52,23 @@ class Democracybot:
 	#semaphores TODO add semaphore for heartbeat sequence...maybe
 	RECONCILIATION_SEMAPHORE: asyncio.Semaphore = asyncio.Semaphore(value=1)
 
+	#heartbeat, woken by the website's change feed rather than run on a short timer.
+	HEARTBEAT_FALLBACK_SECONDS: float = 600  # Only catches purely time based work, such as the judicial last-day ping.
+	CHANGE_FEED_RETRY_SECONDS: float = 5
+	update_requested: asyncio.Event = asyncio.Event()
+	change_feed_cursor: int | None = None
+	scheduled_wakeups: dict[str, asyncio.TimerHandle] = dict()
+
+	#startup
+	started_at: float = time.monotonic()  # Reset by initialize, so it covers restarts too.
+	is_warm_start: bool = False
+	warm_start_refresh: asyncio.Task[None] | None = None  # Kept, so the refresh can't be garbage collected mid-run.
+	first_command_served: bool = False
+	is_voting_sys_loaded: bool = False
+
+	#constitution reconciliation
+	ROTUNDA_FETCH_ONE_BY_ONE: int = 10  # Up to this many messages are fetched by id, more are read as one window of history.
+
 	#misc
 	time_zone: zoneinfo.ZoneInfo = zoneinfo.ZoneInfo("America/New_York")
 
@@ -60,6 +83,9 @@ class Democracybot:
 			This function is not to be confused with the on_ready function, which does all the discord realated setup
 		"""
 
+		Democracybot.started_at = time.monotonic()
+		Democracybot.first_command_served = False
+
 		Democracybot.functions = {
 			'dissolve': ("dissolve the government.", TextFormatting.just_text, None),
 			'add_amend': ("amend our constitution by adding the following:", TextFormatting.named_value1, Democracybot.add_constitution),
@@ -67,20 +93,86 @@ class Democracybot:
 			'add_resolution': ("enact the following resolution:", TextFormatting.named_value1, Democracybot.post_resolution),
 		}
 
-		VotingSys.initialize()
+		asyncio.run(Supervisor.run(Democracybot.bot, TOKEN))
+
+
+	@staticmethod
+	@bot.event
+	async def setup_hook() -> None:
+		"""
+			Called by discord.py once the event loop is running, but before connecting to the gateway.
+
+			Anything that needs the website is set up here rather than in initialize, so it can use AsyncWebsiteHandler's
+			pooled session, which has to live on the bot's event loop.
+
+			If VotingSys has a snapshot from the last run, we start from that and refresh from the website in the background,
+			so connecting to discord (and serving commands) doesn't wait on the website. Otherwise we have to wait.
+
+			This runs again every time the Supervisor restarts the gateway session, by which point VotingSys is already
+			loaded and kept up to date, so there's nothing to do.
+		"""
+
+		if Democracybot.is_voting_sys_loaded:
+
+			return
+
+		Democracybot.is_voting_sys_loaded = True
+		Democracybot.is_warm_start = VotingSys.load_snapshot()
+
+		if Democracybot.is_warm_start:
+
+			TextFormatting.initialize(Democracybot.VOTER_ROLE_ID, VotingSys.rules.name_of_government, VotingSys.rules.name_of_judiciary)
+			Democracybot.warm_start_refresh = asyncio.create_task(Democracybot.refresh_voting_sys())
+
+		else:
+
+			await Democracybot.refresh_voting_sys()
+
+
+	@staticmethod
+	async def refresh_voting_sys() -> None:
+
+		try:
+
+			await VotingSys.initialize()
+
+		except Exception as e:
+
+			if not Democracybot.is_warm_start:
+
+				raise
+
+			print("Refresh after a warm start failed, still serving from the snapshot.", type(e), e)  # The next reconcile will catch up.
+			return
+
 		TextFormatting.initialize(Democracybot.VOTER_ROLE_ID, VotingSys.rules.name_of_government, VotingSys.rules.name_of_judiciary)
+		print(f"VotingSys refreshed {time.monotonic() - Democracybot.started_at:.2f}s after start")
+
+
+	@staticmethod
+	@bot.event
+	async def on_command_completion(ctx: commands.Context) -> None:  # type: ignore
+		"""
+			Reports how long after (re)starting the first command was served, the number startup work is judged by.
+		"""
+
+		if Democracybot.first_command_served:
+
+			return
+
+		Democracybot.first_command_served = True
+
+		print(f"First command ({ctx.command}) served {time.monotonic() - Democracybot.started_at:.2f}s after start, {'warm' if Democracybot.is_warm_start else 'cold'} start")
 
-		Democracybot.bot.run(TOKEN)
-	
 
 	@staticmethod
 	@bot.event 
 	async def on_error(event: str, *args, **kwargs) -> None: # type: ignore
 		"""
-			Override the discord handling so our reload code gets run.
+			Override the discord handling so the Supervisor can count failures.
 		"""
 
-		raise Exception
+		Supervisor.event_failed(event)
 
 
 	@staticmethod
@@ -107,9 +199,9 @@ class Democracybot:
 					role_to_add.vote_fraction = 1.0
 					role_to_add.is_political_party = False
 
-					WebsiteHandler.add_role(role_to_add)
+					await AsyncWebsiteHandler.add_role(role_to_add)
 
-			VotingSys.get_roles()
+			await VotingSys.get_changes()
 
 
 	@staticmethod
@@ -125,6 +217,7 @@ class Democracybot:
 		"""
 		async with Democracybot.RECONCILIATION_SEMAPHORE:
 
+			users_to_add: list[Users] = []  # Sent together at the end, a mass join used to be one request per member.
 			users_to_update: list[Users] = []
 
 			member: discord.Member
@@ -140,25 +233,26 @@ class Democracybot:
 					member_to_add.vote_fraction = 1.0
 					member_to_add.registered_at = TextFormatting.SCHMUCKSERVER_NAME
 					member_to_add.is_god_king = False
-					member_to_add.is_judiciary = any(True for justice in Democracybot.judiciary_role.members if member.id == justice.id)
+					member_to_add.is_judiciary = VotingSys.has_role(member.id, Democracybot.JUDICIARY_ROLE_ID)
 					member_to_add.vetoes = 0
 					member_to_add.money = 100
 
-					WebsiteHandler.add_user(member_to_add)
+					users_to_add.append(member_to_add)
 
 				else:
 
-					member_to_update: Users = Users()
+					# Our copy is fingerprinted, so update_many_users only sends the members whose name or judiciary changed.
+					member_to_update: Users = VotingSys.users[member.id]
 
-					member_to_update.user_id = str(member.id)
 					member_to_update.name = member.name
-					member_to_update.is_judiciary = any(True for justice in Democracybot.judiciary_role.members if member.id == justice.id)
+					member_to_update.is_judiciary = VotingSys.has_role(member.id, Democracybot.JUDICIARY_ROLE_ID)
 
 					users_to_update.append(member_to_update)
 
-			WebsiteHandler.update_many_users(users_to_update)
+			await AsyncWebsiteHandler.add_many_users(users_to_add)
+			await AsyncWebsiteHandler.update_many_users(users_to_update)
 
-			VotingSys.get_users()
+			await VotingSys.get_changes()
 
 
 	@staticmethod
@@ -170,39 +264,89 @@ class Democracybot:
 
 			This function is also responsible for posting unposted amendments, however this usually shouldn't be happening. Only during
 			the first startup of the bot with an empty channel, or when amendments are added ad-hoc.
+
+			Every amendment stores a hash of what its message was last made to say. An amendment whose text still hashes to
+			that is skipped without asking discord anything, so an hour with no edits costs no discord calls at all. Only
+			the messages of amendments that changed (or were never hashed) are fetched, by their recorded id.
 		"""
 
 		async with Democracybot.RECONCILIATION_SEMAPHORE:
 
-			full_constitution: typing.Iterable[Constitution] = WebsiteHandler.get_full_constitution()
-			full_message_history: dict[int, discord.Message] = {msg.id: msg async for msg in Democracybot.rotunda_channel.history()}
+			full_constitution: typing.Iterable[Constitution] = await AsyncWebsiteHandler.get_full_constitution()
 
 			if full_constitution == []:
 
 				return
 
+			stale_amendments: list[Constitution] = [
+				amendment for amendment in full_constitution
+				if amendment.message_id == '' or amendment.message_hash != TextFormatting.content_hash(TextFormatting.constitution_message(amendment))
+			]
+
+			messages: dict[int, discord.Message] = await Democracybot._fetch_rotunda_messages(
+				[int(amendment.message_id) for amendment in stale_amendments if amendment.message_id != '']
+			)
+
 			amendment: Constitution
-			for amendment in full_constitution:
+			for amendment in stale_amendments:
+
+				amendment_text: str = TextFormatting.constitution_message(amendment)
+				target_message: discord.Message | None = messages.get(int(amendment.message_id)) if amendment.message_id != '' else None
+
+				if target_message is None:  # Never posted, or its message was deleted.
+
+					async with HeartbeatPipeline.route('create_message', Democracybot.rotunda_channel.id):
+
+						target_message = await Democracybot.rotunda_channel.send(amendment_text)
 
-				if amendment.message_id != '':	# We need to post a new amendment.
+					amendment.message_id = str(target_message.id)
 
-					target_message: discord.Message = full_message_history[int(amendment.message_id)]
+				elif target_message.content != amendment_text:
 
-					amendment_text: str = TextFormatting.constitution_message(amendment)
+					await target_message.edit(content=amendment_text)
 
-					if target_message.content != amendment_text:
+				amendment.message_hash = TextFormatting.content_hash(amendment_text)
 
-						await target_message.edit(content=amendment_text)
+				await AsyncWebsiteHandler.update_constitution(amendment)
 
-				else:  # We need to ensure an existing amendment is up-to-date.
 
-					msg_text: str = TextFormatting.constitution_message(amendment)
+	@staticmethod
+	async def _fetch_rotunda_messages(message_ids: list[int]) -> dict[int, discord.Message]:
+		"""
+			Gets the rotunda's messages with these ids, leaving out any that were deleted. A few are fetched one by one, more
+			(E.G. the first reconcile after the hashes were added) are read from history between the oldest and newest of
+			them, a page per 100 messages. Either way, nothing outside the amendments we need is downloaded.
+		"""
+
+		if len(message_ids) == 0:
 
-					constitution_msg = await Democracybot.rotunda_channel.send(msg_text if not amendment.deprecated else f'~~{msg_text}~~')
+			return dict()
 
-					amendment.message_id = str(constitution_msg.id)
+		if len(message_ids) <= Democracybot.ROTUNDA_FETCH_ONE_BY_ONE:
 
-					WebsiteHandler.update_constitution(amendment)
+			messages: dict[int, discord.Message] = dict()
+
+			for message_id in message_ids:
+
+				try:
+
+					messages[message_id] = await Democracybot.rotunda_channel.fetch_message(message_id)
+
+				except discord.NotFound:
+
+					pass
+
+			return messages
+
+		wanted: set[int] = set(message_ids)
+
+		return {
+			message.id: message
+			async for message in Democracybot.rotunda_channel.history(
+				limit=None, after=discord.Object(min(wanted) - 1), before=discord.Object(max(wanted) + 1), oldest_first=True,
+			)
+			if message.id in wanted
+		}
 
 
 	@staticmethod
@@ -218,6 +362,7 @@ class Democracybot:
 			This also provided a convenient place in-code to store the actual sequence this function currently represents.
 
 			Unlike reconciliation, the order in which these functions are run matters, thus we call each from within the other.
+			Within a function, independent provisions and challenges are handled concurrently with HeartbeatPipeline.
 		"""
 
 		# post_provisions -> resolve_constitutional_challenges -> resolve_polls
@@ -234,43 +379,36 @@ class Democracybot:
 
 		async with Democracybot.RECONCILIATION_SEMAPHORE:
 
-			if moonPhaseQuarters.get_current_moon_quarter() != WebsiteHandler.get_last_payment_quarter():
+			if moonPhaseQuarters.get_current_moon_quarter() != await AsyncWebsiteHandler.get_last_payment_quarter():
 
-				total_payed_out: int = 0
+				# The website works out everybody's pay from their roles, and pays them all in one transaction. Member roles
+				# come from our index, which gateway events keep current, so nobody needs fetching.
+				member_roles: dict[int, frozenset[int]] = {
+					user_id: VotingSys.member_roles[user_id] for user_id in VotingSys.users if user_id in VotingSys.member_roles
+				}
 
-				user: Users
-				for user in VotingSys.users.values():
+				status, paid_by_amount = await AsyncWebsiteHandler.run_payday(member_roles, Democracybot.DEMOCRACYBOT_USER_ID)
 
-					max_salary: int = VotingSys.rules.ubi_amount
+				if status == HTTPStatus.CONFLICT:  # Somebody beat us to it.
 
-					discord_user: discord.Member | None = Democracybot.schmuckserver.get_member(int(user.user_id))
+					return
 
-					if discord_user is None:
+				if status != HTTPStatus.OK:
 
-						discord_user = await Democracybot.schmuckserver.fetch_member(int(user.user_id))
-					
-					discord_role: discord.Role
-					for discord_role in discord_user.roles:
-						
-						role: Roles = VotingSys.roles[discord_role.id]
+					await Democracybot.warning_channel.send(f"Payday failed, status {status}")
+					return
 
-						if role.salary is not None:
+				for pay, user_ids in paid_by_amount.items():
 
-							max_salary = max(max_salary, role.salary)
-				
-					user.money += max_salary
-					total_payed_out += max_salary
+					for user_id in user_ids:
 
-					WebsiteHandler.update_user(user)
+						user: Users = VotingSys.users[user_id]
+						dirty_fields: list[str] | None = Fingerprints.dirty_fields(user)
+						user.money += pay
 
-				income_payment: TransactionLog = TransactionLog(
-					transaction_type = transactionType.INCOME_PAYMENT,
-					transactor_id = str(Democracybot.DEMOCRACYBOT_USER_ID),
-					# transacted_at = datetime.datetime.now(tz=Democracybot.time_zone).isoformat(),
-					transaction_total = total_payed_out
-				)
-				
-				WebsiteHandler.add_purchase_log(income_payment)
+						if dirty_fields is not None and 'money' not in dirty_fields:  # Only then do we know the website's total is ours.
+
+							Fingerprints.mark_fields_clean(user, Fingerprints.hashes({'money': user.money}))
 
 
 	@staticmethod
@@ -292,8 +430,9 @@ class Democracybot:
 			await user.send(f"I must unfortunately inform you that your subscription to {role.name} could not be reupped. You just don't have the schmuckmark.")
 
 		await user.remove_roles(role)
+		VotingSys.remove_member_role(user.id, role.id)  # Commands can run before discord's member update arrives.
 
-		WebsiteHandler.delete_temporary_position(position)
+		await AsyncWebsiteHandler.delete_temporary_position(position)
 
 	
 	@staticmethod
@@ -301,7 +440,7 @@ class Democracybot:
 
 		if int(position.role_id) == Democracybot.HIGH_ROLE_ID:  # TODO Figure out good way to generalize
 
-			position.money_to_be_charged = WebsiteHandler.get_price_of_crack()
+			position.money_to_be_charged = await AsyncWebsiteHandler.get_price_of_crack()
 
 		user: Users | None = await Democracybot._get_internal_user(int(position.user_id))
 		
@@ -340,8 +479,8 @@ class Democracybot:
 
 		position.position_expires_at += timedelta(days=role.term_length_days)
 
-		WebsiteHandler.update_user(user)
-		WebsiteHandler.update_temporary_position(position)
+		await AsyncWebsiteHandler.update_user(user)
+		await AsyncWebsiteHandler.update_temporary_position(position)
 
 	
 	@staticmethod
@@ -360,7 +499,7 @@ class Democracybot:
 		async with Democracybot.RECONCILIATION_SEMAPHORE:
 
 			position: TemporaryPosition
-			for position in WebsiteHandler.get_updatable_temporary_positions():
+			for position in await AsyncWebsiteHandler.get_updatable_temporary_positions():
 
 				match position.action_when_expires:
 				
@@ -385,39 +524,57 @@ class Democracybot:
 			There is a known bug where, after an indeterminate amount of hours running, the creation of the Poll object will fail. I suspect
 			that this is the discord library experiencing a silenced internal error, as other functions break after this exception is thrown.
 			
-			This has been solved by the "run.py" file, which reloads this, and the discord libraries. That is why there is no try except clause
-			implemented in this function. We want the exception to stop execution in this case, as it is caught by "run.py"
+			This is handled by the Supervisor, which restarts the heartbeat loop, and the gateway session if it keeps failing. That is why there
+			is no try except clause implemented in this function. We want the exception to stop execution in this case, as it is caught there.
 		"""
 
-		provisions: typing.Iterable[ProvisionHistory] = WebsiteHandler.get_unposted_provisions()
+		provisions: typing.Iterable[ProvisionHistory] = await AsyncWebsiteHandler.get_unposted_provisions()
+
+		await HeartbeatPipeline.run(provisions, [
+			(Democracybot._send_provision_poll, True),  # Ordered, so polls appear in the order they were proposed.
+			(Democracybot._finish_posting_provision, False),
+		])
+
+		await Democracybot.resolve_constitutional_challenges()
+
+
+	@staticmethod
+	async def _send_provision_poll(provision: ProvisionHistory) -> tuple[ProvisionHistory, discord.Message, datetime.datetime, datetime.timedelta]:
 
-		provision: ProvisionHistory
-		for provision in provisions:
+		func_details: Democracybot.funcListEntry = Democracybot.functions[provision.function_key]
 
-			func_details: Democracybot.funcListEntry = Democracybot.functions[provision.function_key]
+		now: datetime.datetime = datetime.datetime.now(tz=Democracybot.time_zone)
+		polls_open_for: datetime.timedelta = datetime.timedelta(hours=VotingSys.rules.poll_availability_hours)
 
-			now: datetime.datetime = datetime.datetime.now(tz=Democracybot.time_zone)
-			polls_open_for: datetime.timedelta = datetime.timedelta(hours=VotingSys.rules.poll_availability_hours)
+		mes_text: str = func_details[Democracybot.FUNCTION_TEXT_FORMATTING_FUNCTION](func_details[Democracybot.FUNCTION_TEXT], provision)
 
-			mes_text: str = func_details[Democracybot.FUNCTION_TEXT_FORMATTING_FUNCTION](func_details[Democracybot.FUNCTION_TEXT], provision)
+		posting_poll: discord.Poll = discord.Poll(question=TextFormatting.POLL_TEXT, multiple=False, duration=polls_open_for)
 
-			posting_poll: discord.Poll = discord.Poll(question=TextFormatting.POLL_TEXT, multiple=False, duration=polls_open_for)
+		posting_poll.add_answer(text='Yae', emoji='✅')
+		posting_poll.add_answer(text='Nay', emoji='❎')
+		posting_poll.add_answer(text='Abstain', emoji='🤷')
 
-			posting_poll.add_answer(text='Yae', emoji='✅')
-			posting_poll.add_answer(text='Nay', emoji='❎')
-			posting_poll.add_answer(text='Abstain', emoji='🤷')
+		async with HeartbeatPipeline.route('create_message', Democracybot.voting_booth_channel.id):
 
 			sent_msg: discord.Message = await Democracybot.voting_booth_channel.send(content=mes_text, poll=posting_poll)
 
-			await sent_msg.pin(reason="New vote, pinning for easy access.")
+		return provision, sent_msg, now, polls_open_for
+
 
-			provision.proposed_at = now.isoformat()
-			provision.polls_close_at = (now + polls_open_for).isoformat()
-			provision.message_id = str(sent_msg.id)
+	@staticmethod
+	async def _finish_posting_provision(posted: tuple[ProvisionHistory, discord.Message, datetime.datetime, datetime.timedelta]) -> None:
 
-			WebsiteHandler.update_provision(provision)
+		provision, sent_msg, now, polls_open_for = posted
 
-		await Democracybot.resolve_constitutional_challenges()
+		async with HeartbeatPipeline.route('pins', Democracybot.voting_booth_channel.id):
+
+			await sent_msg.pin(reason="New vote, pinning for easy access.")
+
+		provision.proposed_at = now.isoformat()
+		provision.polls_close_at = (now + polls_open_for).isoformat()
+		provision.message_id = str(sent_msg.id)
+
+		await AsyncWebsiteHandler.update_provision(provision)
 	
 	
 	@staticmethod
@@ -432,7 +589,7 @@ class Democracybot:
 			unconstitutional.
 		"""
 
-		provision: ProvisionHistory | None = WebsiteHandler.get_provision(challenge.challenged_proposal_number)
+		provision: ProvisionHistory | None = await AsyncWebsiteHandler.get_provision(challenge.challenged_proposal_number)
 
 		if provision is None:
 
@@ -462,12 +619,16 @@ class Democracybot:
 			
 			if voting_message.pinned:
 
-				await voting_message.unpin(reason="Ruled unconstitutional, ending the poll.")
+				async with HeartbeatPipeline.route('pins', Democracybot.voting_booth_channel.id):
+
+					await voting_message.unpin(reason="Ruled unconstitutional, ending the poll.")
+
+		await AsyncWebsiteHandler.update_provision(provision)
+		await AsyncWebsiteHandler.update_judicial_challenge(challenge)
 
-		WebsiteHandler.update_provision(provision)
-		WebsiteHandler.update_judicial_challenge(challenge)
+		async with HeartbeatPipeline.route('create_message', Democracybot.voting_booth_channel.id):
 
-		await Democracybot.voting_booth_channel.send(message_to_send)
+			await Democracybot.voting_booth_channel.send(message_to_send)
 
 	
 	@staticmethod
@@ -482,7 +643,7 @@ class Democracybot:
 			unconstitutional.
 		"""
 
-		amendment: Constitution | None = WebsiteHandler.get_constitution(challenge.challenged_proposal_number)
+		amendment: Constitution | None = await AsyncWebsiteHandler.get_constitution(challenge.challenged_proposal_number)
 
 		if amendment is None:
 
@@ -510,9 +671,11 @@ class Democracybot:
 
 			message_to_send = unconstitutional_message
 		
-		WebsiteHandler.update_judicial_challenge(challenge)
+		await AsyncWebsiteHandler.update_judicial_challenge(challenge)
 		
-		await Democracybot.voting_booth_channel.send(message_to_send)
+		async with HeartbeatPipeline.route('create_message', Democracybot.voting_booth_channel.id):
+
+			await Democracybot.voting_booth_channel.send(message_to_send)
 
 
 	@staticmethod
@@ -522,56 +685,66 @@ class Democracybot:
 			(calculated in on_ready), tally the votes. React accordingly, and update the database model.
 		"""
 
-		judicial_challenges: typing.Iterable[JudicialChallenges] = WebsiteHandler.get_open_judicial_challenges()
+		judicial_challenges: typing.Iterable[JudicialChallenges] = await AsyncWebsiteHandler.get_open_judicial_challenges()
+
+		await HeartbeatPipeline.run(judicial_challenges, [(Democracybot._resolve_challenge, False)])  # Each challenge is independent.
+
+		await Democracybot.resolve_polls()
+
+
+	@staticmethod
+	async def _resolve_challenge(challenge: JudicialChallenges) -> None:
 
-		challenge: JudicialChallenges
-		for challenge in judicial_challenges:
+		judicial_message: discord.Message  = await Democracybot.judicial_review_channel.fetch_message(int(challenge.judicial_poll_id))
+		judicial_poll: discord.Poll | None = judicial_message.poll
 
-			judicial_message: discord.Message  = await Democracybot.judicial_review_channel.fetch_message(int(challenge.judicial_poll_id))
-			judicial_poll: discord.Poll | None = judicial_message.poll
+		if judicial_poll is None or judicial_poll.expires_at is None:  # We catch "expires_at is None" here as an error, as no uploaded poll should be stateless.
 
-			if judicial_poll is None or judicial_poll.expires_at is None:  # We catch "expires_at is None" here as an error, as no uploaded poll should be stateless.
+			async with HeartbeatPipeline.route('create_message', Democracybot.warning_channel.id):
 
 				await Democracybot.warning_channel.send(f"Judicial poll for poll id#{challenge.judicial_poll_id} was not found. Fix it.")
-				continue
 
-			is_closable: bool
-			is_constitutional: bool
-			constitutional_votes: int
-			unconstitutional_votes: int
+			return
 
-			tomorrow: datetime.datetime = datetime.datetime.now(tz=judicial_poll.expires_at.tzinfo) + datetime.timedelta(hours=24)
+		is_closable: bool
+		is_constitutional: bool
+		constitutional_votes: int
+		unconstitutional_votes: int
 
-			is_closable, is_constitutional, constitutional_votes, unconstitutional_votes = await VotingSys.tally_challenge(challenge, judicial_poll)
+		tomorrow: datetime.datetime = datetime.datetime.now(tz=judicial_poll.expires_at.tzinfo) + datetime.timedelta(hours=24)
 
-			if not is_closable:
-				
-				if not challenge.pinged_for_last_day and judicial_poll.expires_at <= tomorrow:
+		is_closable, is_constitutional, constitutional_votes, unconstitutional_votes = await VotingSys.tally_challenge(challenge, judicial_poll)
+
+		if not is_closable:
+			
+			if not challenge.pinged_for_last_day and judicial_poll.expires_at <= tomorrow:
+
+				async with HeartbeatPipeline.route('create_message', Democracybot.judicial_review_channel.id):
 
 					await judicial_message.reply(TextFormatting.judicial_challenge_ping(Democracybot.JUDICIARY_ROLE_ID))
 
-					challenge.pinged_for_last_day = True
-					WebsiteHandler.update_judicial_challenge(challenge)
+				challenge.pinged_for_last_day = True
+				await AsyncWebsiteHandler.update_judicial_challenge(challenge)
 
-				continue
+			return
 
-			if not judicial_poll.is_finalized():
+		if not judicial_poll.is_finalized():
 
-				await judicial_poll.end()
-			
-			if judicial_message.pinned:
+			await judicial_poll.end()
+		
+		if judicial_message.pinned:
 
-				await judicial_message.unpin(reason="Decision is reached, poll ended.")
+			async with HeartbeatPipeline.route('pins', Democracybot.judicial_review_channel.id):
 
-			if challenge.is_for_existing_amendment:
+				await judicial_message.unpin(reason="Decision is reached, poll ended.")
 
-				await Democracybot._resolve_amendment_challenge(challenge, is_constitutional, constitutional_votes, unconstitutional_votes)
+		if challenge.is_for_existing_amendment:
 
-			else:
+			await Democracybot._resolve_amendment_challenge(challenge, is_constitutional, constitutional_votes, unconstitutional_votes)
 
-				await Democracybot._resolve_provision_challenge(challenge, is_constitutional, constitutional_votes, unconstitutional_votes)
+		else:
 
-		await Democracybot.resolve_polls()
+			await Democracybot._resolve_provision_challenge(challenge, is_constitutional, constitutional_votes, unconstitutional_votes)
 
 
 	@staticmethod
@@ -581,38 +754,66 @@ class Democracybot:
 			access the function list to dynamically enact the provision (should the provision have an effect, and the poll passed).
 		"""
 
-		provisions: typing.Iterable[ProvisionHistory] = WebsiteHandler.get_resolvable_provisions()
-		
-		provision: ProvisionHistory
-		for provision in provisions:
+		provisions: typing.Iterable[ProvisionHistory] = await AsyncWebsiteHandler.get_resolvable_provisions()
 
-			func_details: Democracybot.funcListEntry = Democracybot.functions[provision.function_key]
-			message: discord.Message = await Democracybot.voting_booth_channel.fetch_message(int(provision.message_id))
-			poll: discord.Poll | None = message.poll
+		await HeartbeatPipeline.run(provisions, [
+			(Democracybot._tally_provision, False),
+			(Democracybot._enact_provision, True),  # Ordered, as enacting can depend on what was enacted before, E.G. amendment numbers.
+			(Democracybot._announce_provision_result, False),
+		])
 
-			if poll is None:
-				
-				print("DISCORD ERROR: Poll not obtainable from message in resolve_polls!")
-				continue
 
-			message_to_send, did_pass = await VotingSys.resolve(provision, poll)
+	@staticmethod
+	async def _tally_provision(provision: ProvisionHistory) -> tuple[ProvisionHistory, discord.Message, str] | None:
 
-			provision.passed = did_pass
+		message: discord.Message = await Democracybot.voting_booth_channel.fetch_message(int(provision.message_id))
+		poll: discord.Poll | None = message.poll
 
-			if did_pass:
+		if poll is None:
+			
+			print("DISCORD ERROR: Poll not obtainable from message in resolve_polls!")
+			return None
 
-				resolve_func: typing.Callable[[typing.Any, typing.Any], typing.Any] | None = func_details[Democracybot.RESOLVE_FUNCTION]
+		message_to_send, did_pass = await VotingSys.resolve(provision, poll)
 
-				if resolve_func is not None:
+		provision.passed = did_pass
 
-					await resolve_func(provision.value1, provision.value2)
-			
-			if message.pinned:
+		return provision, message, message_to_send
+
+
+	@staticmethod
+	async def _enact_provision(tallied: tuple[ProvisionHistory, discord.Message, str]) -> tuple[ProvisionHistory, discord.Message, str]:
+
+		provision: ProvisionHistory = tallied[0]
+		func_details: Democracybot.funcListEntry = Democracybot.functions[provision.function_key]
+
+		if provision.passed:
+
+			resolve_func: typing.Callable[[typing.Any, typing.Any], typing.Any] | None = func_details[Democracybot.RESOLVE_FUNCTION]
+
+			if resolve_func is not None:
+
+				await resolve_func(provision.value1, provision.value2)
+
+		return tallied
+
+
+	@staticmethod
+	async def _announce_provision_result(tallied: tuple[ProvisionHistory, discord.Message, str]) -> None:
+
+		provision, message, message_to_send = tallied
+
+		if message.pinned:
+
+			async with HeartbeatPipeline.route('pins', Democracybot.voting_booth_channel.id):
 
 				await message.unpin(reason="Poll window closed. Voting ended.")
 
+		async with HeartbeatPipeline.route('create_message', Democracybot.voting_booth_channel.id):
+
 			await message.reply(message_to_send)
-			WebsiteHandler.update_provision(provision)
+
+		await AsyncWebsiteHandler.update_provision(provision)
 
 
 	@staticmethod
@@ -631,15 +832,19 @@ class Democracybot:
 		new_constitution: Constitution = Constitution()
 		new_constitution.amendment_text = value1
 
-		new_constitution.amendment_number = WebsiteHandler.get_next_amendment_number()
+		new_constitution.amendment_number = await AsyncWebsiteHandler.get_next_amendment_number()
 
-		message = await Democracybot.rotunda_channel.send(TextFormatting.constitution_message(new_constitution))
+		new_constitution.deprecated = False
+		amendment_text: str = TextFormatting.constitution_message(new_constitution)
 
-		new_constitution.message_id = str(message.id)
+		async with HeartbeatPipeline.route('create_message', Democracybot.rotunda_channel.id):
 
-		new_constitution.deprecated = False
+			message = await Democracybot.rotunda_channel.send(amendment_text)
+
+		new_constitution.message_id = str(message.id)
+		new_constitution.message_hash = TextFormatting.content_hash(amendment_text)  # Of what we sent, as reconcile_constitution compares, not discord's echo of it.
 
-		WebsiteHandler.add_constitution(new_constitution)
+		await AsyncWebsiteHandler.add_constitution(new_constitution)
 	
 
 	@staticmethod
@@ -656,7 +861,7 @@ class Democracybot:
 			I.E. not waiting for a "reconcile" cycle, and then update the django database entry.
 		"""
 
-		target_constitution: Constitution | None = WebsiteHandler.get_constitution(amendment_number=int(value1))
+		target_constitution: Constitution | None = await AsyncWebsiteHandler.get_constitution(amendment_number=int(value1))
 
 		if target_constitution is None:
 
@@ -664,12 +869,15 @@ class Democracybot:
 			return
 
 		target_constitution.deprecated = True
+		amendment_text: str = TextFormatting.constitution_message(target_constitution)
 
 		target_message: discord.Message = await Democracybot.rotunda_channel.fetch_message(int(target_constitution.message_id))
 
-		await target_message.edit(content=TextFormatting.constitution_message(target_constitution))
+		await target_message.edit(content=amendment_text)
 
-		WebsiteHandler.update_constitution(target_constitution)
+		target_constitution.message_hash = TextFormatting.content_hash(amendment_text)
+
+		await AsyncWebsiteHandler.update_constitution(target_constitution)
 
 
 	@staticmethod
@@ -683,7 +891,9 @@ class Democracybot:
 			Simply posts the text in the appropriate channel.
 		"""
 
-		await Democracybot.agenda_channel.send(content=value1)
+		async with HeartbeatPipeline.route('create_message', Democracybot.agenda_channel.id):
+
+			await Democracybot.agenda_channel.send(content=value1)
 
 
 	@staticmethod
@@ -705,15 +915,28 @@ class Democracybot:
 
 		Democracybot.schmuckserver = schmuckserver_hold
 
-		voting_booth_channel_hold = await Democracybot.bot.fetch_channel(Democracybot.VOTING_BOOTH_ID)
-		judicial_review_channel_hold = await Democracybot.bot.fetch_channel(Democracybot.JUDICIAL_REVIEW_ID)
-		agenda_channel_hold = await Democracybot.bot.fetch_channel(Democracybot.AGENDA_ID)
-		rotunda_channel_hold = await Democracybot.bot.fetch_channel(Democracybot.ROTUNDA_ID)
-		warning_channel_hold = await Democracybot.bot.fetch_channel(Democracybot.WARNING_CHANNEL_ID)
-		voter_role_hold: discord.Role | None = await Democracybot.schmuckserver.fetch_role(Democracybot.VOTER_ROLE_ID)
-		judiciary_role_hold: discord.Role | None = await Democracybot.schmuckserver.fetch_role(Democracybot.JUDICIARY_ROLE_ID)
-		high_role_hold: discord.Role | None = await Democracybot.schmuckserver.fetch_role(Democracybot.HIGH_ROLE_ID)
-		blessed_role_hold: discord.Role | None = await Democracybot.schmuckserver.fetch_role(Democracybot.BLESSED_ROLE_ID)
+		# None of these depend on each other, so they're fetched all at once.
+		(
+			voting_booth_channel_hold,
+			judicial_review_channel_hold,
+			agenda_channel_hold,
+			rotunda_channel_hold,
+			warning_channel_hold,
+			voter_role_hold,
+			judiciary_role_hold,
+			high_role_hold,
+			blessed_role_hold,
+		) = await asyncio.gather(
+			Democracybot.bot.fetch_channel(Democracybot.VOTING_BOOTH_ID),
+			Democracybot.bot.fetch_channel(Democracybot.JUDICIAL_REVIEW_ID),
+			Democracybot.bot.fetch_channel(Democracybot.AGENDA_ID),
+			Democracybot.bot.fetch_channel(Democracybot.ROTUNDA_ID),
+			Democracybot.bot.fetch_channel(Democracybot.WARNING_CHANNEL_ID),
+			Democracybot.schmuckserver.fetch_role(Democracybot.VOTER_ROLE_ID),
+			Democracybot.schmuckserver.fetch_role(Democracybot.JUDICIARY_ROLE_ID),
+			Democracybot.schmuckserver.fetch_role(Democracybot.HIGH_ROLE_ID),
+			Democracybot.schmuckserver.fetch_role(Democracybot.BLESSED_ROLE_ID),
+		)
 
 		assert isinstance(voting_booth_channel_hold, discord.TextChannel) and \
 				isinstance(judicial_review_channel_hold, discord.TextChannel) and \
@@ -735,14 +958,108 @@ class Democracybot:
 		Democracybot.high_role = high_role_hold
 		Democracybot.blessed_role = blessed_role_hold
 
-		VotingSys.raw_number_of_judges = len(Democracybot.judiciary_role.members)
+		VotingSys.index_member_roles(Democracybot.schmuckserver.members)  # Rebuilt, as member events may have been missed while disconnected.
+
+		Democracybot._count_judges()
+
+		Democracybot.request_update()  # Catch up on anything that happened while we were offline.
+
+		# on_ready runs again after every reconnect, loops that are still running are left alone.
+		Supervisor.start_loop('post_and_resolve', Democracybot.post_and_resolve)
+		Supervisor.start_loop('watch_changes', Democracybot.watch_changes)
+		Supervisor.start_loop('reconcile', Democracybot.reconcile)
+		Supervisor.gateway_ready()
+
+		print(f"Ready {time.monotonic() - Democracybot.started_at:.2f}s after start, {'warm' if Democracybot.is_warm_start else 'cold'} start")
+
+
+	@staticmethod
+	def _count_judges() -> None:
+
+		VotingSys.raw_number_of_judges = len(VotingSys.role_members.get(Democracybot.JUDICIARY_ROLE_ID, ()))
 
 		VotingSys.number_of_judges = VotingSys.raw_number_of_judges + (0 if VotingSys.raw_number_of_judges & 1 else 1)
 
 		print(f"There are {VotingSys.number_of_judges} acting judges, and {VotingSys.raw_number_of_judges} judges")
 
-		Democracybot.post_and_resolve.start()
-		Democracybot.reconcile.start()
+
+	@staticmethod
+	@bot.event
+	async def on_member_update(before: discord.Member, after: discord.Member) -> None:
+		"""
+			Keeps VotingSys' role membership index current, which is what "does this member hold this role" is answered from,
+			along with their server nickname.
+		"""
+
+		if before.guild.id != Democracybot.SCHMUCKSERVER_ID:
+
+			return
+
+		if before.nick != after.nick:
+
+			VotingSys.set_member_names(after)
+
+		if before.roles == after.roles:
+
+			return
+
+		was_judge: bool = VotingSys.has_role(after.id, Democracybot.JUDICIARY_ROLE_ID)
+
+		VotingSys.set_member_roles(after.id, (role.id for role in after.roles))
+
+		if was_judge != VotingSys.has_role(after.id, Democracybot.JUDICIARY_ROLE_ID):
+
+			Democracybot._count_judges()
+
+
+	@staticmethod
+	@bot.event
+	async def on_member_join(member: discord.Member) -> None:
+
+		if member.guild.id == Democracybot.SCHMUCKSERVER_ID:
+
+			VotingSys.set_member_roles(member.id, (role.id for role in member.roles))
+			VotingSys.set_member_names(member)
+
+
+	@staticmethod
+	@bot.event
+	async def on_user_update(before: discord.User, after: discord.User) -> None:
+		"""
+			Username and global display name changes. The account name on the website follows at the next reconcile.
+		"""
+
+		member: discord.Member | None = Democracybot.schmuckserver.get_member(after.id)
+
+		if member is not None:
+
+			VotingSys.set_member_names(member)
+
+
+	@staticmethod
+	@bot.event
+	async def on_member_remove(member: discord.Member) -> None:
+
+		if member.guild.id != Democracybot.SCHMUCKSERVER_ID:
+
+			return
+
+		was_judge: bool = VotingSys.has_role(member.id, Democracybot.JUDICIARY_ROLE_ID)
+
+		VotingSys.remove_member(member.id)
+
+		if was_judge:
+
+			Democracybot._count_judges()
+
+
+	@staticmethod
+	@bot.event
+	async def on_guild_role_delete(role: discord.Role) -> None:
+
+		if role.guild.id == Democracybot.SCHMUCKSERVER_ID:
+
+			VotingSys.remove_role(role.id)
 
 
 	@staticmethod
@@ -801,7 +1118,7 @@ class Democracybot:
 			else:
 
 				response_msg = TextFormatting.registration(region)
-				WebsiteHandler.register_voter(user_id, region)
+				await AsyncWebsiteHandler.register_voter(user_id, region)
 
 			await ctx.message.reply(response_msg)
 
@@ -824,14 +1141,16 @@ class Democracybot:
 				await Democracybot.warning_channel.send("NOTIFICATION COMMAND FAILED, USER RETURNED NOT MEMBER")
 				return
 
-			if not any(role.id == Democracybot.VOTER_ROLE_ID for role in member.roles):
+			if not VotingSys.has_role(member.id, Democracybot.VOTER_ROLE_ID):
 
 				await member.add_roles(Democracybot.voter_role)
+				VotingSys.add_member_role(member.id, Democracybot.VOTER_ROLE_ID)
 				response_msg = "You will now receive voting notifications."
 
 			else:
 
 				await member.remove_roles(Democracybot.voter_role)
+				VotingSys.remove_member_role(member.id, Democracybot.VOTER_ROLE_ID)
 				response_msg = "You will no longer receive voting notifications."
 
 			await ctx.message.reply(response_msg)
@@ -864,7 +1183,7 @@ class Democracybot:
 				await ctx.message.reply("You are not a member of this party.")
 				return
 
-			party_role_model: Roles | None = WebsiteHandler.get_party_role_by_name(party_name)
+			party_role_model: Roles | None = await AsyncWebsiteHandler.get_party_role_by_name(party_name)
 
 			if party_role_model is None:
 				await ctx.message.reply("No recognized party is using that name.")
@@ -875,11 +1194,13 @@ class Democracybot:
 			if is_joining:
 
 				await member.add_roles(party_role)
+				VotingSys.add_member_role(member.id, party_role.id)
 				await ctx.message.reply(f"Congratulations, you are now a proud member of {party_name}!")
 
 			else:
 
 				await member.remove_roles(party_role)
+				VotingSys.remove_member_role(member.id, party_role.id)
 				await ctx.message.reply(f"Congratulations, you now a scornful ex-member of {party_name}!")
 
 
@@ -949,7 +1270,7 @@ class Democracybot:
 				await ctx.message.reply("You need to tell me what amendment number you want to veto.")
 				return
 
-			provision: ProvisionHistory | None = WebsiteHandler.get_provision(int(amendment_number_text))
+			provision: ProvisionHistory | None = await AsyncWebsiteHandler.get_provision(int(amendment_number_text))
 
 			if provision is None:
 
@@ -970,7 +1291,7 @@ class Democracybot:
 			provision.passed = False
 			provision.polls_close_at = datetime.datetime.now(tz=Democracybot.time_zone).isoformat()
 
-			WebsiteHandler.update_provision(provision)
+			await AsyncWebsiteHandler.update_provision(provision)
 
 			await ctx.message.reply("This proposal has been successfully vetoed. The poll is closed, and the proposal fails.")
 
@@ -981,7 +1302,7 @@ class Democracybot:
 			A helper function to handle all operations specific to challenging a provision.
 		"""
 		
-		provision: ProvisionHistory | None = WebsiteHandler.get_provision(provision_id)
+		provision: ProvisionHistory | None = await AsyncWebsiteHandler.get_provision(provision_id)
 
 		if provision is None:
 
@@ -1010,7 +1331,7 @@ class Democracybot:
 			A helper function to handle all operations specific to challenging a constitutional amendment.
 		"""
 
-		amendment: Constitution | None = WebsiteHandler.get_constitution(amendment_id)
+		amendment: Constitution | None = await AsyncWebsiteHandler.get_constitution(amendment_id)
 
 		if amendment is None:
 
@@ -1105,7 +1426,7 @@ class Democracybot:
 					await Democracybot.warning_channel.send("In unconstitutional, is_for_amendment is true, but the target_object was not of type Constitution.")
 					return
 
-				WebsiteHandler.update_constitution(target_object)
+				await AsyncWebsiteHandler.update_constitution(target_object)
 
 			else:
 
@@ -1114,9 +1435,9 @@ class Democracybot:
 					await Democracybot.warning_channel.send("In unconstitutional, is_for_amendment is false, but the target_object was not of type ProvisionHistory.")
 					return
 
-				WebsiteHandler.update_provision(target_object)
+				await AsyncWebsiteHandler.update_provision(target_object)
 
-			WebsiteHandler.add_judicial_challenge(judicial_challenge)
+			await AsyncWebsiteHandler.add_judicial_challenge(judicial_challenge)
 
 			await ctx.message.reply(amendment_message if is_for_amendment else provision_message)
 
@@ -1191,23 +1512,21 @@ class Democracybot:
 				return
 
 			amount_to_send: int = int(raw_split_message[-1])
-			
-			to_user_name: str = ' '.join(raw_split_message[1:-1]).strip().lower()
-			to_user_name = to_user_name.split('#')[0].strip() if '#' in to_user_name else to_user_name
 
-			to_user: Users
+			if amount_to_send <= 0:
 
-			user: Users
-			for user in VotingSys.users.values():
+				await ctx.message.reply(f"You can only send a positive amount of schmuckmark.")
+				return
+			
+			to_user_name: str = ' '.join(raw_split_message[1:-1]).strip().lower()
+			to_users: list[Users] = VotingSys.find_users(to_user_name)
 
-				if user.name.lower() == to_user_name:
+			if len(to_users) == 0:
 
-					to_user = user
-					break
-			
-			else:
+				suggestions: list[str] = VotingSys.user_names.suggest(to_user_name)
+				did_you_mean: str = f" Did you mean {' or '.join(suggestions)}?" if len(suggestions) > 0 else ""
 
-				await ctx.message.reply(f"I know of no user by the name {to_user_name}.")
+				await ctx.message.reply(f"I know of no user by the name {to_user_name}.{did_you_mean}")
 				return
 
 				# TODO Consider adding a user reconcile here, in case the internal user dictionary is out of date
@@ -1217,16 +1536,32 @@ class Democracybot:
 				#
 				# Could be mitigated by using a semaphore.
 
-			if from_user.money < amount_to_send:
+			if len(to_users) > 1:
+
+				await ctx.message.reply(f"More than one person goes by {to_user_name}. Use their discord username instead.")
+				return
+
+			to_user: Users = to_users[0]
+
+			if to_user.user_id == from_user.user_id:
+
+				await ctx.message.reply(f"You can't send schmuckmark to yourself.")
+				return
+
+			# The website checks the balance and moves the money in one transaction, our cached balances may be out of date.
+			status, updated_users = await AsyncWebsiteHandler.transfer_money(ctx.author.id, int(to_user.user_id), amount_to_send)
+
+			if status == HTTPStatus.CONFLICT:
 
 				await ctx.message.reply(f"Seems you lack the funds for this transaction. Try again when you're a little mmm richer.")
 				return
 
-			from_user.money -= amount_to_send
-			to_user.money += amount_to_send
+			if status != HTTPStatus.OK:
 
-			WebsiteHandler.update_user(from_user)
-			WebsiteHandler.update_user(to_user)
+				await Democracybot.warning_channel.send(f"Failed to send {amount_to_send} from {from_user.name} to {to_user.name}, status {status}")
+				return
+
+			VotingSys.apply_users(updated_users)
 
 			await ctx.message.reply(TextFormatting.send_money_message(to_user.name, from_user.name, amount_to_send))
 
@@ -1270,12 +1605,12 @@ class Democracybot:
 				await Democracybot.warning_channel.send("author was instance of user, not member.")
 				return
 
-			if any(role.id == Democracybot.HIGH_ROLE_ID for role in ctx.author.roles):
+			if VotingSys.has_role(ctx.author.id, Democracybot.HIGH_ROLE_ID):
 
 				await ctx.message.reply("You're currently high, more crack would make you overdose. I don't need that heat.")
 				return
 
-			crack_price: int | None = WebsiteHandler.get_price_of_crack()
+			crack_price: int | None = await AsyncWebsiteHandler.get_price_of_crack()
 
 			if crack_price is None:
 
@@ -1311,10 +1646,11 @@ class Democracybot:
 			)
 
 			await ctx.author.add_roles(Democracybot.high_role)
+			VotingSys.add_member_role(ctx.author.id, Democracybot.HIGH_ROLE_ID)
 
-			WebsiteHandler.update_user(buyer)
-			WebsiteHandler.add_temporary_position(temporary_position)
-			WebsiteHandler.add_purchase_log(purchase_log)
+			await AsyncWebsiteHandler.update_user(buyer)
+			await AsyncWebsiteHandler.add_temporary_position(temporary_position)
+			await AsyncWebsiteHandler.add_purchase_log(purchase_log)
 
 			message: str = f"For a mere {crack_price}, your rightfully owed federal crack ration is given to you. Have fun."
 
@@ -1347,7 +1683,7 @@ class Democracybot:
 				await Democracybot.warning_channel.send("author is user not member in bless.")
 				return
 
-			if not any(role.id == Democracybot.POPE_ROLE_ID for role in ctx.author.roles):
+			if not VotingSys.has_role(ctx.author.id, Democracybot.POPE_ROLE_ID):
 
 				await ctx.message.reply("The sentiment is nice and all, but only the pope may bless others.")
 				return
@@ -1360,33 +1696,34 @@ class Democracybot:
 			
 			blessed_user_name: str = ctx.message.content[pre_len:].strip().lower()
 
-			if blessed_user_name not in VotingSys.users_by_name:
+			blessed_user: Users | None = VotingSys.user_by_account_name(blessed_user_name)
+
+			if blessed_user is None:
 
 				await Democracybot.reconcile_users()
+				blessed_user = VotingSys.user_by_account_name(blessed_user_name)
 
-				if blessed_user_name not in VotingSys.users_by_name:
+				if blessed_user is None:
 
 					await Democracybot.warning_channel.send("Couldn't get user during blessing.")
 					return
-
-			blessed_user: Users = VotingSys.users_by_name[blessed_user_name]
 			blessed_discord_user: discord.Member | None = Democracybot.schmuckserver.get_member(int(blessed_user.user_id))
 
 			if blessed_discord_user is None:
 
 				blessed_discord_user = await Democracybot.schmuckserver.fetch_member(int(blessed_user.user_id))
 
-			if any(role.id == Democracybot.BLESSED_ROLE_ID for role in blessed_discord_user.roles):
+			if VotingSys.has_role(blessed_discord_user.id, Democracybot.BLESSED_ROLE_ID):
 
 				await ctx.message.reply("That user has already been blessed. Any more divine favor and they may be guaranteed a spot in Heaven. I don't need that heat.")
 				return
 			
-			if not any(role.id == Democracybot.HIGH_ROLE_ID for role in blessed_discord_user.roles):
+			if not VotingSys.has_role(blessed_discord_user.id, Democracybot.HIGH_ROLE_ID):
 
 				await ctx.message.reply("That user has no crack to bless.")
 				return
 
-			temp_high: TemporaryPosition | None = WebsiteHandler.get_temporary_position(blessed_user.user_id, str(Democracybot.HIGH_ROLE_ID))
+			temp_high: TemporaryPosition | None = await AsyncWebsiteHandler.get_temporary_position(blessed_user.user_id, str(Democracybot.HIGH_ROLE_ID))
 			
 			if temp_high is None or isinstance(temp_high.position_expires_at, str):  # TBH this is caught here because I'm being lazy. TODO move this to separate error later.
 
@@ -1404,9 +1741,10 @@ class Democracybot:
 			)
 
 			await blessed_discord_user.add_roles(Democracybot.blessed_role)
+			VotingSys.add_member_role(blessed_discord_user.id, Democracybot.BLESSED_ROLE_ID)
 
-			WebsiteHandler.update_temporary_position(temp_high)
-			WebsiteHandler.add_temporary_position(blessing_temp_position)
+			await AsyncWebsiteHandler.update_temporary_position(temp_high)
+			await AsyncWebsiteHandler.add_temporary_position(blessing_temp_position)
 
 
 	@staticmethod
@@ -1418,7 +1756,7 @@ class Democracybot:
 
 		async with ctx.channel.typing():
 
-			crack_price: int | None = WebsiteHandler.get_price_of_crack()
+			crack_price: int | None = await AsyncWebsiteHandler.get_price_of_crack()
 
 			if crack_price is None:
 
@@ -1429,15 +1767,167 @@ class Democracybot:
 
 
 	@staticmethod
-	@tasks.loop(seconds=15)
+	@bot.command()
+	async def bot_status(ctx: commands.Context[typing.Any], *_) -> None:
+		"""
+			Reports how long the bot has been up, how often each part of it has been restarted, and for how long. Also
+			how many writes to the website were sent, and how many were avoided as nothing had changed, and how often the
+			resources pulled conditionally were still current.
+		"""
+
+		stats: dict[str, typing.Any] = Supervisor.stats()
+		restarts: str = ', '.join(f"{component} {count}" for component, count in stats['restart_counts'].items()) or "none"
+
+		message: str = f"Up for {datetime.timedelta(seconds=round(stats['uptime_seconds']))}. Restarts: {restarts}. Total downtime: {stats['total_downtime_seconds']:.1f}s."
+
+		for recovery in stats['recoveries'][-5:]:
+
+			downtime: str = "still down" if recovery['downtime'] is None else f"down {recovery['downtime']:.1f}s"
+			message += f"\n{recovery['component']}: {recovery['reason']} ({downtime})"
+
+		writes: dict[str, dict[str, int]] = Fingerprints.stats()
+		message += f"\nWrites sent: {sum(writes['objects_written'].values())}. Unchanged objects skipped: {sum(writes['objects_skipped'].values())}. Unchanged fields left out: {sum(writes['fields_skipped'].values())}."
+
+		conditional: dict[str, dict[str, int]] = WebsiteHandler.conditional_stats()
+
+		for resource in sorted(conditional['hits'].keys() | conditional['misses'].keys()):
+
+			message += f"\n{resource}: {conditional['hits'].get(resource, 0)} unchanged, {conditional['misses'].get(resource, 0)} downloaded"
+
+		await ctx.message.reply(message)
+
+
+	@staticmethod
+	def request_update() -> None:
+		"""
+			Wakes the heartbeat. Requests made while the heartbeat is already running are coalesced into one more run.
+		"""
+
+		Democracybot.update_requested.set()
+
+
+	@staticmethod
+	def _schedule_wakeup(wake_at: datetime.datetime | str) -> None:
+		"""
+			Wakes the heartbeat at a deadline (such as a poll closing) that the website told us about. There is no event
+			when a deadline simply passes, so we have to keep our own alarm clock.
+		"""
+
+		if isinstance(wake_at, str):
+
+			wake_at = datetime.datetime.fromisoformat(wake_at)
+
+		key: str = wake_at.isoformat()
+
+		if key in Democracybot.scheduled_wakeups:
+
+			return
+
+		delay: float = (wake_at - datetime.datetime.now(tz=Democracybot.time_zone)).total_seconds() + 1  # Give the website a second to agree the deadline passed.
+
+		def wake() -> None:
+
+			Democracybot.scheduled_wakeups.pop(key, None)
+			Democracybot.request_update()
+
+		Democracybot.scheduled_wakeups[key] = asyncio.get_running_loop().call_later(max(delay, 0), wake)
+
+
+	@staticmethod
+	@tasks.loop(seconds=0)
 	async def post_and_resolve() -> None:  # TODO rename
 		"""
-			The "heartbeat" function that regularly checks to see if any work has to be done.
+			The "heartbeat" function that checks to see if any work has to be done.
+
+			It sleeps until woken by the change feed, a scheduled deadline, or a judicial vote, and falls back to running
+			every HEARTBEAT_FALLBACK_SECONDS regardless.
 		"""
 
+		try:
+
+			await asyncio.wait_for(Democracybot.update_requested.wait(), timeout=Democracybot.HEARTBEAT_FALLBACK_SECONDS)
+
+		except asyncio.TimeoutError:
+
+			pass
+
+		Democracybot.update_requested.clear()
+
 		await Democracybot.update_sequence()
 
 
+	@staticmethod
+	@tasks.loop(seconds=0)
+	async def watch_changes() -> None:
+		"""
+			Long-polls the website's change feed. Submissions and new challenges wake the heartbeat immediately, deadlines
+			are scheduled for when they pass.
+		"""
+
+		try:
+
+			events, cursor = await AsyncWebsiteHandler.get_change_events(Democracybot.change_feed_cursor)
+
+		except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+
+			print("Change feed failure", e)
+			await asyncio.sleep(Democracybot.CHANGE_FEED_RETRY_SECONDS)
+			return
+
+		if cursor is None:  # The website had a problem, don't hammer it.
+
+			await asyncio.sleep(Democracybot.CHANGE_FEED_RETRY_SECONDS)
+			return
+
+		Democracybot.change_feed_cursor = cursor
+
+		event: ChangeEvent
+		for event in events:
+
+			if event.wake_at is not None:
+
+				Democracybot._schedule_wakeup(event.wake_at)
+
+			else:
+
+				Democracybot.request_update()
+
+
+	@staticmethod
+	@bot.event
+	async def on_raw_poll_vote_add(payload: discord.RawPollVoteActionEvent) -> None:
+		"""
+			Provision votes are recorded as they come in, so resolving a poll doesn't have to page through every voter.
+
+			Judicial polls close as soon as enough judges have voted, so each judicial vote wakes the heartbeat.
+		"""
+
+		if payload.channel_id == Democracybot.VOTING_BOOTH_ID:
+
+			VotingSys.record_ballot(payload.message_id, payload.user_id, payload.answer_id)
+
+			await AsyncWebsiteHandler.add_poll_ballot(PollBallot(message_id=str(payload.message_id), user_id=str(payload.user_id), answer_id=payload.answer_id))
+
+		elif payload.channel_id == Democracybot.JUDICIAL_REVIEW_ID:
+
+			Democracybot.request_update()
+
+
+	@staticmethod
+	@bot.event
+	async def on_raw_poll_vote_remove(payload: discord.RawPollVoteActionEvent) -> None:
+
+		if payload.channel_id == Democracybot.VOTING_BOOTH_ID:
+
+			VotingSys.remove_ballot(payload.message_id, payload.user_id, payload.answer_id)
+
+			await AsyncWebsiteHandler.delete_poll_ballot(PollBallot(message_id=str(payload.message_id), user_id=str(payload.user_id), answer_id=payload.answer_id))
+
+		elif payload.channel_id == Democracybot.JUDICIAL_REVIEW_ID:
+
+			Democracybot.request_update()
+
+
 	@staticmethod
 	@tasks.loop(hours=1)
 	async def reconcile() -> None:
@@ -1457,6 +1947,8 @@ class Democracybot:
 		await Democracybot.reconcile_payment()
 		await Democracybot.reconcile_temporary_positions()
 
+		await VotingSys.save_snapshot()  # So the next restart starts from no more than an hour ago.
+
 
 if __name__ == '__main__':
 
@@ -1,4 +1,7 @@
 from astral import moon
+import collections
+import dataclasses
+import hashlib
 import typing
 import datetime
 import enum
@@ -70,6 +73,7 @@ class transactionType(enum.IntEnum):
 
 	INCOME_PAYMENT = 0
 	CRACK = 1
+	TRANSFER = 2
 
 
 class moonPhaseQuarters(enum.IntEnum):
@@ -111,9 +115,20 @@ class moonPhaseQuarters(enum.IntEnum):
 		return moonPhaseQuarters.get_phase_by_date(datetime.datetime.now(tz=zoneinfo.ZoneInfo("America/New_York")))
 		
 
-@dataclass
-class VotingRules:
+class Shadow:
+	"""
+		Every shadow is a slotted dataclass built on this. Its fields, and the fingerprint Fingerprints keeps, live in fixed
+		slots instead of a per-object __dict__, which matters for tables the size of Users. Nothing else can be attached to
+		a shadow by accident, see decoder_for.
+	"""
 
+	__slots__ = ('_fingerprint',)
+
+
+@dataclass(slots=True)
+class VotingRules(Shadow):
+
+	id: int | None = None
 	registration_cooldown_hours: int = None
 	accepting_new_registrations: bool = None
 	voting_style: votingStyle = None
@@ -127,18 +142,19 @@ class VotingRules:
 	ubi_amount: int = 500
 
 
-@dataclass
-class Constitution:
+@dataclass(slots=True)
+class Constitution(Shadow):
 	
 	amendment_number: int = None
 	amendment_text: str = None
 	message_id: str = None
+	message_hash: str = ''
 	deprecated: bool = None
 	has_been_challenged: bool = False
 
 
-@dataclass
-class Users:
+@dataclass(slots=True)
+class Users(Shadow):
 	
 	user_id: str = None
 	name: str = None
@@ -149,22 +165,25 @@ class Users:
 	is_judiciary: bool = None
 	vetoes: int = None
 	money: int = None
+	updated_at: datetime.datetime | str = None  # Set by the website on every save.
 
 
-@dataclass
-class Roles:
+@dataclass(slots=True)
+class Roles(Shadow):
 	
 	role_id: str = None
 	name: str = None
 	can_vote: bool = None
 	vote_fraction: float = None
 	is_political_party: bool = None
+	is_elected_position: bool = False
 	salary: int | None = None
 	term_length_days: int | None = None
+	updated_at: datetime.datetime | str = None  # Set by the website on every save.
 
 
-@dataclass
-class ProvisionHistory:
+@dataclass(slots=True)
+class ProvisionHistory(Shadow):
 	
 	proposal_id: int = None
 	proposed_at: datetime.datetime | str = None
@@ -181,8 +200,8 @@ class ProvisionHistory:
 	value2: str = None
 
 
-@dataclass
-class Category:
+@dataclass(slots=True)
+class Category(Shadow):
 
 	id: int = None
 	words: str = None
@@ -190,22 +209,24 @@ class Category:
 	function_key: str = None
 
 
-@dataclass
-class AllowedAccess:
+@dataclass(slots=True)
+class AllowedAccess(Shadow):
 
+	id: int | None = None
 	key: str = None
 
 
-@dataclass
-class RecognizedRegions:
+@dataclass(slots=True)
+class RecognizedRegions(Shadow):
 	
 	region_name: str = None
 	is_recognized: bool = None
 
 
-@dataclass
-class JudicialChallenges:
+@dataclass(slots=True)
+class JudicialChallenges(Shadow):
 
+	id: int | None = None
 	is_active: bool = True
 	was_constitutional: bool = None
 	challenged_proposal_number: int = None
@@ -216,9 +237,10 @@ class JudicialChallenges:
 	pinged_for_last_day: bool = False
 
 
-@dataclass
-class TemporaryPosition:
+@dataclass(slots=True)
+class TemporaryPosition(Shadow):
 
+	id: int | None = None
 	user_id: str = None
 	role_id: str = None
 	is_elected_position: bool = None
@@ -243,15 +265,37 @@ class TemporaryPosition:
 		return datetime.datetime.now() > (self.last_vote_of_no_confidence + timedelta(weeks=1))
 
 
-@dataclass
-class TransactionLog:
+@dataclass(slots=True)
+class TransactionLog(Shadow):
 
+	id: int | None = None
 	transaction_type: transactionType = None
 	transactor_id: str = None
 	transacted_at: datetime.datetime | str = None  # NO NEED TO SET IN CODE, THIS IS AN AUTO FIELD
 	transaction_total: int = None
+	recipient_id: str | None = None
+
+
+@dataclass(slots=True)
+class ChangeEvent(Shadow):
+
+	id: int = None
+	kind: str = None
+	object_id: str = None
+	wake_at: datetime.datetime | str | None = None
+	created_at: datetime.datetime | str = None
+
+
+@dataclass(slots=True)
+class PollBallot(Shadow):
+
+	id: int = None
+	message_id: str = None
+	user_id: str = None
+	answer_id: int = None
 	
 
+
 V = typing.TypeVar('V',
 					VotingRules,
 					Constitution,
@@ -263,5 +307,170 @@ V = typing.TypeVar('V',
 					RecognizedRegions,
 					JudicialChallenges,
 					TemporaryPosition,
-					TransactionLog
-					)
\ No newline at end of file
+					TransactionLog,
+					ChangeEvent,
+					PollBallot
+					)
+
+
+def shadow_dict(model: V) -> dict[str, typing.Any]:
+	"""
+		A shadow's fields and their values, and nothing else kept on the object (such as its fingerprint).
+	"""
+
+	return {field.name: getattr(model, field.name) for field in dataclasses.fields(model)}
+
+
+_decoders: dict[type, typing.Callable[[dict[str, typing.Any]], typing.Any]] = dict()
+
+
+def decoder_for(model_object: type[V]) -> typing.Callable[[dict[str, typing.Any]], V]:
+	"""
+		A function turning the website's JSON for a shadow into the shadow, generated once per shadow class from its
+		fields. It builds the object with a single constructor call, filling missing fields with their defaults, and
+		raises ValueError for fields the shadow doesn't have, instead of attaching them to the object. An unknown field
+		means the shadows have fallen out of parity with the models.
+	"""
+
+	if model_object not in _decoders:
+
+		fields: tuple[dataclasses.Field[typing.Any], ...] = dataclasses.fields(model_object)
+		constants: dict[str, typing.Any] = {'_model_object': model_object, '_field_names': frozenset(field.name for field in fields)}
+
+		for i, field in enumerate(fields):
+
+			constants[f'_default_{i}'] = field.default
+
+		# The constants are bound as default arguments, which makes them locals, the cheapest lookups there are.
+		parameters: str = ', '.join(f"{name}={name}" for name in constants)
+		arguments: str = ', '.join(f"json_dict.get({field.name!r}, _default_{i})" for i, field in enumerate(fields))  # In field order.
+		source: str = (
+			f"def decode_{model_object.__name__}(json_dict, {parameters}):\n"
+			f"\tif not json_dict.keys() <= _field_names:\n"
+			f"\t\traise ValueError(f\"{model_object.__name__} has no field {{sorted(json_dict.keys() - _field_names)}}\")\n"
+			f"\treturn _model_object({arguments})\n"
+		)
+
+		namespace: dict[str, typing.Any] = dict(constants)
+		exec(source, namespace)
+		_decoders[model_object] = namespace[f'decode_{model_object.__name__}']
+
+	return _decoders[model_object]
+
+
+class Fingerprints:
+	"""
+		Remembers what each shadow object looked like the last time it matched the website, as a content hash per field,
+		kept on the object itself. Comparing against it tells us which fields we have changed since, so an update only sends
+		those, and an object we haven't changed isn't sent at all.
+
+		Objects are fingerprinted when they arrive from the website, and again after every successful write. An object
+		with no fingerprint (E.G. one built from scratch) is sent whole, as before.
+
+		A write only marks clean what it actually sent, hashed before the request went out. The objects are shared (E.G.
+		VotingSys.users), so one may well be changed again while the request is awaited, and that change must stay dirty.
+
+		Only shadows with a primary key can be partially updated, the website needs it to find the row.
+	"""
+
+	PRIMARY_KEYS: dict[type, str] = {
+		Constitution: 'amendment_number',
+		Users: 'user_id',
+		Roles: 'role_id',
+		ProvisionHistory: 'proposal_id',
+		RecognizedRegions: 'region_name',
+	}
+
+	ATTRIBUTE: str = '_fingerprint'
+
+	objects_written: collections.Counter[str] = collections.Counter()  # Per shadow class name.
+	objects_skipped: collections.Counter[str] = collections.Counter()
+	fields_skipped: collections.Counter[str] = collections.Counter()  # Unchanged fields left out of objects that were written.
+
+
+	@staticmethod
+	def of(model: V) -> dict[str, str]:
+
+		return Fingerprints.hashes(shadow_dict(model))
+
+
+	@staticmethod
+	def hashes(fields: dict[str, typing.Any]) -> dict[str, str]:
+
+		return {name: hashlib.blake2b(repr(value).encode('utf-8'), digest_size=8).hexdigest() for name, value in fields.items()}
+
+
+	@staticmethod
+	def mark_clean(model: V) -> None:
+
+		setattr(model, Fingerprints.ATTRIBUTE, Fingerprints.of(model))
+
+
+	@staticmethod
+	def mark_fields_clean(model: V, field_hashes: dict[str, str]) -> None:
+		"""
+			Records field_hashes (from hashes(), taken when the fields were sent) as what the website now has for those
+			fields. The others keep whatever they were last known to be.
+		"""
+
+		fingerprint: dict[str, str] = dict(getattr(model, Fingerprints.ATTRIBUTE, None) or dict())
+		fingerprint.update(field_hashes)
+
+		setattr(model, Fingerprints.ATTRIBUTE, fingerprint)
+
+
+	@staticmethod
+	def dirty_fields(model: V) -> list[str] | None:
+		"""
+			The fields changed since the object last matched the website, or None if we don't know what it looked like.
+		"""
+
+		fingerprint: dict[str, str] | None = getattr(model, Fingerprints.ATTRIBUTE, None)
+
+		if fingerprint is None or type(model) not in Fingerprints.PRIMARY_KEYS:
+
+			return None
+
+		return [name for name, field_hash in Fingerprints.of(model).items() if fingerprint.get(name) != field_hash]
+
+
+	@staticmethod
+	def update_payload(model: V) -> dict[str, typing.Any] | None:
+		"""
+			What an update needs to send: the primary key and the dirty fields, or every field if we can't tell which are
+			dirty. None if nothing changed, and nothing needs sending. Counted either way. The values are the object's own,
+			hash them before sending for mark_fields_clean.
+		"""
+
+		model_name: str = type(model).__name__
+		dirty_fields: list[str] | None = Fingerprints.dirty_fields(model)
+		fields: dict[str, typing.Any] = shadow_dict(model)
+
+		if dirty_fields is None:
+
+			Fingerprints.objects_written[model_name] += 1
+
+			return fields
+
+		if len(dirty_fields) == 0:
+
+			Fingerprints.objects_skipped[model_name] += 1
+
+			return None
+
+		primary_key: str = Fingerprints.PRIMARY_KEYS[type(model)]
+
+		Fingerprints.objects_written[model_name] += 1
+		Fingerprints.fields_skipped[model_name] += len(fields) - len(set(dirty_fields) | {primary_key})
+
+		return {name: fields[name] for name in [primary_key, *dirty_fields]}
+
+
+	@staticmethod
+	def stats() -> dict[str, dict[str, int]]:
+
+		return {
+			'objects_written': dict(Fingerprints.objects_written),
+			'objects_skipped': dict(Fingerprints.objects_skipped),
+			'fields_skipped': dict(Fingerprints.fields_skipped),
+		}
\ No newline at end of file
@@ -1,37 +1,22 @@
 import democracy
-import discord
-import importlib
 
 def run():
 	"""
-		Due to a potential failure of the discrod library, we often have to restart it for the bot to function.
-		That is the sole purpose of this program, to restart the bot whenever there is an exception caused by
-		discord. It has worked so far, but it would be better to investigate what is causing the bug. More 
-		details are avaiable in "democracy.py" TODO name the function that has more details.
-	"""
-
-	while True:
+		Due to a potential failure of the discrod library, the bot used to be restarted from here whenever an exception
+		escaped it, by reloading discord and democracy entirely. That is now the Supervisor's job, which restarts only the
+		task loop or gateway session that failed, inside the running process. See Supervisor.py.
 
-		try:
+		This stays the entry point, and only returns when the bot is stopped, or fails in a way no restart can fix.
+	"""
 
-			print("Restarting")
-			
-			importlib.reload(discord)
-			importlib.reload(democracy)
-			
-			democracy.Democracybot.initialize()
-		
-		except KeyboardInterrupt as e:
+	try:
 
-			return
+		democracy.Democracybot.initialize()
 
-		except Exception as e:  # TODO limit error handling to only Discord related exceptions. Which implies finding and recording the exact exception. Consider logging them outside fo "nohup" to make them clearer.
+	except KeyboardInterrupt:
 
-			print("Exception caught")
-			print(type(e))
-			print(e)
+		return
 
 if __name__ == '__main__':
 
 	run()
-
@@ -0,0 +1,87 @@
+import types
+import typing
+import unittest
+
+from VotingSys import VotingSys
+from django_modles_shadow import *
+
+"""
+	Tests for VotingSys that need neither discord nor the website. Usage: "python -m unittest test_voting_sys", from bot/.
+"""
+
+MESSAGE_ID: int = 100
+YAE_ID: int = 1
+NAY_ID: int = 2
+
+
+def _answer(answer_id: int, text: str, voter_ids: list[int]) -> types.SimpleNamespace:
+	"""
+		Stands in for a discord.PollAnswer. voters() is only there for the slow path, and says so if it's used.
+	"""
+
+	answer: types.SimpleNamespace = types.SimpleNamespace(id=answer_id, text=text, vote_count=len(voter_ids), voters_calls=0)
+
+	async def voters() -> typing.AsyncIterator[types.SimpleNamespace]:
+
+		answer.voters_calls += 1
+
+		for voter_id in voter_ids:
+
+			yield types.SimpleNamespace(id=voter_id)
+
+	answer.voters = voters
+
+	return answer
+
+
+class TallyVotesTests(unittest.IsolatedAsyncioTestCase):
+
+	def setUp(self) -> None:
+
+		self.users: dict[int, Users] = VotingSys.users
+		self.ballots: dict[int, dict[int, int]] = VotingSys.ballots
+
+		VotingSys.users = {
+			user_id: Users(user_id=str(user_id), name=f'user {user_id}', can_vote=True, registered_at='north' if user_id < 3 else 'south')
+			for user_id in range(1, 5)
+		}
+		VotingSys.ballots = dict()
+
+	def tearDown(self) -> None:
+
+		VotingSys.users = self.users
+		VotingSys.ballots = self.ballots
+
+	async def test_counts_matching_ballots_without_asking_discord(self) -> None:
+
+		answers: list[types.SimpleNamespace] = [_answer(YAE_ID, 'Yae', [1, 3]), _answer(NAY_ID, 'Nay', [2])]
+		VotingSys.ballots[MESSAGE_ID] = {1: YAE_ID, 2: NAY_ID, 3: YAE_ID}
+
+		regional_votes: dict[str, list[int]] = await VotingSys.tally_votes(types.SimpleNamespace(answers=answers), MESSAGE_ID)  # type: ignore
+
+		self.assertEqual(regional_votes, {'north': [1, 1, 0], 'south': [1, 0, 0]})
+		self.assertEqual([answer.voters_calls for answer in answers], [0, 0])
+
+	async def test_pages_through_voters_when_ballots_are_missing(self) -> None:
+
+		answers: list[types.SimpleNamespace] = [_answer(YAE_ID, 'Yae', [1, 3, 4]), _answer(NAY_ID, 'Nay', [2])]
+		VotingSys.ballots[MESSAGE_ID] = {1: YAE_ID, 2: NAY_ID}  # 3 and 4 voted while the bot was offline.
+
+		regional_votes: dict[str, list[int]] = await VotingSys.tally_votes(types.SimpleNamespace(answers=answers), MESSAGE_ID)  # type: ignore
+
+		self.assertEqual(regional_votes, {'north': [1, 1, 0], 'south': [2, 0, 0]})
+		self.assertEqual([answer.voters_calls for answer in answers], [1, 1])
+		self.assertEqual(VotingSys.ballots[MESSAGE_ID], {1: YAE_ID, 2: NAY_ID, 3: YAE_ID, 4: YAE_ID})  # Recorded for next time.
+
+	def test_ballots_must_agree_with_every_answer(self) -> None:
+
+		answers: list[types.SimpleNamespace] = [_answer(YAE_ID, 'Yae', [1]), _answer(NAY_ID, 'Nay', [2])]
+
+		self.assertTrue(VotingSys._ballots_match_poll(answers, {1: YAE_ID, 2: NAY_ID}))  # type: ignore
+		self.assertFalse(VotingSys._ballots_match_poll(answers, {1: YAE_ID, 2: YAE_ID}))  # type: ignore ; Same total, one changed since.
+		self.assertFalse(VotingSys._ballots_match_poll(answers, {1: YAE_ID}))  # type: ignore
+
+
+if __name__ == '__main__':
+
+	unittest.main()
@@ -41,6 +41,7 @@ urlpatterns = [
     path(f'{app_name}{views.get_full_constitution.__name__}', views.get_full_constitution, name=views.get_full_constitution.__name__),
     path(f'{app_name}{views.get_users.__name__}', views.get_users, name=views.get_users.__name__),
     path(f'{app_name}{views.get_roles.__name__}', views.get_roles, name=views.get_roles.__name__),
+    path(f'{app_name}{views.get_changes.__name__}', views.get_changes, name=views.get_changes.__name__),
     path(f'{app_name}{views.get_party_role_by_name.__name__}', views.get_party_role_by_name, name=views.get_party_role_by_name.__name__),
     path(f'{app_name}{views.update_provision.__name__}', views.update_provision, name=views.update_provision.__name__),
     path(f'{app_name}{views.update_constitution.__name__}', views.update_constitution, name=views.update_constitution.__name__),
@@ -51,6 +52,7 @@ urlpatterns = [
     path(f'{app_name}{views.update_many_users.__name__}', views.update_many_users, name=views.update_many_users.__name__),
     path(f'{app_name}{views.add_role.__name__}', views.add_role, name=views.add_role.__name__),
     path(f'{app_name}{views.add_user.__name__}', views.add_user, name=views.add_user.__name__),
+    path(f'{app_name}{views.add_many_users.__name__}', views.add_many_users, name=views.add_many_users.__name__),
     path(f'{app_name}{views.add_region.__name__}', views.add_region, name=views.add_region.__name__),
     path(f'{app_name}{views.add_judicial_challenge.__name__}', views.add_judicial_challenge, name=views.add_judicial_challenge.__name__),
     path(f'{app_name}{views.add_temporary_position.__name__}', views.add_temporary_position, name=views.add_temporary_position.__name__),
@@ -59,9 +61,15 @@ urlpatterns = [
     path(f'{app_name}{views.update_temporary_position.__name__}', views.update_temporary_position, name=views.update_temporary_position.__name__),
     path(f'{app_name}{views.delete_temporary_position.__name__}', views.delete_temporary_position, name=views.delete_temporary_position.__name__),
     path(f'{app_name}{views.add_purchase_log.__name__}', views.add_purchase_log, name=views.add_purchase_log.__name__),
+    path(f'{app_name}{views.transfer_money.__name__}', views.transfer_money, name=views.transfer_money.__name__),
+    path(f'{app_name}{views.run_payday.__name__}', views.run_payday, name=views.run_payday.__name__),
     path(f'{app_name}{views.get_price_of_crack.__name__}', views.get_price_of_crack, name=views.get_price_of_crack.__name__),
     path(f'{app_name}{views.get_last_payment_quarter.__name__}', views.get_last_payment_quarter, name=views.get_last_payment_quarter.__name__),
     path(f'{app_name}{views.debug_inflation.__name__}', views.debug_inflation, name=views.debug_inflation.__name__),
+    path(f'{app_name}{views.get_change_events.__name__}', views.get_change_events, name=views.get_change_events.__name__),
+    path(f'{app_name}{views.add_poll_ballot.__name__}', views.add_poll_ballot, name=views.add_poll_ballot.__name__),
+    path(f'{app_name}{views.delete_poll_ballot.__name__}', views.delete_poll_ballot, name=views.delete_poll_ballot.__name__),
+    path(f'{app_name}{views.get_open_poll_ballots.__name__}', views.get_open_poll_ballots, name=views.get_open_poll_ballots.__name__),
 ]
 
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
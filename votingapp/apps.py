@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VotingappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'votingapp'
+
+    def ready(self):
+
+        from votingapp import signals  # noqa: F401 ; Importing connects the signal handlers.
@@ -0,0 +1,230 @@
+import datetime
+import typing
+
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from datetime import timedelta
+from votingapp.models import *
+
+"""
+	The economy, moved out of views. Everything here is computed with database aggregates, in a fixed number of queries
+	no matter how many users or transactions there are.
+
+	Pricing reads the running totals in EconomySnapshot, which are kept up to date incrementally: by signals in
+	votingapp.signals for model saves and deletes, and by explicit record_* calls from anything that writes in bulk.
+"""
+
+GOD_KING_USER_ID: str = '120020797480894464'  # Their money is not part of the economy.
+NON_PURCHASES: frozenset[transactionType] = frozenset({transactionType.INCOME_PAYMENT, transactionType.TRANSFER})  # Transactions that don't count as sales.
+PURCHASES: frozenset[transactionType] = frozenset(item for item in transactionType if item not in NON_PURCHASES)
+
+
+def totals_from_source() -> dict[str, int]:
+	"""
+		Recomputes every total the snapshot keeps, from the source tables, in four queries.
+
+		money_supply:			the total money between all users
+		transaction_count:		the number of purchases ever made
+		transaction_total:		the total value of those purchases
+		price_level:			the total of the most recent sale of each purchasable item
+		active_challenges:		judicial challenges still being ruled on
+	"""
+
+	purchases = TransactionLog.objects.filter(transaction_type__in=PURCHASES)
+
+	money_supply: int = Users.objects.exclude(user_id=GOD_KING_USER_ID).aggregate(total=Coalesce(Sum('money'), 0))['total']
+
+	purchase_totals: dict[str, int] = purchases.aggregate(count=Count('id'), total=Coalesce(Sum('transaction_total'), 0))
+
+	# The latest sale of each item, matching TransactionLog.objects.filter(transaction_type=item).last() for every item.
+	last_sale_ids = purchases.values('transaction_type').annotate(last_id=Max('id')).values('last_id')
+	price_level: int = TransactionLog.objects.filter(id__in=last_sale_ids).aggregate(total=Coalesce(Sum('transaction_total'), 0))['total']
+
+	active_challenges: int = JudicialChallenges.objects.filter(is_active=True).count()
+
+	return {
+		'money_supply': money_supply,
+		'transaction_count': purchase_totals['count'],
+		'transaction_total': purchase_totals['total'],
+		'price_level': price_level,
+		'active_challenges': active_challenges,
+	}
+
+
+def provision_counts(now: datetime.datetime) -> dict[str, int]:
+	"""
+		open_provisions:		provisions whose polls haven't closed yet
+		recent_provisions:		provisions whose polls closed within the last week, or haven't closed yet
+
+		These are windows relative to now, and change as the clock moves with no write to hook, so they are never kept in
+		the snapshot. They're a single indexed count instead.
+	"""
+
+	counts: dict[str, int] = ProvisionHistory.objects.filter(polls_close_at__gt=(now - timedelta(weeks=1))).aggregate(  # Recent covers open.
+		open_provisions=Count('proposal_id', filter=Q(polls_close_at__gt=now)),
+		recent_provisions=Count('proposal_id', filter=Q(polls_close_at__gt=(now - timedelta(weeks=1)))),
+	)
+
+	return counts
+
+
+def economy_stats(now: datetime.datetime | None = None, from_source: bool = False) -> dict[str, int]:
+	"""
+		The raw numbers the inflation formula is built on. Read from the snapshot in two queries, or from the source tables
+		in five.
+	"""
+
+	now = timezone.now() if now is None else now
+
+	totals: dict[str, int] = totals_from_source() if from_source else snapshot_totals(get_snapshot())
+
+	return totals | provision_counts(now)
+
+
+# -Snapshot maintenance-
+
+SNAPSHOT_ID: int = 1
+SNAPSHOT_FIELDS: tuple[str, ...] = ('money_supply', 'transaction_count', 'transaction_total', 'price_level', 'active_challenges')
+
+
+def snapshot_totals(snapshot: EconomySnapshot) -> dict[str, int]:
+
+	return {field: getattr(snapshot, field) for field in SNAPSHOT_FIELDS}
+
+
+def get_snapshot() -> EconomySnapshot:
+
+	snapshot: EconomySnapshot | None = EconomySnapshot.objects.filter(pk=SNAPSHOT_ID).first()
+
+	return snapshot if snapshot is not None else rebuild_snapshot()
+
+
+def rebuild_snapshot() -> EconomySnapshot:
+
+	snapshot, _ = EconomySnapshot.objects.update_or_create(pk=SNAPSHOT_ID, defaults=totals_from_source() | {'rebuilt_at': timezone.now()})
+
+	return snapshot
+
+
+def _bump_snapshot(**deltas: int) -> None:
+	"""
+		Applies deltas to the snapshot in the database, with F() so concurrent writers can't lose each other's changes.
+		Every caller runs after its change is written, so if there is no snapshot yet, building one covers the change.
+	"""
+
+	deltas = {field: delta for field, delta in deltas.items() if delta != 0}
+
+	if len(deltas) == 0:
+
+		return
+
+	if EconomySnapshot.objects.filter(pk=SNAPSHOT_ID).update(**{field: F(field) + delta for field, delta in deltas.items()}) == 0:
+
+		rebuild_snapshot()
+
+
+def counted_money(user_id: str, money: int) -> int:
+	"""
+		How much of a user's money counts toward the money supply.
+	"""
+
+	return 0 if user_id == GOD_KING_USER_ID else money
+
+
+def record_money_change(delta: int) -> None:
+	"""
+		Must be called by anything that changes Users.money without saving a model, E.G. bulk_update or queryset.update.
+		Model saves and deletes are handled by signals.
+	"""
+
+	_bump_snapshot(money_supply=delta)
+
+
+def record_transaction(transaction: TransactionLog) -> None:
+	"""
+		A new purchase counts toward the velocity, and replaces the previous sale of its item in the price level.
+	"""
+
+	if transaction.transaction_type not in PURCHASES:
+
+		return
+
+	previous_sale_total: int | None = TransactionLog.objects.filter(
+		transaction_type=transaction.transaction_type,
+		id__lt=transaction.id,
+	).order_by('-id').values_list('transaction_total', flat=True).first()
+
+	_bump_snapshot(
+		transaction_count=1,
+		transaction_total=transaction.transaction_total,
+		price_level=transaction.transaction_total - (previous_sale_total or 0),
+	)
+
+
+def record_challenge_change(delta: int) -> None:
+
+	_bump_snapshot(active_challenges=delta)
+
+
+def adjust_for_inflation(base_price: float, get_debug_info: bool = False, from_source: bool = False) -> int | dict[str, int|float]:
+	"""
+		The inflation system implemented is based on the "Quantity Theory of Money".
+		This theory establishes the basic equation; Money Supply * Velocity of Money = Price Level * Real GDP
+
+		We calculate our money supply easily based on the total money between all users
+		Velocity is effectively how much money is moving, so we can count recent purchases.
+		Price level is a total of all prices, we use the most recent prices sold for each item as a sufficient
+		approximation of their current price.
+		Real GDP is tricky, as Schmucklandia produces nothing. So I use political activity as a proxy.
+	"""
+
+	stats: dict[str, int] = economy_stats(from_source=from_source)
+
+	schmuckmarket_cap: int = stats['money_supply']
+
+	total_transactions: int = stats['transaction_count'] if stats['transaction_count'] != 0 else 1
+
+	schmuckmark_velocity = stats['transaction_total'] / total_transactions
+
+	schmuckmark_velocity = schmuckmark_velocity if schmuckmark_velocity != 0 else 1
+
+	price_level: int = stats['price_level'] if stats['price_level'] != 0 else 100  # This prevents unintended behavior on a "cold startup" (no db entries)
+
+	gdp_factor: float = 0.5
+
+	gdp_factor += 0.1 * stats['open_provisions']
+	gdp_factor += 0.01 * stats['recent_provisions']
+	gdp_factor += 0.01 * stats['active_challenges']
+
+	real_gdp: float = gdp_factor * schmuckmarket_cap
+
+	inflation_factor: float = (schmuckmarket_cap * schmuckmark_velocity) / (price_level * real_gdp)
+
+	curve_radius_factor: float = 1
+	slant_factor: float = 0.15
+	y_offset: float = 0.35
+
+	smooth_inflation: float = (inflation_factor * ((1 / (1 + (curve_radius_factor * inflation_factor))) + slant_factor)) + y_offset
+	# This is a much more aggressive smoothin factor. This gives us an oblique asymptote, ensuring that our inflation can always increase, but in a much more
+	# controlled way.
+
+	if get_debug_info:
+
+		payload: dict[str, int|float] = {
+			'base_price': base_price,
+			'schmuckmarket_cap': schmuckmarket_cap,
+			'schmuckmark_velocity': schmuckmark_velocity,
+			'price_level': price_level,
+			'real_gdp': real_gdp,
+			'inflation_factor': inflation_factor,
+			'smooth_inflation': smooth_inflation,
+			'unsmooth_price': base_price * inflation_factor,
+			'smooth_price': base_price * smooth_inflation,
+		}
+
+		return payload
+
+	inflated_price: float = base_price * smooth_inflation
+
+	return round(inflated_price if inflated_price > base_price else base_price)
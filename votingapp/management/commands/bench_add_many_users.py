@@ -0,0 +1,117 @@
+import django.http
+import json
+import time
+import typing
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.test import RequestFactory
+from votingapp import views
+from votingapp.models import *
+
+"""
+	Times cold-boot onboarding, add_many_users against one add_user call per member, at a few guild sizes. Usage:
+	"python -m django bench_add_many_users [--sizes 1000 10000 50000] [--existing 0.0]"
+
+	The payload is what reconcile_users sends for members the website doesn't know yet. --existing is the fraction of them
+	already in the database (E.G. a restart partway through onboarding), which add_many_users skips. Like the bot, the bulk
+	path is sent in batches of 5000.
+
+	Each run happens inside a transaction that is rolled back afterwards, so this can be run against any database without
+	leaving anything behind.
+"""
+
+BATCH_SIZE: int = 5000  # WebsiteHandler.UPDATE_MANY_BATCH_SIZE
+AUTH_KEY: str = 'bench_add_many_users'
+
+
+class _Rollback(Exception):
+
+	pass
+
+
+def _post(view: typing.Callable[[django.http.HttpRequest], django.http.HttpResponse], url: str, body: dict[str, typing.Any]) -> None:
+
+	request: django.http.HttpRequest = RequestFactory().post(url, data=json.dumps(body | {'auth_key': AUTH_KEY}), content_type='application/json')
+	response: django.http.HttpResponse = view(request)
+
+	assert response.status_code == 204, response.status_code
+
+
+def _add_users_one_by_one(request_list: list[dict[str, typing.Any]], existing: set[str]) -> None:
+	"""
+		What reconcile_users used to do, the bot only sends members it doesn't have yet.
+	"""
+
+	for request_data in request_list:
+
+		if request_data['user_id'] not in existing:
+
+			_post(views.add_user, '/voting/add_user', request_data)
+
+
+def _add_many_users(request_list: list[dict[str, typing.Any]], existing: set[str]) -> None:
+
+	for start in range(0, len(request_list), BATCH_SIZE):
+
+		_post(views.add_many_users, '/voting/add_many_users', {'data': request_list[start:start + BATCH_SIZE]})
+
+
+class Command(BaseCommand):
+
+	help = "Benchmarks add_many_users against adding users one request at a time."
+
+	def add_arguments(self, parser: CommandParser) -> None:
+
+		parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 50000])
+		parser.add_argument('--existing', type=float, default=0.0, help="Fraction of the members already in the database.")
+
+	def handle(self, *args: typing.Any, **options: typing.Any) -> None:
+
+		for size in options['sizes']:
+
+			request_list: list[dict[str, typing.Any]] = self._payload(size)
+			existing_every: int = max(1, round(1 / options['existing'])) if options['existing'] > 0 else size + 1
+			existing: set[str] = {request_data['user_id'] for i, request_data in enumerate(request_list) if i % existing_every == 0}
+
+			single_seconds: float = self._time_run(request_list, existing, _add_users_one_by_one)
+			bulk_seconds: float = self._time_run(request_list, existing, _add_many_users)
+
+			self.stdout.write(f"{size:>7} users   add_user {single_seconds:8.3f}s   add_many_users {bulk_seconds:8.3f}s   speedup {single_seconds / bulk_seconds:6.1f}x")
+
+	@staticmethod
+	def _payload(size: int) -> list[dict[str, typing.Any]]:
+
+		return [
+			{
+				'user_id': f'bench-{i}', 'name': f'bench user {i}', 'can_vote': True, 'vote_fraction': 1.0, 'registered_at': 'Schmuckserver',
+				'is_god_king': False, 'is_judiciary': False, 'vetoes': 0, 'money': 100, 'updated_at': None,
+			}
+			for i in range(size)
+		]
+
+	@staticmethod
+	def _time_run(request_list: list[dict[str, typing.Any]], existing: set[str], add: typing.Callable[[list[dict[str, typing.Any]], set[str]], None]) -> float:
+
+		seconds: float = 0.0
+
+		try:
+
+			with transaction.atomic():
+
+				AllowedAccess.objects.create(key=AUTH_KEY)
+				Users.objects.bulk_create(Users(user_id=user_id, name=user_id) for user_id in existing)
+
+				start: float = time.perf_counter()
+				add(request_list, existing)
+				seconds = time.perf_counter() - start
+
+				assert Users.objects.filter(user_id__startswith='bench-').count() == len(request_list)
+
+				raise _Rollback()
+
+		except _Rollback:
+
+			pass
+
+		return seconds
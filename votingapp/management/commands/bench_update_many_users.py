@@ -0,0 +1,125 @@
+import django.http
+import json
+import time
+import typing
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.test import RequestFactory
+from votingapp import views
+from votingapp.models import *
+
+"""
+	Times update_many_users against the per-row path it replaced, at a few guild sizes. Usage:
+	"python -m django bench_update_many_users [--sizes 1000 10000 100000] [--changed 0.02]"
+
+	The payload is what reconcile_users sends every hour: user_id, name and is_judiciary for every member, of which only
+	the --changed fraction actually differ from the database. Like the bot, the bulk path is sent in batches of 5000.
+
+	Each run seeds its own users inside a transaction that is rolled back afterwards, so this can be run against any
+	database without leaving anything behind.
+"""
+
+BATCH_SIZE: int = 5000  # WebsiteHandler.UPDATE_MANY_BATCH_SIZE
+
+
+class _Rollback(Exception):
+
+	pass
+
+
+def _legacy_update_many_users(request_list: list[dict[str, typing.Any]]) -> None:
+	"""
+		The loop _generic_update_multiple used to run, one get and one save per row.
+	"""
+
+	for request_data in request_list:
+
+		if any(key not in [*[field.name for field in Users._meta.get_fields()], 'auth_key'] for key in request_data):
+
+			raise ValueError(request_data)
+
+		db_entry_to_edit = get_object_or_404(Users, pk=request_data['user_id'])
+
+		for key, value in request_data.items():
+
+			if value is not None:
+
+				setattr(db_entry_to_edit, key, value)
+
+		db_entry_to_edit.save()
+
+
+def _bulk_update_many_users(request_list: list[dict[str, typing.Any]]) -> None:
+
+	for start in range(0, len(request_list), BATCH_SIZE):
+
+		request: django.http.HttpRequest = RequestFactory().post(
+			'/voting/update_many_users',
+			data=json.dumps({'data': request_list[start:start + BATCH_SIZE], 'auth_key': 'bench_update_many_users'}),
+			content_type='application/json',
+		)
+
+		response: django.http.HttpResponse = views.update_many_users(request)
+
+		assert response.status_code == 204, response.status_code
+
+
+class Command(BaseCommand):
+
+	help = "Benchmarks the bulk update_many_users path against the old per-row path."
+
+	def add_arguments(self, parser: CommandParser) -> None:
+
+		parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+		parser.add_argument('--changed', type=float, default=0.02, help="Fraction of users whose name or judiciary status changed.")
+
+	def handle(self, *args: typing.Any, **options: typing.Any) -> None:
+
+		for size in options['sizes']:
+
+			request_list: list[dict[str, typing.Any]] = self._payload(size, options['changed'])
+
+			legacy_seconds: float = self._time_run(size, request_list, _legacy_update_many_users)
+			bulk_seconds: float = self._time_run(size, request_list, _bulk_update_many_users)
+
+			self.stdout.write(f"{size:>7} users   per-row {legacy_seconds:8.3f}s   bulk {bulk_seconds:8.3f}s   speedup {legacy_seconds / bulk_seconds:6.1f}x")
+
+	@staticmethod
+	def _payload(size: int, changed: float) -> list[dict[str, typing.Any]]:
+
+		changed_every: int = max(1, round(1 / changed)) if changed > 0 else size + 1
+
+		return [
+			{'user_id': f'bench-{i}', 'name': f'renamed user {i}' if i % changed_every == 0 else f'bench user {i}', 'is_judiciary': False}
+			for i in range(size)
+		]
+
+	@staticmethod
+	def _time_run(size: int, request_list: list[dict[str, typing.Any]], update: typing.Callable[[list[dict[str, typing.Any]]], None]) -> float:
+
+		seconds: float = 0.0
+
+		try:
+
+			with transaction.atomic():
+
+				AllowedAccess.objects.create(key='bench_update_many_users')
+				Users.objects.bulk_create(Users(user_id=f'bench-{i}', name=f'bench user {i}') for i in range(size))
+
+				start: float = time.perf_counter()
+				update(request_list)
+				seconds = time.perf_counter() - start
+
+				expected_renames: int = sum(1 for request_data in request_list if request_data['name'].startswith('renamed'))
+
+				assert Users.objects.filter(user_id__startswith='bench-', name__startswith='renamed').count() == expected_renames
+
+				raise _Rollback()
+
+		except _Rollback:
+
+			pass
+
+		return seconds
@@ -0,0 +1,166 @@
+import django.http
+import gzip
+import json
+import time
+import typing
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.test import RequestFactory
+from votingapp import views, wire
+from votingapp.models import *
+
+"""
+	Compares the response formats the API negotiates (see votingapp/wire.py) on its two largest responses, get_users and
+	get_full_constitution. For each format, reports the bytes on the wire, the time the website took to answer, and the
+	time the bot takes to decode the body (decompressing, then parsing). Usage:
+	"python -m django bench_wire_formats [--users 10000] [--amendments 300]"
+
+	Formats that need a package that isn't installed (msgpack, zstd) are reported as skipped.
+
+	Everything happens inside a transaction that is rolled back afterwards, so this can be run against any database without
+	leaving anything behind.
+"""
+
+REPEATS: int = 5
+AUTH_KEY: str = 'bench_wire_formats'
+
+# name: (Accept, Accept-Encoding)
+FORMATS: dict[str, tuple[str, str]] = {
+	'json': (wire.JSON_CONTENT_TYPE, 'identity'),
+	'json + gzip': (wire.JSON_CONTENT_TYPE, 'gzip'),
+	'json + zstd': (wire.JSON_CONTENT_TYPE, 'zstd'),
+	'msgpack': (wire.MSGPACK_CONTENT_TYPE, 'identity'),
+	'msgpack + gzip': (wire.MSGPACK_CONTENT_TYPE, 'gzip'),
+	'msgpack + zstd': (wire.MSGPACK_CONTENT_TYPE, 'zstd'),
+}
+
+
+class _Rollback(Exception):
+
+	pass
+
+
+def _is_available(accept: str, accept_encoding: str) -> bool:
+
+	return (accept != wire.MSGPACK_CONTENT_TYPE or wire.msgpack is not None) and (accept_encoding != 'zstd' or wire.zstd is not None)
+
+
+def _get(view: typing.Callable[[django.http.HttpRequest], django.http.HttpResponse], accept: str, accept_encoding: str) -> django.http.HttpResponse:
+
+	request: django.http.HttpRequest = RequestFactory().generic(
+		'GET', f'/voting/{view.__name__}', data=json.dumps({'auth_key': AUTH_KEY}), content_type='application/json',
+		headers={'Accept': accept, 'Accept-Encoding': accept_encoding},
+	)
+	response: django.http.HttpResponse = view(request)
+
+	assert response.status_code == 200, response.status_code
+
+	return response
+
+
+def _decode(response: django.http.HttpResponse) -> typing.Any:
+	"""
+		What the bot does with the body, WebsiteHandler._decode after the HTTP client has decompressed it.
+	"""
+
+	body: bytes = response.content
+
+	if response.get('Content-Encoding') == 'gzip':
+
+		body = gzip.decompress(body)
+
+	elif response.get('Content-Encoding') == 'zstd':
+
+		body = wire.zstd.decompress(body)
+
+	if response['Content-Type'] == wire.MSGPACK_CONTENT_TYPE:
+
+		return wire.msgpack.unpackb(body, strict_map_key=False)
+
+	return json.loads(body)
+
+
+class Command(BaseCommand):
+
+	help = "Benchmarks the size and decode time of each response format the API can negotiate."
+
+	def add_arguments(self, parser: CommandParser) -> None:
+
+		parser.add_argument('--users', type=int, default=10000)
+		parser.add_argument('--amendments', type=int, default=300)
+
+	def handle(self, *args: typing.Any, **options: typing.Any) -> None:
+
+		try:
+
+			with transaction.atomic():
+
+				AllowedAccess.objects.create(key=AUTH_KEY)
+				self._seed(options['users'], options['amendments'])
+
+				for view in (views.get_users, views.get_full_constitution):
+
+					self.stdout.write(view.__name__)
+					self._run(view)
+
+				raise _Rollback()
+
+		except _Rollback:
+
+			pass
+
+	def _run(self, view: typing.Callable[[django.http.HttpRequest], django.http.HttpResponse]) -> None:
+
+		json_bytes: int = 0
+
+		for name, (accept, accept_encoding) in FORMATS.items():
+
+			if not _is_available(accept, accept_encoding):
+
+				self.stdout.write(f"  {name:<16} skipped, not installed")
+				continue
+
+			respond_seconds: float = float('inf')
+			decode_seconds: float = float('inf')
+			response: django.http.HttpResponse | None = None
+
+			for _ in range(REPEATS):
+
+				start: float = time.perf_counter()
+				response = _get(view, accept, accept_encoding)
+				respond_seconds = min(respond_seconds, time.perf_counter() - start)
+
+				start = time.perf_counter()
+				_decode(response)
+				decode_seconds = min(decode_seconds, time.perf_counter() - start)
+
+			assert response is not None
+
+			size: int = len(response.content)
+			json_bytes = json_bytes or size
+
+			self.stdout.write(
+				f"  {name:<16} {size:>10} bytes ({size / json_bytes:5.0%})   respond {respond_seconds * 1000:8.2f}ms   decode {decode_seconds * 1000:8.2f}ms"
+			)
+
+	@staticmethod
+	def _seed(users: int, amendments: int) -> None:
+
+		Users.objects.bulk_create(
+			Users(
+				user_id=str(10 ** 17 + i), name=f'bench user {i}', can_vote=True, vote_fraction=1.0, registered_at='Schmuckserver',
+				is_judiciary=i % 50 == 0, money=i % 5000,
+			)
+			for i in range(users)
+		)
+
+		first_amendment: int = (Constitution.objects.order_by('-amendment_number').values_list('amendment_number', flat=True).first() or 0) + 1
+
+		Constitution.objects.bulk_create(
+			Constitution(
+				amendment_number=first_amendment + i, message_id=str(10 ** 18 + i),
+				amendment_text=f"Amendment {first_amendment + i}. " + "The government shall make no law abridging the freedom of the crack market. " * (1 + i % 8),
+			)
+			for i in range(amendments)
+		)
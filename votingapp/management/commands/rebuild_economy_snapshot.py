@@ -0,0 +1,61 @@
+import typing
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from votingapp import economy
+from votingapp.models import *
+
+"""
+	Recomputes the economy snapshot from the source tables, and reports any drift between the two. Usage:
+	"python -m django rebuild_economy_snapshot [--check]"
+
+	Drift means something changed money, transactions or challenges without going through a model save or one of the
+	economy.record_* functions, and is worth tracking down.
+"""
+
+
+class Command(BaseCommand):
+
+	help = "Rebuilds the economy snapshot from the source tables, reporting any drift."
+
+	def add_arguments(self, parser: CommandParser) -> None:
+
+		parser.add_argument('--check', action='store_true', help="Only report drift, exiting with an error if there is any.")
+
+	def handle(self, *args: typing.Any, **options: typing.Any) -> None:
+
+		with transaction.atomic():
+
+			snapshot: EconomySnapshot | None = EconomySnapshot.objects.select_for_update().filter(pk=economy.SNAPSHOT_ID).first()
+			source_totals: dict[str, int] = economy.totals_from_source()
+
+			if snapshot is None:
+
+				self.stdout.write("No snapshot exists yet.")
+				drift: dict[str, tuple[int, int]] = dict()
+
+			else:
+
+				stored_totals: dict[str, int] = economy.snapshot_totals(snapshot)
+				drift = {field: (stored_totals[field], source_totals[field]) for field in economy.SNAPSHOT_FIELDS if stored_totals[field] != source_totals[field]}
+
+				for field, (stored, actual) in drift.items():
+
+					self.stdout.write(f"{field}: snapshot has {stored}, source tables have {actual} ({actual - stored:+})")
+
+			if options['check']:
+
+				if snapshot is None:
+
+					raise CommandError("There is no economy snapshot to check.")
+
+				if len(drift) > 0:
+
+					raise CommandError("The economy snapshot has drifted from the source tables.")
+
+				self.stdout.write("No drift.")
+				return
+
+			economy.rebuild_snapshot()
+
+		self.stdout.write(f"Rebuilt the economy snapshot, {len(drift)} field(s) had drifted.")
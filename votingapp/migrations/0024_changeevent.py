@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingapp', '0023_alter_transactionlog_transacted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.TextField()),
+                ('object_id', models.TextField()),
+                ('wake_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingapp', '0024_changeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PollBallot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.TextField()),
+                ('user_id', models.TextField()),
+                ('answer_id', models.SmallIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('message_id', 'user_id'), name='one_ballot_per_user_per_poll')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingapp', '0025_pollballot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roles',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='users',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
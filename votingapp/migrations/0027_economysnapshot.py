@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingapp', '0026_users_roles_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EconomySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('money_supply', models.BigIntegerField(default=0)),
+                ('transaction_count', models.BigIntegerField(default=0)),
+                ('transaction_total', models.BigIntegerField(default=0)),
+                ('price_level', models.BigIntegerField(default=0)),
+                ('active_challenges', models.IntegerField(default=0)),
+                ('rebuilt_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
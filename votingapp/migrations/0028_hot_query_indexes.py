@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingapp', '0027_economysnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['created_at'], name='change_event_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='judicialchallenges',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['is_active'], name='challenge_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provisionhistory',
+            index=models.Index(condition=models.Q(('passed__isnull', True)), fields=['polls_close_at'], name='provision_open_close_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provisionhistory',
+            index=models.Index(fields=['polls_close_at'], name='provision_close_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provisionhistory',
+            index=models.Index(fields=['message_id'], name='provision_message_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provisionhistory',
+            index=models.Index(fields=['function_key', 'value1', 'value2', 'polls_close_at'], name='provision_duplicate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='temporaryposition',
+            index=models.Index(fields=['user_id', 'role_id'], name='temp_position_user_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='temporaryposition',
+            index=models.Index(fields=['position_expires_at'], name='temp_position_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionlog',
+            index=models.Index(fields=['transaction_type', 'id'], name='transaction_type_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionlog',
+            index=models.Index(fields=['transaction_type', 'transacted_at'], name='transaction_type_time_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingapp', '0028_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionlog',
+            name='recipient_id',
+            field=models.TextField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingapp', '0029_transactionlog_recipient_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='constitution',
+            name='message_hash',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def delete_resolved_poll_ballots(apps, schema_editor):
+    """
+        Ballots are now deleted when their provision is resolved, this clears out the ones cast before that.
+    """
+
+    PollBallot = apps.get_model('votingapp', 'PollBallot')
+    ProvisionHistory = apps.get_model('votingapp', 'ProvisionHistory')
+
+    open_message_ids = ProvisionHistory.objects.filter(passed__isnull=True).exclude(message_id='').values('message_id')
+    PollBallot.objects.exclude(message_id__in=open_message_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('votingapp', '0030_constitution_message_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_resolved_poll_ballots, migrations.RunPython.noop),
+    ]
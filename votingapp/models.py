@@ -47,6 +47,7 @@ class transactionType(enum.IntEnum):
 
 	INCOME_PAYMENT = 0
 	CRACK = 1
+	TRANSFER = 2  # Money sent from one user to another.
 
 
 class moonPhaseQuarters(enum.IntEnum):
@@ -124,6 +125,7 @@ class Constitution(models.Model):
 	amendment_number = models.IntegerField(primary_key=True)
 	amendment_text = models.TextField()
 	message_id = models.TextField(default = '', blank=True)
+	message_hash = models.TextField(default='', blank=True)  # Hash of what the bot last made the message say, see reconcile_constitution.
 	deprecated = models.BooleanField(default=False)
 	has_been_challenged = models.BooleanField(default=False)
 
@@ -143,6 +145,7 @@ class Users(models.Model):
 	is_judiciary = models.BooleanField(default=False)
 	vetoes = models.SmallIntegerField(default=0)
 	money = models.IntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True, db_index=True)  # The bot's delta sync cursor. Bulk writes must set this by hand.
 
 	def __str__(self):
 
@@ -164,6 +167,7 @@ class Roles(models.Model):
 	is_elected_position = models.BooleanField(default=False)
 	salary = models.IntegerField(default=0, null=True)
 	term_length_days = models.IntegerField(default=14, null=True)
+	updated_at = models.DateTimeField(auto_now=True, db_index=True)  # The bot's delta sync cursor. Bulk writes must set this by hand.
 
 	def __str__(self):
 
@@ -189,6 +193,16 @@ class ProvisionHistory(models.Model):
 	value1 = models.TextField(blank=True)
 	value2 = models.TextField(blank=True)
 
+	class Meta:
+
+		indexes = [
+			# Open provisions by closing time, for get_resolvable_provisions, get_open_provisions and get_open_poll_ballots.
+			models.Index(fields=['polls_close_at'], condition=models.Q(passed__isnull=True), name='provision_open_close_idx'),
+			models.Index(fields=['polls_close_at'], name='provision_close_idx'),  # The economy's provision windows.
+			models.Index(fields=['message_id'], name='provision_message_idx'),  # get_unposted_provisions.
+			models.Index(fields=['function_key', 'value1', 'value2', 'polls_close_at'], name='provision_duplicate_idx'),  # submit_vote.
+		]
+
 	def __str__(self):
 
 		return f"""{self.proposal_id} - {self.value2}; {self.value1}\n
@@ -247,6 +261,12 @@ class JudicialChallenges(models.Model):
 	is_for_existing_amendment = models.BooleanField(default=False)
 	pinged_for_last_day = models.BooleanField(default=False)
 
+	class Meta:
+
+		indexes = [
+			models.Index(fields=['is_active'], condition=models.Q(is_active=True), name='challenge_active_idx'),
+		]
+
 	def __str__(self):
 
 		return f"{self.challenged_proposal_number} - is active {self.is_active}, was_constitutional {self.was_constitutional}, {'amendment' if self.is_for_existing_amendment else 'proposal'}"
@@ -265,6 +285,13 @@ class TemporaryPosition(models.Model):
 	in_election = models.BooleanField(default=False)
 	money_to_be_charged = models.IntegerField(null=True)
 
+	class Meta:
+
+		indexes = [
+			models.Index(fields=['user_id', 'role_id'], name='temp_position_user_role_idx'),
+			models.Index(fields=['position_expires_at'], name='temp_position_expires_idx'),
+		]
+
 	def is_time_for_election(self) -> bool:
 
 		return not self.in_election and timezone.now() > self.position_expires_at
@@ -288,12 +315,84 @@ class TransactionLog(models.Model):
 	transactor_id = models.TextField()
 	transacted_at = models.DateTimeField(auto_now_add=True)
 	transaction_total = models.IntegerField()
+	recipient_id = models.TextField(null=True, blank=True, default=None)  # Who a TRANSFER was sent to.
+
+	class Meta:
+
+		indexes = [
+			models.Index(fields=['transaction_type', 'id'], name='transaction_type_latest_idx'),  # The latest sale or payment of a type.
+			models.Index(fields=['transaction_type', 'transacted_at'], name='transaction_type_time_idx'),
+		]
 
 	def __str__(self):
 
 		return f"{self.transaction_type, {self.transactor_id}, {self.transacted_at}, {self.transaction_total}}"
 
 
+class ChangeEvent(models.Model):
+	"""
+		A row is published whenever something the bot's heartbeat cares about changes, so the bot can react to it
+		immediately over the change feed, instead of polling every endpoint on a timer.
+
+		wake_at is set when the change is a deadline (E.G. a poll closing), so the bot can schedule work for that moment.
+	"""
+
+	kind = models.TextField()
+	object_id = models.TextField()
+	wake_at = models.DateTimeField(blank=True, null=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+
+		indexes = [
+			models.Index(fields=['created_at'], name='change_event_created_idx'),  # Pruning.
+		]
+
+	def __str__(self):
+
+		return f"{self.id}: {self.kind} {self.object_id}, wake at {self.wake_at}"
+
+
+class PollBallot(models.Model):
+	"""
+		One user's vote on a provision's discord poll, recorded by the bot from gateway vote events as they happen.
+		Tallying from these at resolution time avoids paging through every voter with the Discord API.
+	"""
+
+	message_id = models.TextField()
+	user_id = models.TextField()
+	answer_id = models.SmallIntegerField()
+
+	class Meta:
+
+		constraints = [
+			models.UniqueConstraint(fields=['message_id', 'user_id'], name='one_ballot_per_user_per_poll'),
+		]
+
+	def __str__(self):
+
+		return f"{self.user_id} voted {self.answer_id} on {self.message_id}"
+
+
+class EconomySnapshot(models.Model):
+	"""
+		A single row of running totals behind the inflation formula, kept up to date as users, transactions and judicial
+		challenges change (see votingapp.economy), so pricing something doesn't recompute the whole economy.
+		The rebuild_economy_snapshot command recomputes it from the source tables.
+	"""
+
+	money_supply = models.BigIntegerField(default=0)
+	transaction_count = models.BigIntegerField(default=0)
+	transaction_total = models.BigIntegerField(default=0)
+	price_level = models.BigIntegerField(default=0)
+	active_challenges = models.IntegerField(default=0)
+	rebuilt_at = models.DateTimeField(default=timezone.now)
+
+	def __str__(self):
+
+		return f"money supply {self.money_supply}, {self.transaction_count} purchases totalling {self.transaction_total}, price level {self.price_level}"
+
+
 V = typing.TypeVar('V',
 					VotingRules,
 					Constitution,
@@ -306,4 +405,7 @@ V = typing.TypeVar('V',
 					JudicialChallenges,
 					TemporaryPosition,
 					TransactionLog,
+					ChangeEvent,
+					PollBallot,
+					EconomySnapshot,
 					)
\ No newline at end of file
@@ -0,0 +1,259 @@
+import threading
+import time
+import typing
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from votingapp import economy
+from votingapp.models import *
+
+"""
+	Model signal handlers live here, and are connected in VotingappConfig.ready().
+
+	The change feed: Saving anything the bot's heartbeat acts on publishes a ChangeEvent, and wakes any request
+	that is long-polling for one (see views.get_change_events). Waking is done with a condition variable, once the
+	event's transaction commits, as a request woken before that would find nothing new. It only reaches requests in this
+	process, so waiting requests also re-check the database on a short interval to pick up events published by other
+	worker processes.
+
+	The config caches: Every API call checks its key against AllowedAccess, and the voting rules are read by every vote
+	submitted and every payday, so both are held in memory and dropped whenever one is saved or deleted. Like the change
+	feed, a signal only reaches this process, so the caches also expire on their own after a short while to pick up
+	changes made by other worker processes (or by queryset.update, which sends no signals).
+
+	A save's signal fires before its transaction commits, when other requests can still only see the old row, so the
+	cache is dropped again once it commits. Inside a transaction the cache isn't used at all, as what the transaction
+	sees may never be committed.
+
+	The economy snapshot: Saves and deletes of Users, TransactionLog and JudicialChallenges are applied to the running
+	totals in EconomySnapshot as deltas. The values a row was loaded with are remembered in post_init, so a delta needs no
+	extra query. Bulk writes don't send signals, and must call the economy.record_* functions themselves.
+"""
+
+T = typing.TypeVar('T')
+
+change_feed_condition: threading.Condition = threading.Condition()
+
+CONFIG_CACHE_SECONDS: float = 60.0
+
+
+class ReadThroughCache(typing.Generic[T]):
+	"""
+		A value loaded on first use, and held until invalidate() or until it's CONFIG_CACHE_SECONDS old. Reads inside an
+		atomic block always load, and keep nothing.
+	"""
+
+	def __init__(self, load: typing.Callable[[], T]) -> None:
+
+		self._load: typing.Callable[[], T] = load
+		self._lock: threading.Lock = threading.Lock()
+		self._entry: tuple[T, float] | None = None  # (value, time.monotonic() it was loaded at)
+		self._generation: int = 0  # Bumped on every invalidation, so a load that raced one isn't kept.
+
+	def get(self) -> T:
+
+		if transaction.get_connection().in_atomic_block:
+
+			return self._load()
+
+		entry: tuple[T, float] | None = self._entry
+
+		if entry is not None and time.monotonic() - entry[1] < CONFIG_CACHE_SECONDS:
+
+			return entry[0]
+
+		generation: int = self._generation
+		value: T = self._load()
+
+		with self._lock:
+
+			if generation == self._generation:
+
+				self._entry = (value, time.monotonic())
+
+		return value
+
+	def invalidate(self) -> None:
+
+		with self._lock:
+
+			self._entry = None
+			self._generation += 1
+
+	def invalidate_on_save(self) -> None:
+		"""
+			For a post_save or post_delete handler: now, and again when the transaction commits (right away if there is none).
+		"""
+
+		self.invalidate()
+		transaction.on_commit(self.invalidate)
+
+
+_allowed_access_keys: ReadThroughCache[frozenset[str]] = ReadThroughCache(lambda: frozenset(AllowedAccess.objects.values_list('key', flat=True)))
+_voting_rules: ReadThroughCache[VotingRules | None] = ReadThroughCache(lambda: VotingRules.objects.first())
+
+
+def publish_change_event(kind: str, object_id: typing.Any, wake_at: datetime.datetime | None = None) -> ChangeEvent:
+
+	event: ChangeEvent = ChangeEvent.objects.create(kind=kind, object_id=str(object_id), wake_at=wake_at)
+	transaction.on_commit(_wake_change_feed)
+
+	return event
+
+
+def _wake_change_feed() -> None:
+
+	with change_feed_condition:
+
+		change_feed_condition.notify_all()
+
+
+def allowed_access_keys() -> frozenset[str]:
+
+	return _allowed_access_keys.get()
+
+
+def voting_rules() -> VotingRules | None:
+	"""
+		The singleton VotingRules row. It's shared between requests, so it must not be modified, save a fresh copy instead.
+	"""
+
+	return _voting_rules.get()
+
+
+@receiver(post_save, sender=AllowedAccess)
+@receiver(post_delete, sender=AllowedAccess)
+def _allowed_access_changed(sender: type[AllowedAccess], **kwargs: typing.Any) -> None:
+
+	_allowed_access_keys.invalidate_on_save()
+
+
+@receiver(post_save, sender=VotingRules)
+@receiver(post_delete, sender=VotingRules)
+def _voting_rules_changed(sender: type[VotingRules], **kwargs: typing.Any) -> None:
+
+	_voting_rules.invalidate_on_save()
+
+
+@receiver(post_save, sender=ProvisionHistory)
+def _provision_saved(sender: type[ProvisionHistory], instance: ProvisionHistory, created: bool, update_fields: frozenset[str] | None, **kwargs: typing.Any) -> None:
+	"""
+		New submissions need posting right away. Once a provision is posted and open, any save may have moved its
+		deadline (posting, vetoes, judicial review), so we publish the deadline for the bot to schedule against.
+
+		Once it's resolved its poll is never tallied again, so the ballots cast on it are deleted.
+	"""
+
+	if created:
+
+		publish_change_event('provision_submitted', instance.proposal_id)
+
+	elif instance.passed is None and instance.message_id != '':
+
+		publish_change_event('provision_deadline', instance.proposal_id, wake_at=instance.polls_close_at)
+
+	elif instance.passed is not None and instance.message_id != '' and (update_fields is None or 'passed' in update_fields):
+
+		PollBallot.objects.filter(message_id=instance.message_id).delete()
+
+
+@receiver(post_save, sender=JudicialChallenges)
+def _judicial_challenge_saved(sender: type[JudicialChallenges], instance: JudicialChallenges, created: bool, **kwargs: typing.Any) -> None:
+
+	if created:
+
+		publish_change_event('challenge_opened', instance.challenged_proposal_number)
+
+
+@receiver(post_init, sender=Users)
+def _remember_user_money(sender: type[Users], instance: Users, **kwargs: typing.Any) -> None:
+
+	instance._economy_money = instance.__dict__.get('money')  # type: ignore ; Not getattr, which would load a deferred field.
+
+
+@receiver(post_save, sender=Users)
+def _user_saved(sender: type[Users], instance: Users, created: bool, update_fields: frozenset[str] | None, **kwargs: typing.Any) -> None:
+
+	if update_fields is not None and 'money' not in update_fields:
+
+		return
+
+	previous_money: int | None = 0 if created else instance._economy_money  # type: ignore
+
+	if previous_money is None:  # Loaded without its money, so we can't know what changed.
+
+		economy.rebuild_snapshot()
+
+	else:
+
+		economy.record_money_change(economy.counted_money(instance.user_id, instance.money) - economy.counted_money(instance.user_id, previous_money))
+
+	instance._economy_money = instance.money  # type: ignore
+
+
+@receiver(post_delete, sender=Users)
+def _user_deleted(sender: type[Users], instance: Users, **kwargs: typing.Any) -> None:
+
+	if 'money' not in instance.__dict__:
+
+		economy.rebuild_snapshot()
+
+	else:
+
+		economy.record_money_change(-economy.counted_money(instance.user_id, instance.money))
+
+
+@receiver(post_save, sender=TransactionLog)
+@receiver(post_delete, sender=TransactionLog)
+def _transaction_changed(sender: type[TransactionLog], instance: TransactionLog, created: bool = False, **kwargs: typing.Any) -> None:
+	"""
+		Logs are only ever added in practice. Edits and deletions (E.G. from the admin) could change which sale is the
+		latest, so those rebuild.
+	"""
+
+	if created:
+
+		economy.record_transaction(instance)
+
+	else:
+
+		economy.rebuild_snapshot()
+
+
+@receiver(post_init, sender=JudicialChallenges)
+def _remember_challenge_state(sender: type[JudicialChallenges], instance: JudicialChallenges, **kwargs: typing.Any) -> None:
+
+	instance._economy_is_active = instance.__dict__.get('is_active')  # type: ignore
+
+
+@receiver(post_save, sender=JudicialChallenges)
+def _challenge_state_saved(sender: type[JudicialChallenges], instance: JudicialChallenges, created: bool, update_fields: frozenset[str] | None, **kwargs: typing.Any) -> None:
+
+	if update_fields is not None and 'is_active' not in update_fields:
+
+		return
+
+	was_active: bool | None = False if created else instance._economy_is_active  # type: ignore
+
+	if was_active is None:
+
+		economy.rebuild_snapshot()
+
+	else:
+
+		economy.record_challenge_change(int(instance.is_active) - int(was_active))
+
+	instance._economy_is_active = instance.is_active  # type: ignore
+
+
+@receiver(post_delete, sender=JudicialChallenges)
+def _challenge_deleted(sender: type[JudicialChallenges], instance: JudicialChallenges, **kwargs: typing.Any) -> None:
+
+	if 'is_active' not in instance.__dict__:
+
+		economy.rebuild_snapshot()
+
+	else:
+
+		economy.record_challenge_change(-1 if instance.is_active else 0)
@@ -1,3 +1,911 @@
-from django.test import TestCase
+import datetime
+import django.http
+import gzip
+import json
+import random
+import re
+import threading
+import time
+import typing
+import unittest
 
-# Create your tests here.
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from votingapp import economy, signals, views, wire
+from votingapp.models import *
+
+
+def _legacy_adjust_for_inflation(base_price: float, get_debug_info: bool = False) -> int | dict[str, int|float]:
+	"""
+		views._adjust_for_inflation as it was before the economy was moved to SQL aggregates, kept as the reference.
+	"""
+
+	schmuckmarket_cap: int = 0
+
+	for user in Users.objects.all():
+
+		if user.user_id == '120020797480894464':
+
+			continue
+
+		schmuckmarket_cap += user.money
+
+	transactions = TransactionLog.objects.exclude(transaction_type=transactionType.INCOME_PAYMENT)
+	total_transactions = transactions.count()
+	total_transactions = total_transactions if total_transactions != 0 else 1
+	total_value = sum(transaction.transaction_total for transaction in transactions.all())
+	schmuckmark_velocity = total_value / total_transactions
+	schmuckmark_velocity = schmuckmark_velocity if schmuckmark_velocity != 0 else 1
+
+	price_level: int = 0
+
+	for item in transactionType:
+
+		if item in {transactionType.INCOME_PAYMENT}:
+
+			continue
+
+		last_sale: TransactionLog | None = TransactionLog.objects.filter(transaction_type=item).last()
+
+		if last_sale is not None:
+
+			price_level += last_sale.transaction_total
+
+	price_level = price_level if price_level != 0 else 100
+
+	gdp_factor: float = 0.5
+	now = timezone.now()
+	gdp_factor += 0.1 * ProvisionHistory.objects.filter(polls_close_at__gt=now).count()
+	gdp_factor += 0.01 * ProvisionHistory.objects.filter(polls_close_at__gt=(now - timedelta(weeks=1))).count()
+	gdp_factor += 0.01 * JudicialChallenges.objects.filter(is_active=True).count()
+
+	real_gdp: float = gdp_factor * schmuckmarket_cap
+	inflation_factor: float = (schmuckmarket_cap * schmuckmark_velocity) / (price_level * real_gdp)
+	smooth_inflation: float = (inflation_factor * ((1 / (1 + (1 * inflation_factor))) + 0.15)) + 0.35
+
+	if get_debug_info:
+
+		return {
+			'base_price': base_price,
+			'schmuckmarket_cap': schmuckmarket_cap,
+			'schmuckmark_velocity': schmuckmark_velocity,
+			'price_level': price_level,
+			'real_gdp': real_gdp,
+			'inflation_factor': inflation_factor,
+			'smooth_inflation': smooth_inflation,
+			'unsmooth_price': base_price * inflation_factor,
+			'smooth_price': base_price * smooth_inflation,
+		}
+
+	inflated_price: float = base_price * smooth_inflation
+
+	return round(inflated_price if inflated_price > base_price else base_price)
+
+
+class InflationTests(TestCase):
+
+	BASE_PRICES: list[float] = [1.0, 50.0, 100.0, 137.5, 2500.0]
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		seeded: random.Random = random.Random(20260418)
+		now = timezone.now()
+
+		Users.objects.create(user_id=economy.GOD_KING_USER_ID, name='god king', money=10 ** 9)
+
+		for i in range(200):
+
+			Users.objects.create(user_id=str(i), name=f'user {i}', money=seeded.randint(0, 5000))
+
+		for i in range(300):  # Created one at a time, so ids follow creation order, like the live table.
+
+			TransactionLog.objects.create(
+				transaction_type=seeded.choice([transactionType.INCOME_PAYMENT, transactionType.CRACK]),  # The types the legacy code knew of.
+				transactor_id=str(seeded.randrange(200)),
+				transaction_total=seeded.randint(1, 900),
+			)
+
+		for days in [-30, -10, -6, -3, -1, 1, 2]:  # Well clear of the one week boundary, so the clock moving between calls can't matter.
+
+			ProvisionHistory.objects.create(proposed_by_name='user 1', polls_close_at=now + timedelta(days=days), function_key='gug')
+
+		for is_active in [True, True, False]:
+
+			JudicialChallenges.objects.create(is_active=is_active, challenged_proposal_number=1, judicial_poll_id='1')
+
+	def assert_matches_legacy(self) -> None:
+
+		for base_price in self.BASE_PRICES:
+
+			self.assertEqual(economy.adjust_for_inflation(base_price), _legacy_adjust_for_inflation(base_price))
+			self.assertEqual(economy.adjust_for_inflation(base_price, from_source=True), _legacy_adjust_for_inflation(base_price))
+			self.assertEqual(economy.adjust_for_inflation(base_price, get_debug_info=True), _legacy_adjust_for_inflation(base_price, get_debug_info=True))
+
+	def test_matches_legacy_prices(self) -> None:
+
+		self.assert_matches_legacy()
+
+	def test_matches_legacy_prices_without_purchases(self) -> None:
+
+		TransactionLog.objects.exclude(transaction_type=transactionType.INCOME_PAYMENT).delete()
+
+		self.assert_matches_legacy()
+
+	def test_runs_in_fixed_number_of_queries(self) -> None:
+
+		with self.assertNumQueries(2):
+
+			economy.adjust_for_inflation(100.0)
+
+		with self.assertNumQueries(5):
+
+			economy.adjust_for_inflation(100.0, from_source=True)
+
+	def test_snapshot_is_maintained_incrementally(self) -> None:
+
+		AllowedAccess.objects.create(key='test')
+
+		user: Users = Users.objects.get(user_id='7')
+		user.money += 250
+		user.save()
+
+		Users.objects.get(user_id=economy.GOD_KING_USER_ID).delete()
+		Users.objects.get(user_id='8').delete()
+		Users.objects.create(user_id='new', name='new user', money=321)
+
+		request = RequestFactory().post(
+			'/voting/update_many_users',
+			data=json.dumps({'data': [{'user_id': '9', 'money': 4}, {'user_id': '10', 'money': 9000}], 'auth_key': 'test'}),
+			content_type='application/json',
+		)
+		self.assertEqual(views.update_many_users(request).status_code, 204)
+
+		TransactionLog.objects.create(transaction_type=transactionType.CRACK, transactor_id='7', transaction_total=777)
+		TransactionLog.objects.create(transaction_type=transactionType.INCOME_PAYMENT, transactor_id='7', transaction_total=50)
+
+		challenge: JudicialChallenges = JudicialChallenges.objects.filter(is_active=True).first()
+		challenge.is_active = False
+		challenge.save()
+
+		self.assertEqual(economy.snapshot_totals(economy.get_snapshot()), economy.totals_from_source())
+		self.assert_matches_legacy()
+
+
+class AddManyUsersTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		AllowedAccess.objects.create(key='test')
+		Users.objects.create(user_id='1', name='already here', money=5)
+		economy.rebuild_snapshot()
+
+	def add_many_users(self, data: list[dict[str, typing.Any]]) -> int:
+
+		request = RequestFactory().post(
+			'/voting/add_many_users',
+			data=json.dumps({'data': data, 'auth_key': 'test'}),
+			content_type='application/json',
+		)
+
+		return views.add_many_users(request).status_code
+
+	def test_adds_new_users_and_skips_existing_ones(self) -> None:
+
+		status_code: int = self.add_many_users([
+			{'user_id': '1', 'name': 'renamed', 'money': 1000},
+			{'user_id': '2', 'name': 'user 2', 'money': 100, 'updated_at': None},
+			{'user_id': '3', 'name': 'user 3', 'money': 100},
+			{'user_id': '3', 'name': 'user 3 again', 'money': 100},
+		])
+
+		self.assertEqual(status_code, 204)
+		self.assertEqual(dict(Users.objects.values_list('user_id', 'name')), {'1': 'already here', '2': 'user 2', '3': 'user 3'})
+		self.assertIsNotNone(Users.objects.get(user_id='2').updated_at)
+		self.assertEqual(economy.snapshot_totals(economy.get_snapshot()), economy.totals_from_source())
+
+	def test_rows_added_concurrently_are_not_counted_twice(self) -> None:
+
+		bulk_create = Users.objects.bulk_create
+
+		def racing_bulk_create(*args: typing.Any, **kwargs: typing.Any) -> list[Users]:
+
+			Users.objects.create(user_id='2', name='raced in', money=7)  # Counted by its own save signal.
+
+			return bulk_create(*args, **kwargs)
+
+		with mock.patch.object(Users.objects, 'bulk_create', racing_bulk_create):
+
+			self.assertEqual(self.add_many_users([{'user_id': '2', 'name': 'user 2', 'money': 100}, {'user_id': '3', 'name': 'user 3', 'money': 100}]), 204)
+
+		self.assertEqual(Users.objects.get(user_id='2').money, 7)
+		self.assertEqual(economy.snapshot_totals(economy.get_snapshot()), economy.totals_from_source())
+
+	def test_rejects_unknown_fields(self) -> None:
+
+		self.assertEqual(self.add_many_users([{'user_id': '2', 'name': 'user 2', 'favourite_colour': 'red'}]), 400)
+		self.assertFalse(Users.objects.filter(user_id='2').exists())
+
+
+class UpdateUserTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		AllowedAccess.objects.create(key='test')
+		Users.objects.create(user_id='1', name='user 1', money=100)
+		economy.rebuild_snapshot()
+
+	def update_user(self, data: dict[str, typing.Any]) -> list[str]:
+		"""
+			Returns the UPDATE statements it ran.
+		"""
+
+		request = RequestFactory().post('/voting/update_user', data=json.dumps(data | {'auth_key': 'test'}), content_type='application/json')
+
+		with CaptureQueriesContext(connection) as queries:
+
+			self.assertEqual(views.update_user(request).status_code, 204)
+
+		return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "votingapp_users"')]
+
+	def test_only_writes_changed_fields(self) -> None:
+
+		updates: list[str] = self.update_user({'user_id': '1', 'name': 'user 1', 'money': 150})
+
+		self.assertEqual(len(updates), 1)
+		self.assertIn('"money"', updates[0])
+		self.assertIn('"updated_at"', updates[0])
+		self.assertNotIn('"name"', updates[0])
+		self.assertEqual(Users.objects.get(user_id='1').money, 150)
+		self.assertEqual(economy.snapshot_totals(economy.get_snapshot()), economy.totals_from_source())
+
+	def test_unchanged_row_is_not_saved(self) -> None:
+
+		self.assertEqual(self.update_user({'user_id': '1', 'name': 'user 1', 'money': 100, 'vetoes': None}), [])
+
+
+class GetChangesTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		AllowedAccess.objects.create(key='test')
+		Users.objects.create(user_id='1', name='user 1')
+		Users.objects.create(user_id='2', name='user 2')
+		Roles.objects.create(role_id='1', name='role 1')
+
+		cls.an_hour_ago: datetime.datetime = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+
+		# queryset.update skips auto_now, so the rows can be dated.
+		Users.objects.filter(user_id='1').update(updated_at=cls.an_hour_ago - timedelta(hours=1))
+		Users.objects.filter(user_id='2').update(updated_at=cls.an_hour_ago)
+		Roles.objects.update(updated_at=cls.an_hour_ago)
+
+	def get_changes(self, since: str | None) -> tuple[set[str], set[str], datetime.datetime]:
+		"""
+			Returns the ids of the users and roles sent, and the cursor.
+		"""
+
+		request = RequestFactory().generic('GET', '/voting/get_changes', data=json.dumps({'since': since, 'auth_key': 'test'}), content_type='application/json')
+		response = views.get_changes(request)
+
+		self.assertEqual(response.status_code, 200)
+
+		body: dict[str, typing.Any] = json.loads(response.content)
+
+		return (
+			{user['user_id'] for user in body['data']['users']},
+			{role['role_id'] for role in body['data']['roles']},
+			datetime.datetime.fromisoformat(body['cursor']),
+		)
+
+	def test_first_sync_returns_everything(self) -> None:
+
+		self.assertEqual(self.get_changes(None), ({'1', '2'}, {'1'}, self.an_hour_ago))
+
+	def test_next_sync_returns_what_changed_since(self) -> None:
+
+		_, _, cursor = self.get_changes(None)
+		user: Users = Users.objects.get(user_id='1')
+		user.money = 5
+		user.save()
+
+		users, roles, next_cursor = self.get_changes(cursor.isoformat())
+
+		self.assertEqual((users, roles), ({'1', '2'}, {'1'}))  # 2 and the role again, as they're stamped at the cursor.
+		self.assertLessEqual(next_cursor, timezone.now() - views.CHANGES_CURSOR_LAG)  # Not up to user 1's save, it's too recent.
+		self.assertGreater(next_cursor, cursor)
+
+	def test_rows_stamped_at_the_cursor_are_sent_again(self) -> None:
+
+		Users.objects.update(updated_at=self.an_hour_ago)
+		_, _, cursor = self.get_changes(None)
+
+		self.assertEqual(self.get_changes(cursor.isoformat())[0], {'1', '2'})
+
+	def test_row_committed_after_a_later_stamped_one_is_not_missed(self) -> None:
+
+		user: Users = Users.objects.get(user_id='1')
+		user.money = 5
+		user.save()
+		_, _, cursor = self.get_changes(self.an_hour_ago.isoformat())
+
+		# Stamped before user 1's save, but only committed now, after the sync above.
+		Users.objects.create(user_id='3', name='user 3')
+		Users.objects.filter(user_id='3').update(updated_at=user.updated_at - timedelta(seconds=1))
+
+		self.assertIn('3', self.get_changes(cursor.isoformat())[0])
+
+
+class PollBallotTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		AllowedAccess.objects.create(key='test')
+		cls.open_provision: ProvisionHistory = ProvisionHistory.objects.create(
+			proposed_by_name='user 1', message_id='10', polls_close_at=timezone.now() + timedelta(days=1), function_key='tax',
+		)
+		ProvisionHistory.objects.create(proposed_by_name='user 1', message_id='20', polls_close_at=timezone.now(), function_key='tax', passed=True)
+
+	def post(self, view: typing.Callable[[django.http.HttpRequest], django.http.HttpResponse], data: dict[str, typing.Any]) -> int:
+
+		request = RequestFactory().post(f'/voting/{view.__name__}', data=json.dumps(data | {'auth_key': 'test'}), content_type='application/json')
+
+		return view(request).status_code
+
+	def ballots(self) -> set[tuple[str, str, int]]:
+
+		return set(PollBallot.objects.values_list('message_id', 'user_id', 'answer_id'))
+
+	def test_add_replaces_a_changed_answer(self) -> None:
+
+		self.assertEqual(self.post(views.add_poll_ballot, {'message_id': '10', 'user_id': '1', 'answer_id': 1}), 204)
+		self.assertEqual(self.post(views.add_poll_ballot, {'message_id': '10', 'user_id': '1', 'answer_id': 2}), 204)
+
+		self.assertEqual(self.ballots(), {('10', '1', 2)})
+
+	def test_delete_only_removes_the_same_answer(self) -> None:
+
+		PollBallot.objects.create(message_id='10', user_id='1', answer_id=2)
+
+		self.assertEqual(self.post(views.delete_poll_ballot, {'message_id': '10', 'user_id': '1', 'answer_id': 1}), 204)  # Late, they've changed it since.
+		self.assertEqual(self.ballots(), {('10', '1', 2)})
+
+		self.assertEqual(self.post(views.delete_poll_ballot, {'message_id': '10', 'user_id': '1', 'answer_id': 2}), 204)
+		self.assertEqual(self.ballots(), set())
+
+	def test_incomplete_ballots_are_rejected(self) -> None:
+
+		self.assertEqual(self.post(views.add_poll_ballot, {'message_id': '10', 'user_id': '1'}), 400)
+		self.assertEqual(self.post(views.delete_poll_ballot, {'message_id': '10', 'answer_id': 1}), 400)
+
+	def test_open_poll_ballots_are_those_of_open_provisions(self) -> None:
+
+		PollBallot.objects.create(message_id='10', user_id='1', answer_id=1)
+		PollBallot.objects.create(message_id='20', user_id='1', answer_id=1)
+
+		request = RequestFactory().generic('GET', '/voting/get_open_poll_ballots', data=json.dumps({'auth_key': 'test'}), content_type='application/json')
+		response = views.get_open_poll_ballots(request)
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual([ballot['message_id'] for ballot in json.loads(response.content)['data']], ['10'])
+
+	def test_resolving_a_provision_deletes_its_ballots(self) -> None:
+
+		PollBallot.objects.create(message_id='10', user_id='1', answer_id=1)
+		PollBallot.objects.create(message_id='10', user_id='2', answer_id=2)
+		PollBallot.objects.create(message_id='30', user_id='1', answer_id=1)
+
+		self.assertEqual(self.post(views.update_provision, {'proposal_id': self.open_provision.proposal_id, 'passed': True}), 204)
+
+		self.assertEqual(self.ballots(), {('30', '1', 1)})
+
+
+class TransferMoneyTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		AllowedAccess.objects.create(key='test')
+		Users.objects.create(user_id='1', name='sender', money=100)
+		Users.objects.create(user_id='2', name='recipient', money=5)
+		economy.rebuild_snapshot()
+
+	def transfer_money(self, amount: typing.Any) -> django.http.HttpResponse:
+
+		request = RequestFactory().post(
+			'/voting/transfer_money',
+			data=json.dumps({'from_user_id': '1', 'to_user_id': '2', 'amount': amount, 'auth_key': 'test'}),
+			content_type='application/json',
+		)
+
+		return views.transfer_money(request)
+
+	def test_moves_money_and_logs_it(self) -> None:
+
+		response = self.transfer_money(60)
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual({user['user_id']: user['money'] for user in json.loads(response.content)['data']}, {'1': 40, '2': 65})
+		self.assertEqual(dict(Users.objects.values_list('user_id', 'money')), {'1': 40, '2': 65})
+		self.assertTrue(TransactionLog.objects.filter(transaction_type=transactionType.TRANSFER, transactor_id='1', recipient_id='2', transaction_total=60).exists())
+		self.assertEqual(economy.snapshot_totals(economy.get_snapshot()), economy.totals_from_source())
+
+	def test_refuses_what_the_sender_cant_afford(self) -> None:
+
+		self.assertEqual(self.transfer_money(101).status_code, 409)
+		self.assertEqual(self.transfer_money(0).status_code, 400)
+		self.assertEqual(dict(Users.objects.values_list('user_id', 'money')), {'1': 100, '2': 5})
+		self.assertFalse(TransactionLog.objects.exists())
+
+
+@mock.patch.object(moonPhaseQuarters, 'get_phase_by_date', return_value=moonPhaseQuarters.FULL_MOON)  # Never paid reads as a new moon.
+class PaydayTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		AllowedAccess.objects.create(key='test')
+		VotingRules.objects.create(
+			registration_cooldown_hours=1, accepting_new_registrations=True, voting_style=0, poll_availability_hours=24,
+			tiebreaking_method=0, is_sending_notifications=False, is_electoral_college_active=False, ubi_amount=100,
+		)
+		Roles.objects.create(role_id='10', salary=300)
+		Roles.objects.create(role_id='11', salary=None)
+		Users.objects.create(user_id=economy.GOD_KING_USER_ID, name='god king', money=10 ** 9)
+
+		for i in range(5):
+
+			Users.objects.create(user_id=str(i), name=f'user {i}', money=1000)
+
+		economy.rebuild_snapshot()
+
+	def run_payday(self, members: dict[str, list[str]]) -> django.http.HttpResponse:
+
+		request = RequestFactory().post(
+			'/voting/run_payday',
+			data=json.dumps({'members': members, 'transactor_id': 'bot', 'auth_key': 'test'}),
+			content_type='application/json',
+		)
+
+		return views.run_payday(request)
+
+	def test_pays_everybody_their_best_salary_once(self, _: mock.MagicMock) -> None:
+
+		members: dict[str, list[str]] = {'0': [], '1': ['10'], '2': ['11'], '3': ['10', '11'], economy.GOD_KING_USER_ID: ['10'], 'left': ['10']}
+
+		with self.assertNumQueries(11):  # One UPDATE however many are paid.
+
+			response = self.run_payday(members)
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(json.loads(response.content)['data']['total_payed_out'], 100 + 300 + 100 + 300 + 300)
+		self.assertEqual(dict(Users.objects.exclude(user_id=economy.GOD_KING_USER_ID).values_list('user_id', 'money')), {'0': 1100, '1': 1300, '2': 1100, '3': 1300, '4': 1000})
+		self.assertEqual(TransactionLog.objects.get(transaction_type=transactionType.INCOME_PAYMENT).transaction_total, 1100)
+		self.assertEqual(economy.snapshot_totals(economy.get_snapshot()), economy.totals_from_source())
+
+		self.assertEqual(self.run_payday(members).status_code, 409)
+		self.assertEqual(Users.objects.get(user_id='1').money, 1300)
+
+
+class WireFormatTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		AllowedAccess.objects.create(key='test')
+		Users.objects.bulk_create(Users(user_id=str(i), name=f'user {i}') for i in range(50))
+
+	def get_users(self, **headers: str) -> django.http.HttpResponse:
+
+		request = RequestFactory().generic('GET', '/voting/get_users', data=json.dumps({'auth_key': 'test'}), content_type='application/json', headers=headers)
+
+		return views.get_users(request)
+
+	def test_plain_json_by_default(self) -> None:
+
+		response = self.get_users()
+
+		self.assertEqual(response['Content-Type'], wire.JSON_CONTENT_TYPE)
+		self.assertFalse(response.has_header('Content-Encoding'))
+		self.assertEqual(len(json.loads(response.content)['data']), 50)
+
+	def test_gzip_when_accepted(self) -> None:
+
+		response = self.get_users(**{'Accept-Encoding': 'gzip;q=0.5, br'})
+
+		self.assertEqual(response['Content-Encoding'], 'gzip')
+		self.assertIn('Accept-Encoding', response['Vary'])
+		self.assertEqual(len(json.loads(gzip.decompress(response.content))['data']), 50)
+
+	def test_refused_encoding_is_not_used(self) -> None:
+
+		self.assertFalse(self.get_users(**{'Accept-Encoding': 'gzip;q=0'}).has_header('Content-Encoding'))
+
+	@unittest.skipIf(wire.msgpack is None, "msgpack is not installed.")
+	def test_msgpack_when_preferred(self) -> None:
+
+		response = self.get_users(Accept=f'{wire.MSGPACK_CONTENT_TYPE}, {wire.JSON_CONTENT_TYPE};q=0.9')
+
+		self.assertEqual(response['Content-Type'], wire.MSGPACK_CONTENT_TYPE)
+		self.assertEqual(len(wire.msgpack.unpackb(response.content)['data']), 50)
+
+
+class ConditionalGetTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		AllowedAccess.objects.create(key='test')
+		Roles.objects.create(role_id='1', name='role 1')
+
+	def get_roles(self, **headers: str) -> django.http.HttpResponse:
+
+		request = RequestFactory().generic('GET', '/voting/get_roles', data=json.dumps({'auth_key': 'test'}), content_type='application/json', headers=headers)
+
+		return views.get_roles(request)
+
+	def test_not_modified_until_changed(self) -> None:
+
+		etag: str = self.get_roles()['ETag']
+		response = self.get_roles(**{'If-None-Match': etag})
+
+		self.assertEqual(response.status_code, 304)
+		self.assertEqual(response.content, b'')
+
+		Roles.objects.create(role_id='2', name='role 2')
+		response = self.get_roles(**{'If-None-Match': etag})
+
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], etag)
+
+	def test_same_etag_however_compressed(self) -> None:
+
+		self.assertEqual(self.get_roles()['ETag'], self.get_roles(**{'Accept-Encoding': 'gzip'})['ETag'])
+
+	def test_changing_resources_are_not_tagged(self) -> None:
+
+		request = RequestFactory().generic('GET', '/voting/get_users', data=json.dumps({'auth_key': 'test'}), content_type='application/json')
+		Users.objects.create(user_id='1', name='user 1')
+
+		self.assertFalse(views.get_users(request).has_header('ETag'))
+
+
+class SubmitVoteTests(TestCase):
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		VotingRules.objects.create(
+			registration_cooldown_hours=1, accepting_new_registrations=True, voting_style=0, poll_availability_hours=24,
+			tiebreaking_method=0, is_sending_notifications=False, is_electoral_college_active=False, allowed_open_proposals=100,
+		)
+
+	def submit_vote(self, value1: str) -> tuple[str, int]:
+		"""
+			Returns where it redirected to, and how many queries it ran.
+		"""
+
+		request = RequestFactory().post('/voting/submit_vote', data={'proposee': 'user 1', 'category': 'tax', 'value1': value1})
+
+		with CaptureQueriesContext(connection) as queries:
+
+			response = views.submit_vote(request)
+
+		return response['Location'], len(queries.captured_queries)
+
+	def test_queries_do_not_grow_with_open_provisions(self) -> None:
+
+		_, queries = self.submit_vote('first')
+
+		ProvisionHistory.objects.bulk_create(
+			ProvisionHistory(proposed_by_name='user 1', polls_close_at=timezone.now() + timedelta(days=1), function_key='tax', value1=str(i))
+			for i in range(50)
+		)
+
+		self.assertEqual(self.submit_vote('second'), ('/voting/?from_submit=True', queries))
+
+	def test_open_proposal_limit(self) -> None:
+
+		rules: VotingRules = VotingRules.objects.get()
+		rules.allowed_open_proposals = 2
+		rules.save()
+
+		self.assertEqual(signals.voting_rules().allowed_open_proposals, 2)  # type: ignore ; The save dropped the cached rules.
+
+		self.submit_vote('1')
+		self.submit_vote('2')
+
+		self.assertIn('too_many_provisions=True', self.submit_vote('3')[0])
+		self.assertEqual(ProvisionHistory.objects.count(), 2)
+
+
+class ConfigCacheTests(TransactionTestCase):
+	"""
+		Outside of a test's transaction, as the cache is only used outside of transactions.
+	"""
+
+	def setUp(self) -> None:
+
+		self.rules: VotingRules = VotingRules.objects.create(
+			registration_cooldown_hours=1, accepting_new_registrations=True, voting_style=0, poll_availability_hours=24,
+			tiebreaking_method=0, is_sending_notifications=False, is_electoral_college_active=False, allowed_open_proposals=10,
+		)
+
+	def test_cached_until_a_save_commits(self) -> None:
+
+		signals.voting_rules()
+
+		with self.assertNumQueries(0):
+
+			signals.voting_rules()
+
+		with transaction.atomic():
+
+			self.rules.allowed_open_proposals = 5
+			self.rules.save()
+			signals.voting_rules()  # Not kept, nothing else may see this yet.
+
+		self.assertEqual(signals.voting_rules().allowed_open_proposals, 5)  # type: ignore
+
+	def test_rolled_back_save_is_not_cached(self) -> None:
+
+		try:
+
+			with transaction.atomic():
+
+				self.rules.allowed_open_proposals = 5
+				self.rules.save()
+				self.assertEqual(signals.voting_rules().allowed_open_proposals, 5)  # type: ignore
+
+				raise RuntimeError()
+
+		except RuntimeError:
+
+			pass
+
+		self.assertEqual(signals.voting_rules().allowed_open_proposals, 10)  # type: ignore
+
+
+class AccessKeyCacheTests(TransactionTestCase):
+	"""
+		Like ConfigCacheTests, outside of a test's transaction.
+	"""
+
+	def setUp(self) -> None:
+
+		signals._allowed_access_keys.invalidate()  # The flush between tests sends no signals.
+		self.key: AllowedAccess = AllowedAccess.objects.create(key='test')
+		Roles.objects.create(role_id='1', name='role 1')
+
+	def get_roles(self, key: str) -> int:
+
+		request = RequestFactory().generic('GET', '/voting/get_roles', data=json.dumps({'auth_key': key}), content_type='application/json')
+
+		return views.get_roles(request).status_code
+
+	def test_deleted_key_is_rejected(self) -> None:
+
+		self.assertEqual(self.get_roles('test'), 200)
+
+		with self.assertNumQueries(2):  # Only get_roles' own, the key is cached.
+
+			self.assertEqual(self.get_roles('test'), 200)
+
+		self.key.delete()
+
+		self.assertEqual(self.get_roles('test'), 403)
+
+	def test_new_key_is_accepted(self) -> None:
+
+		self.assertEqual(self.get_roles('new'), 403)  # Caching the keys without it.
+
+		AllowedAccess.objects.create(key='new')
+
+		self.assertEqual(self.get_roles('new'), 200)
+
+	def test_rolled_back_key_is_not_cached(self) -> None:
+
+		try:
+
+			with transaction.atomic():
+
+				AllowedAccess.objects.create(key='new')
+				self.assertEqual(self.get_roles('new'), 200)
+
+				raise RuntimeError()
+
+		except RuntimeError:
+
+			pass
+
+		self.assertEqual(self.get_roles('new'), 403)
+
+	def test_body_is_decoded_once(self) -> None:
+
+		request = RequestFactory().generic('GET', '/voting/get_changes', data=json.dumps({'since': None, 'auth_key': 'test'}), content_type='application/json')
+
+		with mock.patch.object(views.json, 'loads', wraps=json.loads) as loads:
+
+			self.assertEqual(views.get_changes(request).status_code, 200)  # Which reads "since" from the body too.
+
+		self.assertEqual(loads.call_count, 1)
+
+
+class ChangeFeedTests(TransactionTestCase):
+	"""
+		Outside of a test's transaction, as events are only announced once they're committed.
+	"""
+
+	def setUp(self) -> None:
+
+		signals._allowed_access_keys.invalidate()
+		AllowedAccess.objects.create(key='test')
+
+	def get_change_events(self, since: int | None) -> tuple[list[str], int, float]:
+		"""
+			Returns the object ids of the events sent, the cursor, and how many seconds the request took.
+		"""
+
+		request = RequestFactory().generic('GET', '/voting/get_change_events', data=json.dumps({'since': since, 'auth_key': 'test'}), content_type='application/json')
+		start: float = time.monotonic()
+		response = views.get_change_events(request)
+		seconds: float = time.monotonic() - start
+
+		self.assertEqual(response.status_code, 200)
+
+		body: dict[str, typing.Any] = json.loads(response.content)
+
+		return [event['object_id'] for event in body['data']], body['cursor'], seconds
+
+	def test_fresh_subscription_only_gets_the_cursor(self) -> None:
+
+		signals.publish_change_event('provision_submitted', 1)
+		event: ChangeEvent = signals.publish_change_event('provision_submitted', 2)
+
+		self.assertEqual(self.get_change_events(None)[:2], ([], event.id))
+
+	@mock.patch.object(views, 'CHANGE_FEED_LONG_POLL_SECONDS', 0.2)
+	def test_cursor_advances_past_the_events_sent(self) -> None:
+
+		first: ChangeEvent = signals.publish_change_event('provision_submitted', 1)
+		second: ChangeEvent = signals.publish_change_event('provision_submitted', 2)
+
+		self.assertEqual(self.get_change_events(first.id)[:2], (['2'], second.id))
+		self.assertEqual(self.get_change_events(second.id)[:2], ([], second.id))
+
+	@mock.patch.object(views, 'CHANGE_FEED_LONG_POLL_SECONDS', 0.2)
+	def test_empty_poll_returns_after_the_hold_time(self) -> None:
+
+		event_ids, cursor, seconds = self.get_change_events(0)
+
+		self.assertEqual((event_ids, cursor), ([], 0))
+		self.assertGreaterEqual(seconds, 0.2)
+		self.assertLess(seconds, 2)
+
+	@mock.patch.object(views, 'CHANGE_FEED_RECHECK_SECONDS', 10.0)  # So only being woken can end the wait early.
+	def test_published_event_is_returned_promptly(self) -> None:
+
+		def publish_later() -> None:
+
+			time.sleep(0.2)
+
+			with transaction.atomic():
+
+				signals.publish_change_event('provision_submitted', 1)
+
+			connection.close()
+
+		publisher: threading.Thread = threading.Thread(target=publish_later)
+		publisher.start()
+		event_ids, _, seconds = self.get_change_events(0)
+		publisher.join()
+
+		self.assertEqual(event_ids, ['1'])
+		self.assertLess(seconds, 5)
+
+	def test_waiters_are_woken_once_the_event_commits(self) -> None:
+
+		with mock.patch.object(signals.change_feed_condition, 'notify_all') as notify_all:
+
+			with transaction.atomic():
+
+				signals.publish_change_event('provision_submitted', 1)
+
+				notify_all.assert_not_called()
+
+			notify_all.assert_called_once()
+
+	@mock.patch.object(views, 'CHANGE_FEED_LONG_POLL_SECONDS', 0.2)
+	def test_old_events_are_pruned(self) -> None:
+
+		signals.publish_change_event('provision_submitted', 1)
+		ChangeEvent.objects.update(created_at=timezone.now() - views.CHANGE_FEED_RETENTION - timedelta(minutes=1))
+		signals.publish_change_event('provision_submitted', 2)
+
+		self.assertEqual(self.get_change_events(0)[0], ['2'])
+		self.assertEqual(list(ChangeEvent.objects.values_list('object_id', flat=True)), ['2'])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "The plans are read in SQLite's EXPLAIN QUERY PLAN format.")
+class QueryPlanTests(TestCase):
+	"""
+		Runs every endpoint the bot's heartbeat calls, and checks that none of their queries scan a whole table.
+		The plans come from the SQL each endpoint actually ran, so they follow the views as they change.
+	"""
+
+	HEARTBEAT_ENDPOINTS: list[tuple[str, dict[str, typing.Any]]] = [
+		('get_unposted_provisions', {}),
+		('get_resolvable_provisions', {}),
+		('get_open_provisions', {}),
+		('get_open_judicial_challenges', {}),
+		('get_updatable_temporary_positions', {}),
+		('get_temporary_position', {'user_id': '1', 'role_id': '2'}),
+		('get_last_payment_quarter', {}),
+		('get_open_poll_ballots', {}),
+		('get_change_events', {'since': 0}),
+		('get_changes', {'since': '2026-01-01T00:00:00+00:00'}),
+		('get_price_of_crack', {}),
+	]
+	SMALL_TABLES: frozenset[str] = frozenset({'votingapp_allowedaccess', 'votingapp_economysnapshot'})  # Read whole, and only a row or two.
+	FULL_SCAN: re.Pattern[str] = re.compile(r'^SCAN (\w+)$')
+
+	@classmethod
+	def setUpTestData(cls) -> None:
+
+		AllowedAccess.objects.create(key='test')
+		ChangeEvent.objects.create(kind='provision_submitted', object_id='1')  # So get_change_events answers instead of waiting.
+		Users.objects.create(user_id='1', name='user 1', money=100)
+		TemporaryPosition.objects.create(user_id='1', role_id='2', is_elected_position=False, position_expires_at=timezone.now())
+
+	def full_scans(self, endpoint: str, payload: dict[str, typing.Any]) -> list[str]:
+
+		with CaptureQueriesContext(connection) as queries:
+
+			response = self.client.generic(
+				'GET',
+				f'/voting/{endpoint}',
+				data=json.dumps(payload | {'auth_key': 'test'}),
+				content_type='application/json',
+				HTTP_HOST='gaygen.com',
+			)
+
+		self.assertLess(response.status_code, 300, endpoint)
+
+		scans: list[str] = []
+
+		for query in queries.captured_queries:
+
+			if not query['sql'].startswith(('SELECT', 'UPDATE', 'DELETE')):
+
+				continue
+
+			with connection.cursor() as cursor:
+
+				cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+
+				for row in cursor.fetchall():
+
+					match: re.Match[str] | None = self.FULL_SCAN.match(row[-1])
+
+					if match is not None and match.group(1) not in self.SMALL_TABLES:
+
+						scans.append(f"{row[-1]} in {query['sql']}")
+
+		return scans
+
+	def test_heartbeat_endpoints_use_indexes(self) -> None:
+
+		for endpoint, payload in self.HEARTBEAT_ENDPOINTS:
+
+			with self.subTest(endpoint=endpoint):
+
+				self.assertEqual(self.full_scans(endpoint, payload), [])
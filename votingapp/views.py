@@ -1,17 +1,21 @@
 import django.http
 import datetime
 import json
+import time
 import typing
 
 from http import HTTPStatus
 from django.shortcuts import render
+from votingapp import economy, wire
 from votingapp.models import *
 from django.core import serializers
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
 from django.forms.models import model_to_dict
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
+from votingapp.signals import allowed_access_keys, change_feed_condition, voting_rules
 
 #TODO Add ordering to get_users and get_roles
 
@@ -108,19 +112,19 @@ def submit_vote(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
 	url_options: str = '?from_submit=True'
 
-	voting_rules: VotingRules | None = VotingRules.objects.first()
+	rules: VotingRules | None = voting_rules()
 
-	assert voting_rules is not None
+	assert rules is not None
 
 	proposed_by_name: str = request.POST['proposee'] # type: ignore
-	polls_close_at: datetime.datetime = voting_rules.get_poll_close_from_now()
+	polls_close_at: datetime.datetime = rules.get_poll_close_from_now()
 	function_key: str = request.POST['category'] # type: ignore
 
 	is_rigged: int = _is_rigged(function_key) # type: ignore
 	value1: str = request.POST['value1'] if 'value1' in request.POST else '' # type: ignore
 	value2: str = request.POST['value2'] if 'value2' in request.POST else '' # type: ignore
 
-	if len([provision for provision in ProvisionHistory.objects.filter(passed__isnull=True)]) >= voting_rules.allowed_open_proposals:
+	if ProvisionHistory.objects.filter(passed__isnull=True).count() >= rules.allowed_open_proposals:
 
 		url_options += '&too_many_provisions=True'
 
@@ -154,9 +158,22 @@ def submit_vote(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
 # -Verification-
 
+def _request_json(request: django.http.HttpRequest) -> typing.Any:
+	"""
+		Decode the request's JSON body, once. Every API call is decoded by the verification decorators before the view
+		sees it, so the result is kept on the request for the view to reuse.
+	"""
+
+	if not hasattr(request, '_votingapp_json'):
+
+		request._votingapp_json = json.loads(request.body)  # type: ignore
+
+	return request._votingapp_json  # type: ignore
+
+
 def _verify_auth(request: django.http.HttpRequest) -> django.http.HttpResponse | None:
 
-	request_body: dict[str, typing.Any] = json.loads(request.body)
+	request_body: dict[str, typing.Any] = _request_json(request)
 
 	if 'auth_key' not in request_body:
 
@@ -165,7 +182,7 @@ def _verify_auth(request: django.http.HttpRequest) -> django.http.HttpResponse |
 
 	key: str = request_body['auth_key']
 
-	return django.http.HttpResponseForbidden() if key not in AllowedAccess.objects.all().values_list('key', flat=True) else None
+	return django.http.HttpResponseForbidden() if key not in allowed_access_keys() else None
 
 
 def _verify_get_request(request: django.http.HttpRequest) -> django.http.HttpResponse | None:  # TODO make decorator
@@ -187,14 +204,34 @@ def _verify_post_request(request: django.http.HttpRequest) -> django.http.HttpRe
 
 # -Generic DB accesses-
 
+_field_names_by_model: dict[type[models.Model], tuple[frozenset[str], frozenset[str], frozenset[str]]] = dict()
+
+
+def _field_names(model: type[V]) -> tuple[frozenset[str], frozenset[str], frozenset[str]]:
+	"""
+		Returns the keys a request for this model may contain, the fields an update may write, and the auto_now fields.
+		Built once per model, as _meta.get_fields() is not cheap and used to be rebuilt for every key of every row.
+	"""
+
+	if model not in _field_names_by_model:
+
+		accepted_keys: frozenset[str] = frozenset([*[field.name for field in model._meta.get_fields()], 'auth_key'])
+		auto_now_fields: frozenset[str] = frozenset(field.name for field in model._meta.concrete_fields if getattr(field, 'auto_now', False))
+		updatable_fields: frozenset[str] = frozenset(field.name for field in model._meta.concrete_fields if not field.primary_key) - auto_now_fields
+
+		_field_names_by_model[model] = (accepted_keys, updatable_fields, auto_now_fields)
+
+	return _field_names_by_model[model]
+
+
 @verify_post
 def _generic_add_single(request: django.http.HttpRequest, target_model: type[V]) -> django.http.HttpResponse:
 
 	model_to_add: V = target_model()
 
-	request_data: dict[str, typing.Any] = json.loads(request.body)
+	request_data: dict[str, typing.Any] = _request_json(request)
 
-	if any(key not in [*model_to_add.__dict__.keys(), 'auth_key']  for key in request_data):
+	if any(key not in _field_names(target_model)[0] for key in request_data):
 
 		return django.http.HttpResponseBadRequest()
 
@@ -207,10 +244,75 @@ def _generic_add_single(request: django.http.HttpRequest, target_model: type[V])
 	return django.http.HttpResponse(status=HTTPStatus.NO_CONTENT)
 
 
+@verify_post
+def _generic_add_multiple(request: django.http.HttpRequest, target_model: type[V]) -> django.http.HttpResponse:
+	"""
+		Adds every row in "data" with bulk_create. Rows whose primary key already exists (in the database, or earlier in the
+		same request) are skipped rather than failing the batch, so a retried or overlapping batch is harmless.
+	"""
+
+	request_top_level: dict[str, list[dict[str, typing.Any]]] = _request_json(request)
+
+	if target_model._meta.pk is None:
+
+		return django.http.HttpResponse(status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+	pk_name: str = target_model._meta.pk.name
+
+	if 'data' not in request_top_level:
+
+		return django.http.HttpResponseBadRequest()
+
+	request_list: list[dict[str, typing.Any]] = request_top_level['data']
+	accepted_keys: frozenset[str] = _field_names(target_model)[0]
+
+	request_data: dict[str, typing.Any]
+	for request_data in request_list:
+
+		is_missing_pk: bool = pk_name not in request_data
+		has_unknown_attributes: bool = any(key not in accepted_keys for key in request_data)
+
+		if is_missing_pk or has_unknown_attributes:
+
+			print(f"Does not contain primary key: {is_missing_pk}",
+				f"Data contains key that is not part of the model: {has_unknown_attributes}")
+
+			return django.http.HttpResponseBadRequest()
+
+	with transaction.atomic():
+
+		existing_pks: set[typing.Any] = set(target_model.objects.filter(pk__in=[request_data[pk_name] for request_data in request_list]).values_list('pk', flat=True))
+		models_to_add: dict[typing.Any, V] = dict()
+
+		for request_data in request_list:
+
+			if request_data[pk_name] in existing_pks or request_data[pk_name] in models_to_add:
+
+				continue
+
+			# None means "the default", as the bot sends every field of its shadow whether it was set or not.
+			models_to_add[request_data[pk_name]] = target_model(**{key: value for key, value in request_data.items() if key != 'auth_key' and value is not None})
+
+		# ignore_conflicts covers a row added by someone else since we looked. bulk_create still runs pre_save, so auto_now
+		# fields are set, but sends no signals.
+		target_model.objects.bulk_create(models_to_add.values(), ignore_conflicts=True)
+
+		if target_model is Users:  # So the economy is told here, of the rows we actually inserted.
+
+			economy.record_money_change(_money_supply_of(_inserted_users(models_to_add)))
+
+	return django.http.HttpResponse(status=HTTPStatus.NO_CONTENT)
+
+
 @verify_post
 def _generic_update_single(request: django.http.HttpRequest, target_model: type[V], custom_index: Q | None=None) -> django.http.HttpResponse:
+	"""
+		Updates one row with the fields in the request. The bot only sends the fields it changed, and of those only the
+		ones that differ from the row are saved, with update_fields. So the UPDATE only writes those columns, and two
+		requests changing different fields of the same row can't undo each other.
+	"""
 
-	request_data: dict[str, typing.Any] = json.loads(request.body)
+	request_data: dict[str, typing.Any] = _request_json(request)
 
 	if target_model._meta.pk is None:
 
@@ -223,13 +325,14 @@ def _generic_update_single(request: django.http.HttpRequest, target_model: type[
 		return django.http.HttpResponseBadRequest()
 
 	target_filter: Q = Q(pk=request_data[pk_name]) if custom_index is None else custom_index
+	accepted_keys, updatable_fields, auto_now_fields = _field_names(target_model)
 
-	query = target_model.objects.filter(target_filter)
+	matches: list[V] = list(target_model.objects.filter(target_filter)[:2])  # Two is enough to tell it isn't unique.
 
 	is_missing_pk: bool = custom_index is None and pk_name not in request_data
-	does_not_exist: bool = not query.exists()
-	is_not_unique: bool = query.count() > 1
-	has_unknown_attributes: bool = any(key not in [*[field.name for field in target_model._meta.get_fields()], 'auth_key'] for key in request_data)
+	does_not_exist: bool = len(matches) == 0
+	is_not_unique: bool = len(matches) > 1
+	has_unknown_attributes: bool = any(key not in accepted_keys for key in request_data)
 
 	if (is_missing_pk or does_not_exist or is_not_unique or has_unknown_attributes):
 
@@ -240,19 +343,22 @@ def _generic_update_single(request: django.http.HttpRequest, target_model: type[
 
 		return django.http.HttpResponseBadRequest() if not does_not_exist else django.http.HttpResponseNotFound()
 	
-	db_entry_to_edit: V | None = query.first()
-	
-	if db_entry_to_edit is None:  # Is already logically caught with .exists. This is for type hinting
-
-		return django.http.HttpResponseNotFound()
+	db_entry_to_edit: V = matches[0]
+	fields_to_update: set[str] = set()
 
 	for key, value in request_data.items():
 
-		if value is not None:  # Entries may be created with a blank, but None here means no change.
+		# Entries may be created with a blank, but None here means no change.
+		if value is not None and key in updatable_fields and getattr(db_entry_to_edit, key) != value:
 
 			setattr(db_entry_to_edit, key, value)
+			fields_to_update.add(key)
+
+	if len(fields_to_update) == 0:
 
-	db_entry_to_edit.save()
+		return django.http.HttpResponse(status=HTTPStatus.NO_CONTENT)
+
+	db_entry_to_edit.save(update_fields=sorted(fields_to_update | auto_now_fields))  # auto_now fields are only set if listed.
 
 	return django.http.HttpResponse(status=HTTPStatus.NO_CONTENT)
 
@@ -262,6 +368,7 @@ def _generic_get_multiple(request: django.http.HttpRequest,
 							model_to_get: type[V], 
 							filters: Q | None = None, 
 							order: str | None = None,
+							is_conditional: bool = False,
 						) -> django.http.HttpResponse:
 
 	if filters is None:
@@ -278,17 +385,17 @@ def _generic_get_multiple(request: django.http.HttpRequest,
 
 	if order is not None:
 
-		data.order_by(order)
+		data = data.order_by(order)  # A stable order also keeps a conditional response's ETag stable.
 
 	response_data: dict[str, typing.Iterable[typing.Any]] = {'data': [model_to_dict(entry) for entry in data]}
 
-	return django.http.JsonResponse(response_data, status=HTTPStatus.OK)
+	return wire.response(request, response_data, is_conditional=is_conditional)
 
 
 @verify_get
-def _generic_get_single(request: django.http.HttpRequest, model_to_get: type[V], custom_index: Q | None = None) -> django.http.HttpResponse:
+def _generic_get_single(request: django.http.HttpRequest, model_to_get: type[V], custom_index: Q | None = None, is_conditional: bool = False) -> django.http.HttpResponse:
 
-	request_data: dict[str, typing.Any] = json.loads(request.body)
+	request_data: dict[str, typing.Any] = _request_json(request)
 
 	if model_to_get._meta.pk is None:
 
@@ -306,13 +413,30 @@ def _generic_get_single(request: django.http.HttpRequest, model_to_get: type[V],
 
 	data = model_to_dict(get_object_or_404(model_to_get, target_filter))
 
-	return django.http.JsonResponse(data, status=HTTPStatus.OK)
+	return wire.response(request, data, is_conditional=is_conditional)
+
+
+def _inserted_users(users_to_add: dict[str, Users]) -> list[Users]:
+	"""
+		Which of the users just given to bulk_create(ignore_conflicts=True) it inserted, rather than skipped for a row added
+		by someone else since we looked. Skipped rows aren't reported, so we tell them apart by updated_at: pre_save set a
+		fresh timestamp on each of ours, a row inserted by someone else has its own.
+	"""
+
+	updated_at_by_id: dict[str, datetime.datetime] = dict(Users.objects.filter(pk__in=list(users_to_add)).values_list('pk', 'updated_at'))
+
+	return [user for user_id, user in users_to_add.items() if updated_at_by_id.get(user_id) == user.updated_at]
+
+
+def _money_supply_of(users: typing.Iterable[Users]) -> int:
+
+	return sum(economy.counted_money(user.user_id, user.money) for user in users)
 
 
 @verify_post
 def _generic_update_multiple(request: django.http.HttpRequest, model_to_update: type[V]) -> django.http.HttpResponse:
 		
-	request_top_level: dict[str, list[dict[str, typing.Any]]] = json.loads(request.body)
+	request_top_level: dict[str, list[dict[str, typing.Any]]] = _request_json(request)
 
 	if model_to_update._meta.pk is None:
 
@@ -324,13 +448,14 @@ def _generic_update_multiple(request: django.http.HttpRequest, model_to_update:
 
 		return django.http.HttpResponseBadRequest()
 
-	request_list = request_top_level['data']
+	request_list: list[dict[str, typing.Any]] = request_top_level['data']
+	accepted_keys, updatable_fields, auto_now_fields = _field_names(model_to_update)
 
 	request_data: dict[str, typing.Any]
 	for request_data in request_list:
 
 		is_missing_pk: bool = pk_name not in request_data
-		has_unknown_attributes: bool = any(key not in [*[field.name for field in model_to_update._meta.get_fields()], 'auth_key'] for key in request_data)
+		has_unknown_attributes: bool = any(key not in accepted_keys for key in request_data)
 
 		if is_missing_pk or has_unknown_attributes:
 
@@ -339,132 +464,294 @@ def _generic_update_multiple(request: django.http.HttpRequest, model_to_update:
 
 			return django.http.HttpResponseBadRequest()
 
-		db_entry_to_edit = get_object_or_404(model_to_update, pk=request_data[pk_name])
+	with transaction.atomic():  # The rows are read and written as one, so a concurrent update can't be lost in between.
 
-		for key, value in request_data.items():
+		db_entries: dict[typing.Any, V] = model_to_update.objects.select_for_update().in_bulk([request_data[pk_name] for request_data in request_list])
 
-			if value is not None:  # Entries may be created with a blank, but None here means no change.
+		if any(request_data[pk_name] not in db_entries for request_data in request_list):
 
-				setattr(db_entry_to_edit, key, value)
+			return django.http.HttpResponseNotFound()
+
+		changed_entries: dict[typing.Any, V] = dict()
+		fields_to_update: set[str] = set()
+		money_before: int = _money_supply_of(db_entries.values()) if model_to_update is Users else 0
+
+		for request_data in request_list:
+
+			db_entry_to_edit: V = db_entries[request_data[pk_name]]
+
+			for key, value in request_data.items():
+
+				# Entries may be created with a blank, but None here means no change. Most rows are sent unchanged, and skipping
+				# them is what makes this fast, as bulk_update's cost is in building a CASE for every row it writes.
+				if value is not None and key in updatable_fields and getattr(db_entry_to_edit, key) != value:
+
+					setattr(db_entry_to_edit, key, value)
+					fields_to_update.add(key)
+					changed_entries[db_entry_to_edit.pk] = db_entry_to_edit
+
+		if len(changed_entries) == 0:
+
+			return django.http.HttpResponse(status=HTTPStatus.NO_CONTENT)
+
+		now: datetime.datetime = timezone.now()
+
+		for field_name in auto_now_fields:  # bulk_update doesn't run pre_save, so auto_now fields are ours to set.
+
+			for db_entry in changed_entries.values():
+
+				setattr(db_entry, field_name, now)
+
+		model_to_update.objects.bulk_update(changed_entries.values(), sorted(fields_to_update | auto_now_fields))
+
+		if model_to_update is Users and 'money' in fields_to_update:  # bulk_update sends no signals, so the economy is told here.
+
+			economy.record_money_change(_money_supply_of(db_entries.values()) - money_before)
 
-		db_entry_to_edit.save()
-	
 	return django.http.HttpResponse(status=HTTPStatus.NO_CONTENT)
 
-# -Misc.-
 
-def _is_rigged(key: str):
+CHANGES_CURSOR_LAG: timedelta = timedelta(minutes=5)  # Longer than any write transaction, payday's included.
 
-	rig_pass = [
+@verify_get
+def _get_changes_since(request: django.http.HttpRequest, models_to_get: dict[str, type[V]]) -> django.http.HttpResponse:
+	"""
+		Returns every row of each model that was modified at or after the "since" cursor (an updated_at timestamp), along with
+		the cursor to send next time. A missing or null cursor returns everything.
 
-	]
+		Rows modified in the same instant as the cursor are sent again, as it's cheaper for the bot to re-apply a row than it
+		is for us to risk missing one.
 
-	rig_fail = [
-		'dissolve',
-	]
+		auto_now stamps a row before its transaction commits, so a row can become visible after one stamped later than it
+		already has. The cursor therefore never passes CHANGES_CURSOR_LAG ago, and anything changed within that window is
+		sent again next time, in case a row stamped inside it was still uncommitted.
+	"""
 
-	if key in rig_pass:
-		return 1
+	since: str | None = _request_json(request).get('since')
+	since_time: datetime.datetime | None = datetime.datetime.fromisoformat(since) if since is not None else None
+	cursor: datetime.datetime | None = since_time
 
-	if key in rig_fail:
-		return 2
+	response_data: dict[str, list[dict[str, typing.Any]]] = dict()
 
-	return 0
+	for name, model in models_to_get.items():
+
+		rows = list(model.objects.all() if since_time is None else model.objects.filter(updated_at__gte=since_time))
+
+		response_data[name] = [model_to_dict(row) | {'updated_at': row.updated_at} for row in rows]  # model_to_dict skips auto_now fields.
+
+		for row in rows:
+
+			cursor = row.updated_at if cursor is None else max(cursor, row.updated_at)
+
+	if cursor is not None:
+
+		cursor = min(cursor, timezone.now() - CHANGES_CURSOR_LAG)
+
+	return wire.response(request, {'data': response_data, 'cursor': cursor})
+
+
+@verify_post
+def _upsert_poll_ballot(request: django.http.HttpRequest) -> django.http.HttpResponse:
+
+	request_data: dict[str, typing.Any] = _request_json(request)
+
+	if any(key not in request_data for key in ('message_id', 'user_id', 'answer_id')):
+
+		return django.http.HttpResponseBadRequest()
+
+	PollBallot.objects.update_or_create(
+		message_id=request_data['message_id'],
+		user_id=request_data['user_id'],
+		defaults={'answer_id': request_data['answer_id']},
+	)
+
+	return django.http.HttpResponse(status=HTTPStatus.NO_CONTENT)
+
+
+@verify_post
+def _delete_poll_ballot(request: django.http.HttpRequest) -> django.http.HttpResponse:
+
+	request_data: dict[str, typing.Any] = _request_json(request)
 
+	if any(key not in request_data for key in ('message_id', 'user_id', 'answer_id')):
 
-def _adjust_for_inflation(base_price: float, get_debug_info: bool = False) -> int | dict[str, int|float]:  # TODO consider moving economic functions into new module.
+		return django.http.HttpResponseBadRequest()
+
+	# Matching on the answer too means a late delete can't remove the vote that replaced it.
+	PollBallot.objects.filter(message_id=request_data['message_id'], user_id=request_data['user_id'], answer_id=request_data['answer_id']).delete()
+
+	return django.http.HttpResponse(status=HTTPStatus.NO_CONTENT)
+
+@verify_post
+def _transfer_money(request: django.http.HttpRequest) -> django.http.HttpResponse:
 	"""
-		The inflation system implemented is based on the "Quantity Theory of Money".
-		This theory establishes the basic equation; Money Supply * Velocity of Money = Price Level * Real GDP
-		
-		We calculate our money supply easily based on the total money between all users
-		Velocity is effectively how much money is moving, so we can count recent purchases.
-		Price level is a total of all prices, we use the most recent prices sold for each item as a sufficient
-		approximation of their current price.
-		Real GDP is tricky, as Schmucklandia produces nothing. So I use political activity as a proxy.
+		Moves "amount" from "from_user_id" to "to_user_id" in one transaction, and logs it. The balances are changed with F()
+		expressions in the database, so concurrent transfers can't overwrite each other, and the debit only happens if the
+		sender can afford it. Returns both users as they are afterwards.
+
+		409 (conflict) means the sender couldn't afford it.
 	"""
 
-	schmuckmarket_cap: int = 0
+	request_data: dict[str, typing.Any] = _request_json(request)
 
-	user: Users
-	for user in Users.objects.all():
+	from_user_id: typing.Any = request_data.get('from_user_id')
+	to_user_id: typing.Any = request_data.get('to_user_id')
+	amount: typing.Any = request_data.get('amount')
 
-		if user.user_id == '120020797480894464':
+	if not isinstance(from_user_id, str) or not isinstance(to_user_id, str) or from_user_id == to_user_id:
 
-			continue
+		return django.http.HttpResponseBadRequest()
+
+	if not isinstance(amount, int) or isinstance(amount, bool) or amount <= 0:
+
+		return django.http.HttpResponseBadRequest()
 
-		schmuckmarket_cap += user.money
+	with transaction.atomic():
 
-	transactions: django.db.models.QuerySet = TransactionLog.objects.exclude(transaction_type=transactionType.INCOME_PAYMENT)
+		if not Users.objects.filter(user_id=to_user_id).exists():
 
-	total_transactions = transactions.count()
+			return django.http.HttpResponseNotFound()
 
-	total_transactions = total_transactions if total_transactions != 0 else 1
+		now: datetime.datetime = timezone.now()  # queryset.update skips auto_now.
 
-	total_value = 0
+		if Users.objects.filter(user_id=from_user_id, money__gte=amount).update(money=F('money') - amount, updated_at=now) == 0:
 
-	total_value = sum(transaction.transaction_total for transaction in transactions.all())
+			return django.http.HttpResponseNotFound() if not Users.objects.filter(user_id=from_user_id).exists() else django.http.HttpResponse(status=HTTPStatus.CONFLICT)
 
-	schmuckmark_velocity = total_value / total_transactions
+		Users.objects.filter(user_id=to_user_id).update(money=F('money') + amount, updated_at=now)
 
-	schmuckmark_velocity = schmuckmark_velocity if schmuckmark_velocity != 0 else 1
+		TransactionLog.objects.create(transaction_type=transactionType.TRANSFER, transactor_id=from_user_id, recipient_id=to_user_id, transaction_total=amount)
 
-	price_level: int = 0
+		economy.record_money_change(economy.counted_money(to_user_id, amount) - economy.counted_money(from_user_id, amount))
 
-	item: transactionType
-	for item in transactionType:
+		users: list[Users] = list(Users.objects.filter(user_id__in=[from_user_id, to_user_id]))
 
-		if item in {transactionType.INCOME_PAYMENT}:  # Skip non-purchases
+	return wire.response(request, {'data': [model_to_dict(user) for user in users]})
 
-			continue
 
-		last_sale: TransactionLog | None = TransactionLog.objects.filter(transaction_type=item).last()
+PAYDAY_BATCH_SIZE: int = 2000  # Users per UPDATE, each costs two query parameters, well under SQLite's limit of 32766.
 
-		if last_sale is not None:
+@verify_post
+def _run_payday(request: django.http.HttpRequest) -> django.http.HttpResponse:
+	"""
+		Pays everybody in one transaction. "members" maps every member's user id to the ids of the roles they hold, and
+		each is paid the largest of the UBI and their roles' salaries. Members without a user are skipped.
 
-			price_level += last_sale.transaction_total
+		Members are grouped by what they're paid, so each batch is one UPDATE adding a CASE of those amounts with F(),
+		and the total is logged as one income payment. 409 (conflict) means this quarter was already paid.
 
-	price_level = price_level if price_level != 0 else 100  # This prevents unintended behavior on a "cold startup" (no db entries)
+		Two paydays racing can't both pay: the transaction starts by taking the write lock on the VotingRules row, so the
+		second waits there until the first commits, and then sees its payment. The lock is taken with a no-op UPDATE, not
+		select_for_update, as SQLite ignores that. An UPDATE also makes SQLite take its write lock up front, rather than
+		failing the second payday with "database is locked" when it tries to write. Without a VotingRules row there is
+		nothing to lock, but the bot can't start without one.
 
-	gdp_factor: float = 0.5
+		Returns the total, and the ids of the users paid each amount, for the bot to update its copies with.
+	"""
 
-	now: datetime.datetime = timezone.now()
+	request_data: dict[str, typing.Any] = _request_json(request)
+	members: typing.Any = request_data.get('members')
+	transactor_id: typing.Any = request_data.get('transactor_id')
+
+	if not isinstance(members, dict) or not isinstance(transactor_id, str):
+
+		return django.http.HttpResponseBadRequest()
+
+	if any(not isinstance(role_ids, list) for role_ids in members.values()):
+
+		return django.http.HttpResponseBadRequest()
+
+	with transaction.atomic():
+
+		VotingRules.objects.update(ubi_amount=F('ubi_amount'))  # The lock, see above. It's a singleton table.
+
+		if _last_payment_quarter() == moonPhaseQuarters.get_current_moon_quarter():
+
+			return django.http.HttpResponse(status=HTTPStatus.CONFLICT)
+
+		rules: VotingRules | None = voting_rules()
+		ubi_amount: int = rules.ubi_amount if rules is not None else 0
+		salaries: dict[str, int] = dict(Roles.objects.filter(salary__isnull=False).values_list('role_id', 'salary'))
+
+		user_ids_by_pay: dict[int, list[str]] = dict()
+
+		user_id: str
+		for user_id in Users.objects.filter(user_id__in=list(members)).values_list('user_id', flat=True):
+
+			pay: int = max([ubi_amount] + [salaries.get(str(role_id), 0) for role_id in members[user_id]])
+			user_ids_by_pay.setdefault(pay, []).append(user_id)
+
+		pay_by_user_id: list[tuple[str, int]] = [(user_id, pay) for pay, user_ids in user_ids_by_pay.items() for user_id in user_ids]
+		now: datetime.datetime = timezone.now()  # queryset.update skips auto_now.
+
+		for start in range(0, len(pay_by_user_id), PAYDAY_BATCH_SIZE):
 
-	gdp_factor += 0.1 * ProvisionHistory.objects.filter(polls_close_at__gt=now).count()
-	gdp_factor += 0.01 * ProvisionHistory.objects.filter(polls_close_at__gt=(now - timedelta(weeks=1))).count()
-	gdp_factor += 0.01 * JudicialChallenges.objects.filter(is_active=True).count()
+			batch: dict[str, int] = dict(pay_by_user_id[start:start + PAYDAY_BATCH_SIZE])
+			batch_ids_by_pay: dict[int, list[str]] = dict()
 
-	real_gdp: float = gdp_factor * schmuckmarket_cap
+			for user_id, pay in batch.items():
 
-	inflation_factor: float = (schmuckmarket_cap * schmuckmark_velocity) / (price_level * real_gdp)
+				batch_ids_by_pay.setdefault(pay, []).append(user_id)
 
-	curve_radius_factor: float = 1
-	slant_factor: float = 0.15
-	y_offset: float = 0.35
+			Users.objects.filter(user_id__in=list(batch)).update(
+				money=F('money') + Case(*(When(user_id__in=user_ids, then=Value(pay)) for pay, user_ids in batch_ids_by_pay.items()), default=Value(0)),
+				updated_at=now,
+			)
 
-	smooth_inflation: float = (inflation_factor * ((1 / (1 + (curve_radius_factor * inflation_factor))) + slant_factor)) + y_offset
-	# This is a much more aggressive smoothin factor. This gives us an oblique asymptote, ensuring that our inflation can always increase, but in a much more
-	# controlled way.
+		total_payed_out: int = sum(pay for _, pay in pay_by_user_id)
 
-	if get_debug_info:
+		TransactionLog.objects.create(transaction_type=transactionType.INCOME_PAYMENT, transactor_id=transactor_id, transaction_total=total_payed_out)
+
+		economy.record_money_change(sum(economy.counted_money(user_id, pay) for user_id, pay in pay_by_user_id))
+
+	return wire.response(request, {'data': {'total_payed_out': total_payed_out, 'paid': {pay: user_ids for pay, user_ids in user_ids_by_pay.items()}}})
+
+
+def _last_payment_quarter() -> moonPhaseQuarters:
+
+	last_payment: TransactionLog | None = TransactionLog.objects.filter(transaction_type=transactionType.INCOME_PAYMENT).last()
+
+	if last_payment is None: # No income payments, or a "cold start"
+
+		return moonPhaseQuarters.NEW_MOON
+
+	return moonPhaseQuarters.get_phase_by_date(last_payment.transacted_at)
+
+
+@verify_get
+def _get_voting_rules(request: django.http.HttpRequest) -> django.http.HttpResponse:
+	"""
+		From the cache in signals, so pulling the rules costs no query.
+	"""
+
+	rules: VotingRules | None = voting_rules()
+
+	if rules is None:
+
+		return django.http.HttpResponseNotFound()
+
+	return wire.response(request, model_to_dict(rules), is_conditional=True)
+
+# -Misc.-
+
+def _is_rigged(key: str):
+
+	rig_pass = [
+
+	]
+
+	rig_fail = [
+		'dissolve',
+	]
 
-		payload: dict[str, int|float] = {
-			'base_price': base_price,
-			'schmuckmarket_cap': schmuckmarket_cap,
-			'schmuckmark_velocity': schmuckmark_velocity,
-			'price_level': price_level,
-			'real_gdp': real_gdp,
-			'inflation_factor': inflation_factor,
-			'smooth_inflation': smooth_inflation,
-			'unsmooth_price': base_price * inflation_factor,
-			'smooth_price': base_price * smooth_inflation,
-		}
+	if key in rig_pass:
+		return 1
 
-		return payload
+	if key in rig_fail:
+		return 2
 
-	inflated_price: float = base_price * smooth_inflation
+	return 0
 
-	return round(inflated_price if inflated_price > base_price else base_price)
 
 # --- API ENDPOINTS ---
 
@@ -480,12 +767,20 @@ def get_users(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
 def get_roles(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
-	return _generic_get_multiple(request, Roles)
+	return _generic_get_multiple(request, Roles, is_conditional=True)
+
+
+def get_changes(request: django.http.HttpRequest) -> django.http.HttpResponse:
+	"""
+		The bot's delta sync for Users and Roles, see _get_changes_since.
+	"""
+
+	return _get_changes_since(request, {'users': Users, 'roles': Roles})
 
 
 def get_recognized_regions(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
-	return _generic_get_multiple(request, RecognizedRegions)
+	return _generic_get_multiple(request, RecognizedRegions, is_conditional=True)
 
 
 def get_next_amendment_number(request: django.http.HttpRequest) -> django.http.HttpResponse:
@@ -506,7 +801,7 @@ def get_next_amendment_number(request: django.http.HttpRequest) -> django.http.H
 
 		next_number: int = last_amendment.amendment_number + 1
 
-		return django.http.JsonResponse({'data': next_number}, status=HTTPStatus.OK)
+		return wire.response(request, {'data': next_number})
 
 	except Exception as e:
 
@@ -546,7 +841,7 @@ def get_open_judicial_challenges(request: django.http.HttpRequest) -> django.htt
 
 def get_voting_rules(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
-	return _generic_get_single(request, VotingRules, custom_index=Q(id=1))
+	return _get_voting_rules(request)
 
 	# try:
 
@@ -578,7 +873,7 @@ def get_full_constitution(request: django.http.HttpRequest) -> django.http.HttpR
 
 		return django.http.HttpResponse(status=HTTPStatus.INTERNAL_SERVER_ERROR)
 
-	return _generic_get_multiple(request, Constitution, order=Constitution._meta.pk.name)
+	return _generic_get_multiple(request, Constitution, order=Constitution._meta.pk.name, is_conditional=True)
 
 
 def get_constitution(request: django.http.HttpRequest) -> django.http.HttpResponse:
@@ -588,7 +883,7 @@ def get_constitution(request: django.http.HttpRequest) -> django.http.HttpRespon
 
 def get_party_role_by_name(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
-	json_request = json.loads(request.body)
+	json_request = _request_json(request)
 
 	if 'role_name' not in json_request:
 
@@ -603,7 +898,7 @@ def get_party_role_by_name(request: django.http.HttpRequest) -> django.http.Http
 
 def get_provision(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
-	json_request = json.loads(request.body)
+	json_request = _request_json(request)
 
 	if 'proposal_id' not in json_request:
 
@@ -656,6 +951,11 @@ def add_user(request: django.http.HttpRequest) -> django.http.HttpResponse:
 	return _generic_add_single(request, Users)
 
 
+def add_many_users(request: django.http.HttpRequest) -> django.http.HttpResponse:
+
+	return _generic_add_multiple(request, Users)
+
+
 def add_region(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
 	return _generic_add_single(request, RecognizedRegions)
@@ -673,7 +973,7 @@ def add_temporary_position(request: django.http.HttpRequest) -> django.http.Http
 
 def get_temporary_position(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
-	json_request = json.loads(request.body)
+	json_request = _request_json(request)
 
 	if 'user_id' not in json_request or 'role_id' not in json_request:
 		print('gug')
@@ -694,7 +994,7 @@ def get_updatable_temporary_positions(request: django.http.HttpRequest) -> djang
 
 def update_temporary_position(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
-	json_request = json.loads(request.body)
+	json_request = _request_json(request)
 
 	if 'user_id' not in json_request or 'role_id' not in json_request:
 		
@@ -714,7 +1014,7 @@ def delete_temporary_position(request: django.http.HttpRequest) -> django.http.H
 
 	try:  # TODO generalize a deletion function.
 
-		json_request = json.loads(request.body)
+		json_request = _request_json(request)
 
 		if 'user_id' not in json_request or 'role_id' not in json_request:
 			
@@ -752,32 +1052,104 @@ def add_purchase_log(request: django.http.HttpRequest) -> django.http.HttpRespon
 	return _generic_add_single(request, TransactionLog)
 
 
+def transfer_money(request: django.http.HttpRequest) -> django.http.HttpResponse:
+
+	return _transfer_money(request)
+
+
+def run_payday(request: django.http.HttpRequest) -> django.http.HttpResponse:
+
+	return _run_payday(request)
+
+
 def get_last_payment_quarter(request: django.http.HttpRequest) -> django.http.HttpResponse:  # TODO ADD VERIFY
 	"""
 		Return the last quarter that an income payment occurred in.
 	"""
 	
-	last_payment: TransactionLog | None = TransactionLog.objects.filter(transaction_type=transactionType.INCOME_PAYMENT).last()
-	last_phase: moonPhaseQuarters
+	return wire.response(request, {'data': _last_payment_quarter()})
 
-	if last_payment is None: # No income payments, or a "cold start"
 
-		last_phase = moonPhaseQuarters.NEW_MOON
-	
-	else:
+def debug_inflation(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
-		last_phase = moonPhaseQuarters.get_phase_by_date(last_payment.transacted_at)
-	
-	return django.http.JsonResponse({'data': last_phase}, status=HTTPStatus.OK)
+	base_price: int = _request_json(request)['data']
 
+	payload: int | dict[str, int|float] = economy.adjust_for_inflation(base_price, get_debug_info=True)
 
-def debug_inflation(request: django.http.HttpRequest) -> django.http.HttpResponse:
+	return wire.response(request, payload)
+
+
+CHANGE_FEED_LONG_POLL_SECONDS: float = 25.0
+CHANGE_FEED_RECHECK_SECONDS: float = 1.0  # How often a waiting request re-checks the database for events from other processes.
+CHANGE_FEED_RETENTION: timedelta = timedelta(days=1)
+
+
+@verify_get
+def _long_poll_change_events(request: django.http.HttpRequest) -> django.http.HttpResponse:
 
-	base_price: int = json.loads(request.body)['data']
+	since: int | None = _request_json(request).get('since')
+
+	if since is None:
+
+		latest: ChangeEvent | None = ChangeEvent.objects.order_by('id').last()
+
+		return wire.response(request, {'data': [], 'cursor': latest.id if latest is not None else 0})
+
+	ChangeEvent.objects.filter(created_at__lt=timezone.now() - CHANGE_FEED_RETENTION).delete()
+
+	give_up_at: float = time.monotonic() + CHANGE_FEED_LONG_POLL_SECONDS
+
+	while True:
+
+		events: list[ChangeEvent] = list(ChangeEvent.objects.filter(id__gt=since).order_by('id'))
+		remaining: float = give_up_at - time.monotonic()
+
+		if len(events) > 0 or remaining <= 0:
+
+			break
+
+		with change_feed_condition:
+
+			change_feed_condition.wait(timeout=min(remaining, CHANGE_FEED_RECHECK_SECONDS))
+
+	cursor: int = events[-1].id if len(events) > 0 else since
+
+	return wire.response(request, {'data': [model_to_dict(event) for event in events], 'cursor': cursor})
+
+
+def get_change_events(request: django.http.HttpRequest) -> django.http.HttpResponse:
+	"""
+		The bot's change feed. Returns every ChangeEvent after the "since" cursor, holding the request open for up to
+		CHANGE_FEED_LONG_POLL_SECONDS until one is published. The response carries the cursor to send next time.
+
+		A missing or null cursor is a fresh subscription, which returns no events, only the current cursor. The bot does a
+		full heartbeat on startup anyway.
+	"""
+
+	return _long_poll_change_events(request)
+
+
+def add_poll_ballot(request: django.http.HttpRequest) -> django.http.HttpResponse:
+	"""
+		Records (or changes) a user's vote on a provision poll. Polls only allow one answer, so a user has one ballot per poll.
+	"""
+
+	return _upsert_poll_ballot(request)
+
+
+def delete_poll_ballot(request: django.http.HttpRequest) -> django.http.HttpResponse:
+
+	return _delete_poll_ballot(request)
+
+
+def get_open_poll_ballots(request: django.http.HttpRequest) -> django.http.HttpResponse:
+	"""
+		Returns every ballot cast on a provision that is posted, and not yet resolved.
+	"""
 
-	payload: int | dict[str, int|float] = _adjust_for_inflation(base_price, get_debug_info=True)
+	open_message_ids = ProvisionHistory.objects.filter(passed__isnull=True).exclude(message_id='').values('message_id')
 
-	return django.http.JsonResponse(payload, status=HTTPStatus.OK)
+	return _generic_get_multiple(request, PollBallot, filters=Q(message_id__in=open_message_ids))
 
 
 def get_price_of_crack(request: django.http.HttpRequest) -> django.http.HttpResponse:
@@ -789,13 +1161,13 @@ def get_price_of_crack(request: django.http.HttpRequest) -> django.http.HttpResp
 
 	ret_price = price
 
-	inflation_adjusted_price: int | dict[str, int | float] = _adjust_for_inflation(price)
+	inflation_adjusted_price: int | dict[str, int | float] = economy.adjust_for_inflation(price)
 
 	if isinstance(inflation_adjusted_price, int):
 
 		ret_price = inflation_adjusted_price
 
-	return django.http.JsonResponse({'data': ret_price}, status=HTTPStatus.OK)
+	return wire.response(request, {'data': ret_price})
 
 	now: datetime.datetime = timezone.now()
 
@@ -871,11 +1243,11 @@ def get_price_of_crack(request: django.http.HttpRequest) -> django.http.HttpResp
 
 	ret_price: int = int(price)
 
-	inflation_adjusted_price: int | dict[str, int|float] = _adjust_for_inflation(price)
+	inflation_adjusted_price: int | dict[str, int|float] = economy.adjust_for_inflation(price)
 
 	if isinstance(inflation_adjusted_price, int):
 
 		ret_price = inflation_adjusted_price
 
-	return django.http.JsonResponse({'data': ret_price}, status=HTTPStatus.OK)
+	return wire.response(request, {'data': ret_price})
 
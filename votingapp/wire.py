@@ -0,0 +1,178 @@
+import django.http
+import gzip
+import hashlib
+import json
+import typing
+
+from django.core.serializers.json import DjangoJSONEncoder
+from http import HTTPStatus
+
+try:
+
+	import msgpack
+
+except ImportError:
+
+	msgpack = None
+
+try:
+
+	from compression import zstd  # Python 3.14 and later.
+
+except ImportError:
+
+	try:
+
+		from backports import zstd
+
+	except ImportError:
+
+		zstd = None
+
+"""
+	Content negotiation for the API's responses. The bot downloads whole tables (users, the constitution) over and over,
+	so responses are offered as MessagePack as well as JSON, and compressed with zstd or gzip, whichever the client says it
+	accepts (Accept and Accept-Encoding). A client that asks for neither gets the same uncompressed JSON as always, so the
+	website and the browser aren't affected.
+
+	MessagePack and zstd are optional dependencies. Without them, those formats are simply never offered.
+
+	Responses the bot re-downloads though they almost never change (the voting rules, roles, regions and the
+	constitution) are conditional: they carry an ETag made from their body, and a request whose If-None-Match already has
+	that ETag gets an empty 304 instead. The tag is weak, as the same body is sent compressed in different ways.
+"""
+
+JSON_CONTENT_TYPE: str = 'application/json'
+MSGPACK_CONTENT_TYPE: str = 'application/msgpack'
+
+MIN_COMPRESSED_BYTES: int = 1024  # Smaller bodies aren't worth the CPU, or the compression header.
+GZIP_LEVEL: int = 5  # Most of level 9's ratio on this kind of data, for a fraction of the time.
+ZSTD_LEVEL: int = 3
+
+
+def _accepted(header: str) -> dict[str, float]:
+	"""
+		Parses an Accept or Accept-Encoding header into {value: q}.
+	"""
+
+	accepted: dict[str, float] = dict()
+
+	for item in header.split(','):
+
+		value, *parameters = [part.strip() for part in item.split(';')]
+		q: float = 1.0
+
+		for parameter in parameters:
+
+			name, _, number = parameter.partition('=')
+
+			if name.strip() == 'q':
+
+				try:
+
+					q = float(number)
+
+				except ValueError:
+
+					q = 0.0
+
+		if value != '':
+
+			accepted[value.lower()] = q
+
+	return accepted
+
+
+def content_type_for(request: django.http.HttpRequest) -> str:
+
+	accepted: dict[str, float] = _accepted(request.headers.get('Accept', ''))
+
+	if msgpack is not None and accepted.get(MSGPACK_CONTENT_TYPE, 0.0) > 0 and accepted[MSGPACK_CONTENT_TYPE] >= accepted.get(JSON_CONTENT_TYPE, 0.0):
+
+		return MSGPACK_CONTENT_TYPE
+
+	return JSON_CONTENT_TYPE
+
+
+def content_encoding_for(request: django.http.HttpRequest) -> str | None:
+	"""
+		zstd is preferred when both are accepted, it compresses better and faster than gzip.
+	"""
+
+	accepted: dict[str, float] = _accepted(request.headers.get('Accept-Encoding', ''))
+
+	if zstd is not None and accepted.get('zstd', 0.0) > 0:
+
+		return 'zstd'
+
+	if accepted.get('gzip', 0.0) > 0:
+
+		return 'gzip'
+
+	return None
+
+
+def encode(payload: typing.Any, content_type: str) -> bytes:
+	"""
+		Dates and the like become the same strings in both formats, so the bot decodes either into the same objects.
+	"""
+
+	if content_type == MSGPACK_CONTENT_TYPE:
+
+		return msgpack.packb(payload, default=DjangoJSONEncoder().default)
+
+	return json.dumps(payload, cls=DjangoJSONEncoder).encode('utf-8')
+
+
+def compress(body: bytes, content_encoding: str) -> bytes:
+
+	if content_encoding == 'zstd':
+
+		return zstd.compress(body, level=ZSTD_LEVEL)
+
+	return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def etag_of(body: bytes) -> str:
+
+	return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _is_not_modified(request: django.http.HttpRequest, etag: str) -> bool:
+
+	if_none_match: list[str] = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+
+	return '*' in if_none_match or any(tag.removeprefix('W/') == etag.removeprefix('W/') for tag in if_none_match)
+
+
+def response(request: django.http.HttpRequest, payload: typing.Any, status: int = HTTPStatus.OK, is_conditional: bool = False) -> django.http.HttpResponse:
+	"""
+		Replaces JsonResponse for the API, answering in the best format the request accepts. is_conditional tags the
+		response with an ETag, and answers 304 if the request already has it.
+	"""
+
+	content_type: str = content_type_for(request)
+	content_encoding: str | None = content_encoding_for(request)
+	body: bytes = encode(payload, content_type)
+
+	http_response: django.http.HttpResponse = django.http.HttpResponse(status=status, content_type=content_type)
+	http_response['Vary'] = 'Accept, Accept-Encoding'
+
+	if is_conditional:
+
+		http_response['ETag'] = etag_of(body)  # Of the uncompressed body, so it's the same however it's compressed.
+
+		if _is_not_modified(request, http_response['ETag']):
+
+			http_response.status_code = HTTPStatus.NOT_MODIFIED
+
+			return http_response
+
+	if content_encoding is not None and len(body) >= MIN_COMPRESSED_BYTES:
+
+		body = compress(body, content_encoding)
+		http_response['Content-Encoding'] = content_encoding
+
+	http_response.content = body
+
+	return http_response